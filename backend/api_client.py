@@ -1,42 +1,670 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
 import time
 import base64
-from typing import Optional, Dict, Any
-from httpx import AsyncClient, Response
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator, Optional, Dict, Any
+from httpx import AsyncClient, Limits, Request, Response, Timeout, TransportError
 from utils.logger import get_logger
 from utils.scheduler_registry import scheduled_task
+from utils.strings import API_DICT
 from utils.variable import API_URL, OAUTH_APP_ID, OAUTH_SECRET, OAUTH_TOKEN_TTL
-from utils.caches import get_cache, set_cache
+from utils.caches import (
+    CachePolicy,
+    get_cache,
+    get_or_fetch,
+    set_cache,
+    set_refresh_context,
+)
+from utils.projection import Projection, compile_projection
+from utils.singleflight import SingleFlight, set_flight_hooks
+
+# 传输层配置（config/api.yaml 中的 client 节）
+_CLIENT_CONFIG: dict = API_DICT.get("client", {}) or {}
+# 限流配置（config/api.yaml 中的 rate_limit 节）
+_RATE_LIMIT_CONFIG: dict = API_DICT.get("rate_limit", {}) or {}
+# 容错配置（config/api.yaml 中的 resilience 节）
+_RESILIENCE_CONFIG: dict = API_DICT.get("resilience", {}) or {}
+_RETRY_CONFIG: dict = _RESILIENCE_CONFIG.get("retry", {}) or {}
+_HEDGE_CONFIG: dict = _RESILIENCE_CONFIG.get("hedge", {}) or {}
+_BREAKER_CONFIG: dict = _RESILIENCE_CONFIG.get("circuit_breaker", {}) or {}
+_CACHE_POLICIES: dict[str, CachePolicy] = {
+    name: CachePolicy.from_dict(config or {})
+    for name, config in (API_DICT.get("cache_policies", {}) or {}).items()
+}
+_CACHE_PROJECTIONS: dict[str, Projection] = {
+    name: compile_projection(spec or [])
+    for name, spec in (API_DICT.get("cache_projections", {}) or {}).items()
+}
+
+# 全局共享的 HTTP 传输（连接池 + keep-alive + HTTP/2）
+_http_client: Optional[AsyncClient] = None
+
+# 进行中的相同 GET 请求合并
+_get_flight = SingleFlight("api_get")
+
+
+def _request_timeout(total: float) -> Timeout:
+    """总超时为 total，建立连接的超时取 client.connect_timeout（不超过 total）"""
+    return Timeout(
+        total, connect=min(total, _CLIENT_CONFIG.get("connect_timeout", 10.0))
+    )
+
+
+def _create_http_client() -> AsyncClient:
+    """按配置创建共享的 AsyncClient"""
+    limits = Limits(
+        max_connections=_CLIENT_CONFIG.get("max_connections", 20),
+        max_keepalive_connections=_CLIENT_CONFIG.get("max_keepalive_connections", 10),
+        keepalive_expiry=_CLIENT_CONFIG.get("keepalive_expiry", 60.0),
+    )
+    timeout = _request_timeout(_CLIENT_CONFIG.get("timeout", 30.0))
+    http2 = _CLIENT_CONFIG.get("http2", True)
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            get_logger("api_client").warning(
+                "未安装 h2，HTTP/2 已禁用，回退到 HTTP/1.1"
+            )
+            http2 = False
+
+    # httpx 会根据已安装的 brotli / zstandard 自动声明 Accept-Encoding 并解码
+    return AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_http_client() -> AsyncClient:
+    """获取全局共享的 AsyncClient（懒加载，关闭后再次调用会重新创建）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def init_http_client(warm_up: bool = True) -> None:
+    """
+    初始化全局 HTTP 传输，并预热到 API 服务器的连接
+
+    预热会提前完成 DNS 解析、TCP 与 TLS 握手，
+    使第一个用户请求直接复用已建立的连接。
+    """
+    client = get_http_client()
+    if not warm_up or not _CLIENT_CONFIG.get("warm_up", True):
+        return
+
+    logger = get_logger("api_client")
+    try:
+        start = time.perf_counter()
+        response = await client.head(API_URL)
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"HTTP 连接预热完成: {response.http_version} {response.status_code} ({elapsed:.1f}ms)"
+        )
+    except Exception as e:
+        # 预热失败不影响启动，首个请求时会重新建立连接
+        logger.warning(f"HTTP 连接预热失败: {e}")
+
+
+async def close_http_client() -> None:
+    """关闭全局 HTTP 传输，释放连接池"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        get_logger("api_client").info("HTTP 连接池已关闭")
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越优先"""
+
+    INTERACTIVE = 0  # 用户命令
+    BACKGROUND = 1  # 定时任务 / 预取
+
+
+# 当前上下文中发出的请求的优先级，默认视为用户命令
+_request_priority: ContextVar[Priority] = ContextVar(
+    "api_request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """
+    在该上下文内发出的 API 请求使用指定优先级
+
+    用法:
+        with request_priority(Priority.BACKGROUND):
+            await get_beatmap_info(beatmap_id)
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class _FlightPriority:
+    """
+    一次被合并的调用（SingleFlight）的请求优先级
+
+    调用开始时取发起者的优先级；之后加入等待的调用者优先级更高时随之提升，
+    避免用户命令排在它所等待的后台请求之后。嵌套的调用通过 parent 继承外层的提升。
+    """
+
+    __slots__ = ("priority", "parent")
+
+    def __init__(self, priority: Priority, parent: Optional["_FlightPriority"]):
+        self.priority = priority
+        self.parent = parent
+
+    def effective(self) -> Priority:
+        priority = self.priority
+        parent = self.parent
+        while parent is not None:
+            priority = min(priority, parent.priority)
+            parent = parent.parent
+        return priority
+
+
+_flight_priority: ContextVar[Optional[_FlightPriority]] = ContextVar(
+    "api_flight_priority", default=None
+)
+
+
+def _current_priority() -> Priority:
+    """当前上下文中请求的实际优先级（考虑所在调用被提升的情况）"""
+    priority = _request_priority.get()
+    flight = _flight_priority.get()
+    return min(priority, flight.effective()) if flight is not None else priority
+
+
+def _on_flight_lead() -> None:
+    _flight_priority.set(_FlightPriority(_current_priority(), _flight_priority.get()))
+
+
+def _on_flight_join(task: asyncio.Task) -> None:
+    flight = task.get_context().get(_flight_priority)
+    priority = _current_priority()
+    if flight is not None and priority < flight.priority:
+        flight.priority = priority
+        _scheduler.reprioritize()
+
+
+set_flight_hooks(_on_flight_lead, _on_flight_join)
+
+
+@contextmanager
+def background_requests() -> Iterator[None]:
+    """
+    后台任务（缓存刷新、预取等）不属于任何用户命令：以 BACKGROUND 优先级发出请求，
+    并且不继承发起者所在调用（SingleFlight）的优先级
+    """
+    token = _flight_priority.set(None)
+    try:
+        with request_priority(Priority.BACKGROUND):
+            yield
+    finally:
+        _flight_priority.reset(token)
+
+
+# 缓存的后台刷新（stale-while-revalidate）不应与用户命令抢占额度
+set_refresh_context(background_requests)
+
+
+class RequestScheduler:
+    """
+    限流调度器：令牌桶 + 优先级队列 + 自适应并发
+
+    - 令牌桶控制平均速率（rate）与突发（burst）
+    - 等待队列按优先级出队，用户命令总是先于后台请求
+    - 后台请求只能使用 background_reserve 之外的令牌，为用户命令保留余量
+    - 根据上游的 X-RateLimit-* / Retry-After 响应头收紧令牌与并发（AIMD）
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        background_reserve: int = 0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.background_reserve = background_reserve
+        self.concurrency_limit = max_concurrency
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._active = 0
+        self._paused_until = 0.0
+        # [优先级, 序号, future, 所在调用]，所在调用被提升时更新优先级后重新堆化
+        self._waiters: list[list] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.logger = get_logger("api_scheduler")
+
+    def _refill(self, now: float) -> None:
+        """按时间补充令牌"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        flight: Optional[_FlightPriority] = None,
+    ) -> None:
+        """
+        等待获取一个请求名额（令牌 + 并发槽位）
+
+        Args:
+            flight: 请求所在的合并调用，等待期间它被提升时按新的优先级排队
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [int(priority), next(self._seq), future, flight])
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已分配名额后被取消，需要归还并发槽位
+            if future.done() and not future.cancelled():
+                self.release(None)
+            raise
+
+    def release(self, response: Optional[Response]) -> None:
+        """归还并发槽位，并根据响应头调整速率"""
+        self._active -= 1
+        if response is not None:
+            self._observe(response)
+        self._dispatch()
+
+    def reprioritize(self) -> None:
+        """合并调用的优先级被提升后，更新其中正在排队的请求"""
+        changed = False
+        for waiter in self._waiters:
+            flight = waiter[3]
+            if flight is not None and flight.effective() < waiter[0]:
+                waiter[0] = int(flight.effective())
+                changed = True
+        if changed:
+            heapq.heapify(self._waiters)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """按优先级把名额分配给等待者"""
+        now = time.monotonic()
+        self._refill(now)
+
+        while self._waiters:
+            priority, _, future, _ = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if now < self._paused_until:
+                self._arm_timer(self._paused_until - now)
+                return
+            if self._active >= self.concurrency_limit:
+                # 有请求结束时 release 会再次调度
+                return
+
+            reserve = self.background_reserve if priority > Priority.INTERACTIVE else 0
+            if self._tokens < 1 + reserve:
+                self._arm_timer((1 + reserve - self._tokens) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            self._active += 1
+            future.set_result(None)
+
+    def _arm_timer(self, delay: float) -> None:
+        """令牌不足或被暂停时，延迟后再次调度"""
+        if self._timer is not None:
+            return
+
+        def _fire():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), _fire)
+
+    def _observe(self, response: Response) -> None:
+        """读取上游限流响应头，自适应调整令牌与并发上限"""
+        now = time.monotonic()
+        headers = response.headers
+
+        if response.status_code == 429:
+            retry_after = _parse_float(headers.get("Retry-After")) or 1.0
+            self._paused_until = max(self._paused_until, now + retry_after)
+            self._tokens = 0.0
+            self.concurrency_limit = max(
+                self.min_concurrency, self.concurrency_limit // 2
+            )
+            self.logger.warning(
+                f"触发上游限流，暂停 {retry_after:.1f}s，并发上限降为 {self.concurrency_limit}"
+            )
+            return
+
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        limit = _parse_float(headers.get("X-RateLimit-Limit"))
+        if remaining is not None:
+            # 本地令牌不能超过上游声明的剩余额度
+            self._tokens = min(self._tokens, remaining)
+
+        if remaining is not None and limit and remaining < limit * 0.1:
+            # 剩余额度不足 10%：乘性减少并发
+            self.concurrency_limit = max(
+                self.min_concurrency, self.concurrency_limit // 2
+            )
+        elif self.concurrency_limit < self.max_concurrency:
+            # 额度充足：加性恢复并发
+            self.concurrency_limit += 1
+
+    def stats(self) -> dict:
+        """获取调度器状态"""
+        waiting = [p for p, _, f, _ in self._waiters if not f.done()]
+        return {
+            "tokens": round(self._tokens, 2),
+            "active": self._active,
+            "concurrency_limit": self.concurrency_limit,
+            "waiting_interactive": sum(1 for p in waiting if p == Priority.INTERACTIVE),
+            "waiting_background": sum(1 for p in waiting if p != Priority.INTERACTIVE),
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    """解析数值型响应头，无法解析时返回 None"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+_scheduler = RequestScheduler(
+    rate=_RATE_LIMIT_CONFIG.get("rate", 10.0),
+    burst=_RATE_LIMIT_CONFIG.get("burst", 20),
+    max_concurrency=_RATE_LIMIT_CONFIG.get("max_concurrency", 8),
+    min_concurrency=_RATE_LIMIT_CONFIG.get("min_concurrency", 1),
+    background_reserve=_RATE_LIMIT_CONFIG.get("background_reserve", 5),
+)
+
+
+def get_scheduler_stats() -> dict:
+    """获取限流调度器状态"""
+    return _scheduler.stats()
+
+
+# ============ 容错：重试 / 对冲请求 / 熔断 ============
+
+
+def _compile_endpoint_patterns() -> list[tuple[str, re.Pattern]]:
+    """把 config/api.yaml 中的端点模板编译为正则，用于按端点统计、熔断与缓存"""
+    prefix = API_DICT.get("api_prefix", "")
+    patterns = []
+    for name, template in API_DICT.get("apis", {}).items():
+        regex = re.sub(
+            r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(f"{prefix}{template}")
+        )
+        patterns.append((name, re.compile(regex)))
+    return patterns
+
+
+_ENDPOINT_PATTERNS = _compile_endpoint_patterns()
+
+
+def _path_user_id(path_params: dict[str, str]) -> Optional[str]:
+    """URL 中的用户 ID；是用户名时返回 None（user:{id} 标签只按用户 ID 构造）"""
+    user_id = path_params.get("user_id")
+    return user_id if user_id is not None and user_id.isdigit() else None
+
+
+def _match_endpoint(url: str) -> tuple[str, dict[str, str]]:
+    """
+    根据 URL 路径得到端点名称与路径参数
+
+    未配置的端点使用去掉数字 ID 的路径作为名称
+    """
+    path = "/" + url.split("://", 1)[-1].split("/", 1)[-1].split("?", 1)[0]
+    for name, pattern in _ENDPOINT_PATTERNS:
+        match = pattern.fullmatch(path)
+        if match:
+            return name, match.groupdict()
+    return re.sub(r"/\d+", "/{id}", path), {}
+
+
+def _endpoint_name(url: str) -> str:
+    """根据 URL 路径得到端点名称"""
+    return _match_endpoint(url)[0]
+
+
+def get_cache_policy(endpoint: str) -> CachePolicy:
+    """获取端点在 config/api.yaml 中声明的缓存策略，未声明时返回不缓存的策略"""
+    return _CACHE_POLICIES.get(endpoint, CachePolicy())
+
+
+def get_cache_projection(entity: str) -> Optional[Projection]:
+    """获取实体在 config/api.yaml 中声明的字段投影，未声明时返回 None（保留全部字段）"""
+    return _CACHE_PROJECTIONS.get(entity)
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计，用于计算对冲请求的触发阈值"""
+
+    def __init__(self, window: int):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        """样本不足 min_samples 时返回 None"""
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    单个端点的熔断器
+
+    closed    -> 连续失败达到 failure_threshold 后 open
+    open      -> 直接失败，recovery_timeout 后进入 half_open
+    half_open -> 放行一个探测请求，成功则 closed，失败则重新 open
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.logger = get_logger("api_circuit_breaker")
+
+    def allow(self) -> bool:
+        """当前是否允许发出请求"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        # half_open：只放行一个探测请求
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release_probe(self) -> None:
+        """请求被取消、结果未知：不计入成功或失败，只让出探测名额"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            self.logger.info(f"端点 {self.name} 已恢复，熔断器关闭")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.logger.warning(
+                    f"端点 {self.name} 连续失败 {self.failures} 次，熔断 {self.recovery_timeout}s"
+                )
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+_latency_trackers: dict[str, LatencyTracker] = {}
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+_hedge_stats = {"fired": 0, "won": 0}
+
+
+def _get_latency_tracker(endpoint: str) -> LatencyTracker:
+    tracker = _latency_trackers.get(endpoint)
+    if tracker is None:
+        tracker = LatencyTracker(_HEDGE_CONFIG.get("window", 200))
+        _latency_trackers[endpoint] = tracker
+    return tracker
+
+
+def _get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _circuit_breakers.get(endpoint)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            endpoint,
+            failure_threshold=_BREAKER_CONFIG.get("failure_threshold", 5),
+            recovery_timeout=_BREAKER_CONFIG.get("recovery_timeout", 30.0),
+        )
+        _circuit_breakers[endpoint] = breaker
+    return breaker
+
+
+def _backoff_delay(attempt: int) -> float:
+    """指数退避 + 全抖动（full jitter）"""
+    base = _RETRY_CONFIG.get("base_delay", 0.2)
+    cap = _RETRY_CONFIG.get("max_delay", 2.0)
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def get_resilience_stats() -> dict:
+    """获取各端点的延迟阈值、熔断状态与对冲请求统计"""
+    percentile = _HEDGE_CONFIG.get("percentile", 0.95)
+    min_samples = _HEDGE_CONFIG.get("min_samples", 20)
+    return {
+        "hedge": dict(_hedge_stats),
+        "endpoints": {
+            name: {
+                "latency_threshold": tracker.percentile(percentile, min_samples),
+                "circuit": _circuit_breakers[name].state
+                if name in _circuit_breakers
+                else "closed",
+            }
+            for name, tracker in _latency_trackers.items()
+        },
+    }
 
 
 class OAuth2Handler:
     """
     OAuth2 验证处理器，处理 client_credentials 流程
     使用缓存系统存储 token，支持多实例共享
+
+    - 刷新是 single-flight 的：并发调用只会触发一次 /oauth/token 请求
+    - 进入提前刷新窗口后，后台刷新新 token，调用者继续使用当前 token 不被阻塞
     """
 
+    # token 剩余有效期低于该值时视为不可用，必须同步刷新
+    EXPIRY_MARGIN = 30
+    # token 剩余有效期低于该值时在后台提前刷新
+    REFRESH_AHEAD = 300
+
     def __init__(self, client_id: str, client_secret: str, token_url: str):
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_url = token_url
         self.logger = get_logger("oauth2_handler")
 
+        # 进程内 token 副本，热路径无需访问缓存
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._refresh_flight = SingleFlight("oauth_refresh")
+        self._background_refresh: Optional[asyncio.Task] = None
+
     @property
     def _cache_key(self) -> str:
         """生成缓存 key"""
         return f"oauth:token:{self.client_id}"
 
+    def _is_usable(self, now: float) -> bool:
+        """当前 token 是否仍可直接使用"""
+        return self._token is not None and now < self._expires_at - self.EXPIRY_MARGIN
+
+    async def _load_from_cache(self) -> None:
+        """从共享缓存同步 token（其他实例可能已经刷新过）"""
+        cached = await get_cache(self._cache_key)
+        if cached and cached.get("token"):
+            expires_at = cached.get("expires_at", 0)
+            if expires_at > self._expires_at:
+                self._token = cached["token"]
+                self._expires_at = expires_at
+
     async def get_access_token(self) -> str:
         """获取有效的访问令牌"""
-        cached = await get_cache(self._cache_key)
+        now = time.time()
+        if not self._is_usable(now):
+            await self._load_from_cache()
 
-        if cached:
-            token = cached.get("token")
-            expires_at = cached.get("expires_at", 0)
-            # 提前30秒刷新
-            if token and time.time() < expires_at - 30:
-                return token
+        if self._is_usable(now):
+            if now >= self._expires_at - self.REFRESH_AHEAD:
+                self._schedule_background_refresh()
+            return self._token  # type: ignore[return-value]
+
+        return await self._refresh_once()
+
+    async def refresh_if_needed(self) -> None:
+        """token 不存在或即将过期时刷新（供定时任务调用）"""
+        now = time.time()
+        if not self._is_usable(now):
+            await self._load_from_cache()
+        if not self._is_usable(now) or now >= self._expires_at - self.REFRESH_AHEAD:
+            await self._refresh_once()
+
+    async def _refresh_once(self) -> str:
+        """合并并发的刷新请求，同一时刻只有一个 /oauth/token 请求"""
+        return await self._refresh_flight.do(self._cache_key, self.refresh_token)
 
-        return await self.refresh_token()
+    def _schedule_background_refresh(self) -> None:
+        """在后台提前刷新 token，不阻塞当前调用者"""
+        if self._background_refresh is not None and not self._background_refresh.done():
+            return
+
+        async def _run():
+            try:
+                await self._refresh_once()
+            except Exception as e:
+                # 当前 token 仍有效，下次调用或定时任务会再次尝试
+                self.logger.warning(f"Background token refresh failed: {e}")
+
+        self._background_refresh = asyncio.create_task(_run())
 
     async def refresh_token(self) -> str:
         """从服务器刷新访问令牌并缓存"""
@@ -55,52 +683,104 @@ class OAuth2Handler:
             "Content-Type": "application/x-www-form-urlencoded",
         }
 
-        async with AsyncClient() as client:
-            response = await client.post(self.token_url, data=data, headers=headers)
-            if response.status_code != 200:
-                self.logger.error(
-                    f"Failed to fetch token: {response.status_code} - {response.text}"
-                )
-                raise Exception(f"OAuth2 token fetch failed: {response.text}")
-
-            result = response.json()
-            token = result["access_token"]
-            expires_in = result.get("expires_in", 3600)
-            expires_at = time.time() + expires_in
-
-            # 缓存 token
-            await set_cache(
-                self._cache_key,
-                {"token": token, "expires_at": expires_at},
-                ttl=expires_in,
+        client = get_http_client()
+        response = await client.post(self.token_url, data=data, headers=headers)
+        if response.status_code != 200:
+            self.logger.error(
+                f"Failed to fetch token: {response.status_code} - {response.text}"
             )
+            raise Exception(f"OAuth2 token fetch failed: {response.text}")
+
+        result = response.json()
+        token = result["access_token"]
+        expires_in = result.get("expires_in", 3600)
+        expires_at = time.time() + expires_in
+
+        self._token = token
+        self._expires_at = expires_at
+
+        # 缓存 token
+        await set_cache(
+            self._cache_key,
+            {"token": token, "expires_at": expires_at},
+            ttl=expires_in,
+        )
 
-            self.logger.info(f"Token refreshed successfully. Expires in {expires_in}s")
-            return token
+        self.logger.info(f"Token refreshed successfully. Expires in {expires_in}s")
+        return token
 
 
-# 全局 OAuth handler 实例（用于定时任务）
+# 全局 OAuth handler 实例（API 客户端与定时任务共用）
 _oauth_handler: Optional[OAuth2Handler] = None
 
 
-def _get_global_oauth_handler() -> OAuth2Handler:
-    """获取全局 OAuth handler（内部使用）"""
+def _get_global_oauth_handler() -> Optional[OAuth2Handler]:
+    """获取全局 OAuth handler（未配置 app_id / secret 时返回 None）"""
     global _oauth_handler
-    if _oauth_handler is None:
-        token_url = f"{API_URL}/oauth/token"
-        _oauth_handler = OAuth2Handler(OAUTH_APP_ID, OAUTH_SECRET, token_url)
+    if _oauth_handler is None and OAUTH_APP_ID and OAUTH_SECRET:
+        _oauth_handler = OAuth2Handler(
+            client_id=str(OAUTH_APP_ID),
+            client_secret=OAUTH_SECRET,
+            token_url=f"{API_URL.rstrip('/')}/oauth/token",
+        )
     return _oauth_handler
 
 
-@scheduled_task(name="refresh_token", interval=OAUTH_TOKEN_TTL // 2)
+async def warm_up_oauth_token() -> None:
+    """启动时预先获取 token，避免第一个用户请求等待 /oauth/token"""
+    handler = _get_global_oauth_handler()
+    if handler is None:
+        return
+    try:
+        await handler.get_access_token()
+    except Exception as e:
+        get_logger("oauth2_handler").warning(f"Token warm-up failed: {e}")
+
+
+@scheduled_task(name="refresh_token", interval=min(60, max(1, OAUTH_TOKEN_TTL // 2)))
 async def scheduled_refresh_token():
     """
-    定时刷新 OAuth token
-    间隔为 TTL 的一半，确保 token 不会过期
+    定时检查 OAuth token
+    在 token 进入提前刷新窗口时主动刷新，确保用户请求拿到的 token 始终有效
     """
     handler = _get_global_oauth_handler()
-    # get_access_token 内部会检查是否需要刷新
-    await handler.get_access_token()
+    if handler is not None:
+        await handler.refresh_if_needed()
+
+
+class _UncacheableResponse(Exception):
+    """非 200 响应：不写入缓存，由 APIClient.get 原样返回给调用者"""
+
+    def __init__(self, response: Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def _is_upstream_failure(e: Exception) -> bool:
+    """上游故障（网络错误、5xx、429）时允许用旧缓存兜底，其余 4xx 不允许"""
+    if isinstance(e, _UncacheableResponse):
+        status = e.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+def _snapshot_response(response: Response) -> dict:
+    """把响应转换为可缓存的字典"""
+    return {
+        "status_code": response.status_code,
+        "content_type": response.headers.get("content-type", "application/json"),
+        "content": response.content,
+    }
+
+
+def _restore_response(snapshot: dict, url: str) -> Response:
+    """从缓存的字典还原响应"""
+    return Response(
+        snapshot["status_code"],
+        headers={"content-type": snapshot["content_type"]},
+        content=snapshot["content"],
+        request=Request("GET", url),
+    )
 
 
 class APIClient:
@@ -120,11 +800,11 @@ class APIClient:
 
         Args:
             base_url: API基础URL
-            timeout: 请求超时时间（秒）
+            timeout: 请求超时时间（秒），建立连接的超时仍按 client.connect_timeout
             headers: 默认请求头
         """
         self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
+        self.timeout = _request_timeout(timeout)
         self.headers = headers or {}
         self.oauth_handler = oauth_handler
         self.logger = get_logger("api_client")
@@ -140,10 +820,93 @@ class APIClient:
         endpoint: str,
         params: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
+        cache: bool = True,
         **kwargs,
     ) -> Response:
-        """发送GET请求"""
+        """
+        发送GET请求
+
+        URL + 参数完全相同的并发请求会被合并为一次上游请求，
+        所有调用者共享同一个响应（或同一个异常）。
+
+        端点在 config/api.yaml 的 cache_policies 中声明了缓存策略时，
+        200 响应按策略缓存；cache=False 可跳过（例如调用方自行按实体缓存）。
+        """
         url = self._build_url(endpoint)
+
+        # 带额外 httpx 参数的请求无法可靠比较，不参与合并与缓存
+        if kwargs:
+            return await self._send_get(url, params, headers, **kwargs)
+
+        key = self._coalesce_key(url, params, headers)
+        if cache:
+            endpoint_name, path_params = _match_endpoint(url)
+            policy = get_cache_policy(endpoint_name)
+            if policy.enabled:
+                return await self._get_cached(
+                    f"http:{endpoint_name}:{key}",
+                    key,
+                    url,
+                    params,
+                    headers,
+                    policy,
+                    _path_user_id(path_params),
+                )
+
+        return await _get_flight.do(key, lambda: self._send_get(url, params, headers))
+
+    async def _get_cached(
+        self,
+        cache_key: str,
+        key: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        policy: CachePolicy,
+        user_id: Optional[str],
+    ) -> Response:
+        """按缓存策略读取响应，非 200 响应不缓存、原样返回"""
+
+        async def fetch() -> dict:
+            response = await _get_flight.do(
+                key, lambda: self._send_get(url, params, headers)
+            )
+            if response.status_code != 200:
+                raise _UncacheableResponse(response)
+            return _snapshot_response(response)
+
+        try:
+            snapshot = await get_or_fetch(
+                cache_key,
+                fetch,
+                serve_stale_if=_is_upstream_failure,
+                **policy.options(user_id),
+            )
+        except _UncacheableResponse as e:
+            return e.response
+        return _restore_response(snapshot, url)
+
+    @staticmethod
+    def _coalesce_key(
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+    ) -> str:
+        """生成请求合并键：URL + 规范化后的参数（与顺序无关）"""
+        normalized = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        key = f"{url}?{normalized}"
+        if headers:
+            key += f"|{sorted(headers.items())}"
+        return key
+
+    async def _send_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> Response:
+        """实际发送GET请求"""
         request_headers = {**self.headers, **(headers or {})}
 
         self.logger.info(f"GET {url} - Params: {params}")
@@ -152,12 +915,11 @@ class APIClient:
             token = await self.oauth_handler.get_access_token()
             request_headers["Authorization"] = f"Bearer {token}"
 
-        async with AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                url, params=params, headers=request_headers, **kwargs
-            )
-            self._log_response(response)
-            return response
+        response = await self._send_resilient(
+            "GET", url, params=params, headers=request_headers, **kwargs
+        )
+        self._log_response(response)
+        return response
 
     async def post(
         self,
@@ -177,12 +939,11 @@ class APIClient:
             token = await self.oauth_handler.get_access_token()
             request_headers["Authorization"] = f"Bearer {token}"
 
-        async with AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                url, data=data, json=json_data, headers=request_headers, **kwargs
-            )
-            self._log_response(response)
-            return response
+        response = await self._send_resilient(
+            "POST", url, data=data, json=json_data, headers=request_headers, **kwargs
+        )
+        self._log_response(response)
+        return response
 
     async def put(
         self,
@@ -202,12 +963,11 @@ class APIClient:
             token = await self.oauth_handler.get_access_token()
             request_headers["Authorization"] = f"Bearer {token}"
 
-        async with AsyncClient(timeout=self.timeout) as client:
-            response = await client.put(
-                url, data=data, json=json_data, headers=request_headers, **kwargs
-            )
-            self._log_response(response)
-            return response
+        response = await self._send_resilient(
+            "PUT", url, data=data, json=json_data, headers=request_headers, **kwargs
+        )
+        self._log_response(response)
+        return response
 
     async def delete(
         self, endpoint: str, headers: Optional[Dict[str, str]] = None, **kwargs
@@ -222,10 +982,171 @@ class APIClient:
             token = await self.oauth_handler.get_access_token()
             request_headers["Authorization"] = f"Bearer {token}"
 
-        async with AsyncClient(timeout=self.timeout) as client:
-            response = await client.delete(url, headers=request_headers, **kwargs)
-            self._log_response(response)
-            return response
+        response = await self._send_resilient(
+            "DELETE", url, headers=request_headers, **kwargs
+        )
+        self._log_response(response)
+        return response
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        admitted: Optional[asyncio.Event] = None,
+        **kwargs,
+    ) -> Response:
+        """
+        经过限流调度器，使用共享连接池发送请求
+
+        Args:
+            admitted: 通过限流调度、真正开始发送时 set 的事件（用于对冲计时）
+        """
+        await _scheduler.acquire(_current_priority(), _flight_priority.get())
+        if admitted is not None:
+            admitted.set()
+        response: Optional[Response] = None
+        try:
+            start = time.perf_counter()
+            result = await get_http_client().request(
+                method, url, timeout=self.timeout, **kwargs
+            )
+            response = result
+            if result.status_code < 500:
+                _get_latency_tracker(_endpoint_name(url)).record(
+                    time.perf_counter() - start
+                )
+            return result
+        finally:
+            _scheduler.release(response)
+
+    async def _send_resilient(self, method: str, url: str, **kwargs) -> Response:
+        """
+        带熔断、重试与对冲的请求发送
+
+        - 熔断器打开时直接返回 503，不访问上游（重试前同样检查，重试期间熔断则停止重试）
+        - 只有 GET（幂等）请求会重试与对冲
+        - 传输错误与其他异常计为失败；被取消的请求不计入，只释放半开状态的探测名额
+        """
+        endpoint = _endpoint_name(url)
+        breaker = _get_circuit_breaker(endpoint)
+        breaker_enabled = _BREAKER_CONFIG.get("enabled", True)
+
+        idempotent = method == "GET"
+        max_attempts = _RETRY_CONFIG.get("max_attempts", 3) if idempotent else 1
+        retry_statuses = set(
+            _RETRY_CONFIG.get("retry_statuses", [429, 500, 502, 503, 504])
+        )
+        hedge = idempotent and _HEDGE_CONFIG.get("enabled", True)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            # 每次尝试（包括重试）前都检查熔断器，熔断后不再访问上游
+            if breaker_enabled and not breaker.allow():
+                self.logger.warning(f"端点 {endpoint} 熔断中，快速失败: {method} {url}")
+                return Response(
+                    503,
+                    text=f"Circuit breaker open for endpoint {endpoint}",
+                    request=Request(method, url),
+                )
+
+            try:
+                if hedge:
+                    response = await self._send_hedged(endpoint, method, url, **kwargs)
+                else:
+                    response = await self._send(method, url, **kwargs)
+            except TransportError as e:
+                breaker.record_failure()
+                if attempt >= max_attempts:
+                    raise
+                delay = _backoff_delay(attempt)
+                self.logger.warning(
+                    f"{method} {url} 第 {attempt} 次请求失败: {e!r}，{delay:.2f}s 后重试"
+                )
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                # 取消（调用方超时、关闭等）：否则半开状态的探测名额永远不会释放
+                breaker.release_probe()
+                raise
+
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code not in retry_statuses or attempt >= max_attempts:
+                return response
+
+            delay = max(
+                _backoff_delay(attempt),
+                _parse_float(response.headers.get("Retry-After")) or 0.0,
+            )
+            self.logger.warning(
+                f"{method} {url} 返回 {response.status_code}，{delay:.2f}s 后第 {attempt + 1} 次重试"
+            )
+            await asyncio.sleep(delay)
+
+    async def _send_hedged(
+        self, endpoint: str, method: str, url: str, **kwargs
+    ) -> Response:
+        """
+        对冲请求：第一次请求超过该端点的 p95 延迟仍未返回时，再发一次，取先完成者
+        """
+        threshold = _get_latency_tracker(endpoint).percentile(
+            _HEDGE_CONFIG.get("percentile", 0.95),
+            _HEDGE_CONFIG.get("min_samples", 20),
+        )
+        if threshold is None:
+            return await self._send(method, url, **kwargs)
+
+        threshold = min(
+            max(threshold, _HEDGE_CONFIG.get("min_delay", 0.05)),
+            _HEDGE_CONFIG.get("max_delay", 5.0),
+        )
+        admitted = asyncio.Event()
+        primary = asyncio.ensure_future(
+            self._send(method, url, admitted=admitted, **kwargs)
+        )
+        pending: set[asyncio.Future] = {primary}
+        try:
+            # 在限流队列中等待的时间不计入对冲阈值
+            admitted_wait = asyncio.ensure_future(admitted.wait())
+            await asyncio.wait(
+                {primary, admitted_wait}, return_when=asyncio.FIRST_COMPLETED
+            )
+            admitted_wait.cancel()
+
+            done, pending = await asyncio.wait(pending, timeout=threshold)
+            if done:
+                return primary.result()
+
+            _hedge_stats["fired"] += 1
+            self.logger.info(
+                f"{method} {url} 超过 {threshold * 1000:.0f}ms，发出对冲请求"
+            )
+            hedged = asyncio.ensure_future(self._send(method, url, **kwargs))
+            pending = {primary, hedged}
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            _hedge_stats["won"] += 1
+                        return task.result()
+                    error = task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
 
     def _log_response(self, response: Response):
         """记录响应信息"""
@@ -248,28 +1169,42 @@ class APIClient:
             return {}
 
 
-# 创建默认的API客户端实例
+def get_coalesce_stats() -> dict:
+    """获取 GET 请求合并统计（总调用数 / 实际请求数 / 被合并数）"""
+    return _get_flight.stats()
+
+
+@scheduled_task(name="api_coalesce_stats", interval=600)
+async def scheduled_log_coalesce_stats():
+    """定期记录请求合并统计，用于观察节省的上游请求量"""
+    stats = get_coalesce_stats()
+    get_logger("api_client").info(
+        f"GET 请求合并统计: 调用 {stats['calls']} 次，实际请求 {stats['executions']} 次，"
+        f"合并 {stats['coalesced']} 次 ({stats['coalesce_ratio']:.1%})"
+    )
+
+
+# 默认的osu! API客户端（进程内单例）
+_osu_api_client: Optional[APIClient] = None
 
 
-# 默认的osu! API客户端
 def get_osu_api_client() -> APIClient:
     """获取osu! API客户端"""
-    # 自动创建 OAuth2Handler
-    oauth_handler = None
-    if OAUTH_APP_ID and OAUTH_SECRET:
-        oauth_handler = OAuth2Handler(
-            client_id=str(OAUTH_APP_ID),
-            client_secret=OAUTH_SECRET,
-            token_url=f"{API_URL.rstrip('/')}/oauth/token",
-        )
+    global _osu_api_client
+    if _osu_api_client is not None:
+        return _osu_api_client
+
+    # 与定时刷新任务共用同一个 OAuth2Handler
+    oauth_handler = _get_global_oauth_handler()
 
-    return APIClient(
+    _osu_api_client = APIClient(
         base_url=API_URL,
         headers={
             "User-Agent": "g0v0bot-discord/1.0",
             "Accept": "application/json",
             "Content-Type": "application/json",
         },
-        timeout=30.0,
+        timeout=_CLIENT_CONFIG.get("timeout", 30.0),
         oauth_handler=oauth_handler,
     )
+    return _osu_api_client
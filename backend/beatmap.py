@@ -1,14 +1,50 @@
-from backend.api_client import get_osu_api_client
+import asyncio
+
+from backend.api_client import (
+    background_requests,
+    get_cache_policy,
+    get_cache_projection,
+    get_osu_api_client,
+)
 from utils.logger import get_logger
 from utils.strings import get_api_url
-from utils.caches import get_cache, set_cache
+from utils.caches import get_or_fetch, get_or_fetch_many
+from utils.dataloader import DataLoader, settle
+from utils.negative_cache import NegativeCache
+from utils.projection import project
+from utils.request_scope import request_memoized
+from utils.singleflight import SingleFlight
+
+from backend.beatmap_store import (
+    get_stored_beatmap_by_checksum,
+    get_stored_beatmaps,
+    get_stored_beatmapset,
+    has_partial_beatmapset,
+    store_beatmaps,
+    store_beatmapset,
+)
+from backend.expections.beatmap import BeatmapNotFoundError, BeatmapQueryError
+
+# 批量谱面接口单次最多支持的 ID 数量
+BEATMAPS_BATCH_SIZE = 50
+# 不存在的谱面 ID 记录 1 小时
+BEATMAP_NEGATIVE_TTL = 3600
+
+_missing_beatmaps = NegativeCache("beatmap", ttl=BEATMAP_NEGATIVE_TTL)
 
-from backend.expections.beatmap import BeatmapNotFoundError
+_beatmapset_flight = SingleFlight("beatmapset")
+# 后台预取谱面集的任务（保留引用，避免任务在完成前被回收）
+_beatmapset_prefetches: set[asyncio.Task] = set()
 
 
+@request_memoized
 async def get_beatmap_info(beatmap_id: int):
     """
-    获取谱面详细信息（带缓存，24小时）
+    获取谱面详细信息（带缓存）
+
+    缓存策略见 config/api.yaml 中的 cache_policies.beatmap_info：
+    过软 TTL 后先返回旧值并在后台刷新，过硬 TTL 后同步刷新，API 不可用时仍返回旧值。
+    缓存未命中时读取持久化存储（backend.beatmap_store），存储中没有时请求单个谱面接口。
 
     Args:
         beatmap_id: 谱面 ID
@@ -16,32 +52,299 @@ async def get_beatmap_info(beatmap_id: int):
     Returns:
         谱面信息字典
     """
-    cache_key = f"beatmap:info:{beatmap_id}"
+    if await _missing_beatmaps.is_missing(str(beatmap_id)):
+        raise BeatmapNotFoundError(beatmap_id)
+
+    return await get_or_fetch(
+        _beatmap_cache_key(beatmap_id),
+        lambda: _fetch_beatmap_info(beatmap_id),
+        **get_cache_policy("beatmap_info").options(),
+        # 谱面已确认不存在（404）时不再返回旧值
+        serve_stale_if=lambda e: not isinstance(e, BeatmapNotFoundError),
+    )
+
+
+async def _fetch_beatmap_info(beatmap_id: int) -> dict:
+    """
+    获取单个谱面信息：先查持久化存储，未命中时请求单个谱面接口
+
+    同一谱面集中已经有其他难度被查询过时（说明同一谱面集的难度会被陆续查询），
+    在后台获取整个谱面集，其余难度一并写入存储，之后查询它们不再需要请求 API。
+    """
+    stored = await get_stored_beatmaps([beatmap_id])
+    if beatmap_id in stored:
+        return stored[beatmap_id]
 
-    # 先查缓存
-    cached = await get_cache(cache_key)
-    if cached:
-        get_logger("backend").debug(f"Cache hit for beatmap {beatmap_id}")
-        return cached
+    beatmap = await _request_beatmap_info(beatmap_id)
+    await store_beatmaps([beatmap])
+    beatmapset_id = beatmap.get("beatmapset_id")
+    if beatmapset_id and await has_partial_beatmapset(beatmapset_id, beatmap_id):
+        _prefetch_beatmapset(beatmapset_id)
+    return beatmap
 
-    # 缓存未命中，请求 API
+
+def _prefetch_beatmapset(beatmapset_id: int) -> None:
+    """在后台（BACKGROUND 优先级）获取整个谱面集，失败只记录日志"""
+
+    async def run() -> None:
+        with background_requests():
+            try:
+                await get_beatmapset_info(beatmapset_id)
+            except Exception as e:
+                get_logger("backend").warning(f"预取谱面集 {beatmapset_id} 失败: {e}")
+
+    task = asyncio.ensure_future(run())
+    _beatmapset_prefetches.add(task)
+    task.add_done_callback(_beatmapset_prefetches.discard)
+
+
+def _split_beatmapset(data: dict) -> tuple[dict, list[dict]]:
+    """把 /beatmapsets 的响应拆分为投影后的谱面集与各难度（难度带有精简的 beatmapset）"""
+    beatmapset = {key: value for key, value in data.items() if key != "beatmaps"}
+    projection = get_cache_projection("beatmap")
+    beatmaps = [
+        project({**beatmap, "beatmapset": beatmapset}, projection)
+        for beatmap in data.get("beatmaps") or []
+    ]
+    return project(beatmapset, get_cache_projection("beatmapset")), beatmaps
+
+
+async def _fetch_beatmapset(beatmapset_id: int) -> None:
+    """
+    请求 /beatmapsets/{id} 并把谱面集与全部难度批量写入存储
+
+    Raises:
+        BeatmapNotFoundError: 谱面集不存在（beatmap_id 为谱面集 ID）
+        BeatmapQueryError: 请求失败，或响应中没有难度列表（不能当作完整的谱面集保存）
+    """
+    client = get_osu_api_client()
+    url = get_api_url("beatmapset_info", beatmapset_id=beatmapset_id)
+    # 谱面集持久化后不再需要 HTTP 响应缓存
+    response = await client.get(url, cache=False)
+    get_logger("backend").info(
+        f"Requesting endpoint {url} for beatmapset_id {beatmapset_id} returned {response.status_code}"
+    )
+
+    if response.status_code == 404:
+        raise BeatmapNotFoundError(beatmapset_id)
+
+    if response.status_code != 200:
+        get_logger("backend").error(
+            f"API error: {response.status_code} - {response.text}"
+        )
+        raise BeatmapQueryError(
+            beatmapset_id,
+            f"API returned {response.status_code} when requesting endpoint {url}",
+            response.status_code,
+        )
+
+    beatmapset, beatmaps = _split_beatmapset(response.json())
+    if not beatmaps:
+        raise BeatmapQueryError(
+            beatmapset_id,
+            f"Endpoint {url} returned a beatmapset without beatmaps",
+            response.status_code,
+        )
+    await store_beatmapset(beatmapset, beatmaps)
+
+
+async def _request_beatmap_info(beatmap_id: int) -> dict:
+    """请求 API 获取单个谱面信息"""
     client = get_osu_api_client()
     url = get_api_url("beatmap_info", beatmap_id=beatmap_id)
 
-    response = await client.get(url)
+    # 按谱面缓存在 get_beatmap_info 中完成，这里不再缓存整个响应
+    response = await client.get(url, cache=False)
     get_logger("backend").info(
         f"Requesting endpoint {url} for beatmap_id {beatmap_id} returned {response.status_code}"
     )
 
+    if response.status_code == 404:
+        await _missing_beatmaps.mark_missing(str(beatmap_id))
+        raise BeatmapNotFoundError(beatmap_id)
+
     if response.status_code != 200:
         get_logger("backend").error(
             f"API error: {response.status_code} - {response.text}"
         )
-        raise BeatmapNotFoundError(beatmap_id)
+        raise BeatmapQueryError(
+            beatmap_id,
+            f"API returned {response.status_code} when requesting endpoint {url}",
+            response.status_code,
+        )
+
+    # 只缓存 cache_projections.beatmap 中声明的字段
+    return project(response.json(), get_cache_projection("beatmap"))
+
+
+def _beatmap_cache_key(beatmap_id: int) -> str:
+    return f"beatmap:info:{beatmap_id}"
+
+
+async def get_beatmaps_info(beatmap_ids: list[int]) -> dict[int, dict]:
+    """
+    批量获取谱面详细信息（带缓存，策略同 get_beatmap_info）
+
+    先查缓存，未命中的 ID 通过批量接口 /beatmaps/?ids[]= 一次性获取，
+    每次最多 BEATMAPS_BATCH_SIZE 个，结果按 ID 逐个写入缓存。
+
+    Args:
+        beatmap_ids: 谱面 ID 列表
+
+    Returns:
+        谱面 ID -> 谱面信息字典；找不到的谱面不会出现在结果中
+    """
+    beatmap_ids = [
+        beatmap_id
+        for beatmap_id in dict.fromkeys(beatmap_ids)
+        if not await _missing_beatmaps.is_missing(str(beatmap_id))
+    ]
+    return await get_or_fetch_many(
+        beatmap_ids,
+        _beatmap_cache_key,
+        _fetch_beatmaps_info,
+        **get_cache_policy("beatmap_info").options(),
+    )
+
+
+async def _fetch_beatmaps_info(beatmap_ids: list[int]) -> dict[int, dict]:
+    """
+    先查持久化存储，其余通过批量接口分批获取，每批成功后立即写入存储
+
+    Raises:
+        BeatmapQueryError: 某一批请求失败（之前成功的分批已经写入存储）
+    """
+    results = await get_stored_beatmaps(beatmap_ids)
+    beatmap_ids = [
+        beatmap_id for beatmap_id in beatmap_ids if beatmap_id not in results
+    ]
+
+    client = get_osu_api_client()
+    url = get_api_url("beatmaps_lookup")
+
+    projection = get_cache_projection("beatmap")
+    for i in range(0, len(beatmap_ids), BEATMAPS_BATCH_SIZE):
+        chunk = beatmap_ids[i : i + BEATMAPS_BATCH_SIZE]
+        response = await client.get(url, params={"ids[]": chunk}, cache=False)
+        get_logger("backend").info(
+            f"Requesting endpoint {url} for {len(chunk)} beatmaps returned {response.status_code}"
+        )
+
+        if response.status_code != 200:
+            get_logger("backend").error(
+                f"API error: {response.status_code} - {response.text}"
+            )
+            raise BeatmapQueryError(
+                ",".join(map(str, chunk)),
+                f"API returned {response.status_code} when requesting endpoint {url}",
+                response.status_code,
+            )
 
-    data = response.json()
+        # 批量接口不返回的 ID 不一定不存在，不写入不存在记录（由单个谱面接口确认）
+        fetched = [
+            project(beatmap, projection)
+            for beatmap in response.json().get("beatmaps", [])
+            if beatmap.get("id") is not None
+        ]
+        await store_beatmaps(fetched)
+        results.update((beatmap["id"], beatmap) for beatmap in fetched)
 
-    # 写入缓存，24小时
-    await set_cache(cache_key, data, ttl=86400)
+    return results
+
+
+@request_memoized
+async def get_beatmapset_info(beatmapset_id: int) -> dict:
+    """
+    获取谱面集信息及其全部难度（beatmaps）
+
+    优先读取持久化存储；请求 /beatmapsets/{id} 后全部难度批量写入，
+    之后按谱面 ID 查询其中任意难度都不需要再请求 API。
+
+    Raises:
+        BeatmapNotFoundError: 谱面集不存在（beatmap_id 为谱面集 ID）
+        BeatmapQueryError: 请求失败
+    """
+    stored = await get_stored_beatmapset(beatmapset_id)
+    if stored is not None:
+        return stored
+
+    await _beatmapset_flight.do(
+        str(beatmapset_id), lambda: _fetch_beatmapset(beatmapset_id)
+    )
+    stored = await get_stored_beatmapset(beatmapset_id)
+    if stored is None:
+        raise BeatmapNotFoundError(beatmapset_id)
+    return stored
+
+
+@request_memoized
+async def get_beatmap_info_by_checksum(checksum: str) -> dict:
+    """
+    按 .osu 文件的 MD5 获取谱面信息：先查持久化存储，未命中时请求 /beatmaps/lookup 并写入存储
+
+    Raises:
+        BeatmapNotFoundError: 谱面不存在（beatmap_id 为 checksum）
+        BeatmapQueryError: 请求失败
+    """
+    stored = await get_stored_beatmap_by_checksum(checksum)
+    if stored is not None:
+        return stored
 
-    return data
+    client = get_osu_api_client()
+    url = get_api_url("beatmap_checksum_lookup")
+    response = await client.get(url, params={"checksum": checksum}, cache=False)
+    get_logger("backend").info(
+        f"Requesting endpoint {url} for checksum {checksum} returned {response.status_code}"
+    )
+
+    if response.status_code == 404:
+        raise BeatmapNotFoundError(checksum)
+
+    if response.status_code != 200:
+        get_logger("backend").error(
+            f"API error: {response.status_code} - {response.text}"
+        )
+        raise BeatmapQueryError(
+            checksum,
+            f"API returned {response.status_code} when requesting endpoint {url}",
+            response.status_code,
+        )
+
+    beatmap = project(response.json(), get_cache_projection("beatmap"))
+    await store_beatmaps([beatmap])
+    return beatmap
+
+
+async def _batch_load_beatmaps(beatmap_ids: list[int]) -> dict[int, dict | Exception]:
+    """
+    DataLoader 的批量函数
+
+    批量结果中缺少的谱面再通过单个谱面接口查询，只有其返回 404 时才是 BeatmapNotFoundError。
+    """
+    found: dict[int, dict | Exception] = dict(await get_beatmaps_info(beatmap_ids))
+    absent = [beatmap_id for beatmap_id in beatmap_ids if beatmap_id not in found]
+    if absent:
+        results = await asyncio.gather(
+            *(settle(get_beatmap_info(beatmap_id)) for beatmap_id in absent)
+        )
+        found.update(zip(absent, results))
+    return {beatmap_id: found[beatmap_id] for beatmap_id in beatmap_ids}
+
+
+_beatmap_loader = DataLoader(
+    _batch_load_beatmaps, max_batch_size=BEATMAPS_BATCH_SIZE, name="beatmap"
+)
+
+
+async def load_beatmap_info(beatmap_id: int) -> dict:
+    """
+    获取单个谱面信息，同一轮事件循环内的并发调用会合并为一次批量请求
+
+    适合在 asyncio.gather 中为列表的每一项调用，
+    例如成绩列表补全谱面信息时，一个列表只需一次请求。
+
+    Raises:
+        BeatmapNotFoundError: 谱面不存在
+        BeatmapQueryError: 请求失败
+    """
+    return await _beatmap_loader.load(int(beatmap_id))
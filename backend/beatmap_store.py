@@ -0,0 +1,216 @@
+"""
+谱面 / 谱面集的持久化存储
+
+表结构见 backend.database.StoredBeatmap / StoredBeatmapset，
+按谱面 ID（主键）、谱面集 ID、checksum（均有索引）查询。
+写入的数据已经按 config/api.yaml 的 cache_projections 投影，请求与投影在 backend.beatmap 中完成。
+"""
+
+import json
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import col, select
+
+from backend.database import StoredBeatmap, StoredBeatmapset, engine
+
+# 状态不会再变化的谱面长期保存，其他状态（pending、qualified 等）过期后重新获取
+FINAL_STATUSES = frozenset({"ranked", "approved", "loved"})
+STORE_TTL = 86400
+
+_insert_beatmap = sqlite_insert(StoredBeatmap)
+_UPSERT_BEATMAP = _insert_beatmap.on_conflict_do_update(
+    index_elements=["id"],
+    set_={
+        column.name: _insert_beatmap.excluded[column.name]
+        for column in _insert_beatmap.table.columns
+        if column.name != "id"
+    },
+)
+
+_insert_beatmapset = sqlite_insert(StoredBeatmapset)
+_UPSERT_BEATMAPSET = _insert_beatmapset.on_conflict_do_update(
+    index_elements=["id"],
+    set_={
+        column.name: _insert_beatmapset.excluded[column.name]
+        for column in _insert_beatmapset.table.columns
+        if column.name != "id"
+    },
+)
+# 单个谱面附带的谱面集信息：已有记录时不覆盖（避免把完整的谱面集标记为不完整）
+_INSERT_BEATMAPSET_IF_MISSING = _insert_beatmapset.on_conflict_do_nothing(
+    index_elements=["id"]
+)
+
+
+def is_fresh(status: str, fetched_at: float) -> bool:
+    return status in FINAL_STATUSES or time.time() - fetched_at < STORE_TTL
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _beatmap_row(beatmap: dict, now: float) -> dict:
+    beatmapset = beatmap.get("beatmapset") or {}
+    return {
+        "id": int(beatmap["id"]),
+        "beatmapset_id": int(beatmap.get("beatmapset_id") or beatmapset.get("id") or 0),
+        "checksum": beatmap.get("checksum"),
+        "status": str(beatmap.get("status") or ""),
+        "fetched_at": now,
+        "data": _dumps(beatmap),
+    }
+
+
+def _beatmapset_row(beatmapset: dict, complete: bool, now: float) -> dict:
+    return {
+        "id": int(beatmapset["id"]),
+        "status": str(beatmapset.get("status") or ""),
+        "complete": complete,
+        "fetched_at": now,
+        "data": _dumps(beatmapset),
+    }
+
+
+async def store_beatmaps(beatmaps: list[dict]) -> None:
+    """写入单个 / 批量谱面接口返回的谱面（同一事务），附带的谱面集信息仅在不存在时写入"""
+    now = time.time()
+    rows = [_beatmap_row(beatmap, now) for beatmap in beatmaps if beatmap.get("id")]
+    if not rows:
+        return
+    beatmapsets = {
+        int(beatmap["beatmapset"]["id"]): _beatmapset_row(
+            beatmap["beatmapset"], False, now
+        )
+        for beatmap in beatmaps
+        if (beatmap.get("beatmapset") or {}).get("id")
+    }
+    async with engine.begin() as conn:
+        await conn.execute(_UPSERT_BEATMAP, rows)
+        if beatmapsets:
+            await conn.execute(
+                _INSERT_BEATMAPSET_IF_MISSING, list(beatmapsets.values())
+            )
+
+
+async def store_beatmapset(beatmapset: dict, beatmaps: list[dict]) -> None:
+    """
+    写入完整的谱面集与其全部难度（同一事务，难度批量插入）
+
+    只有 beatmaps 非空时谱面集才标记为完整，否则只更新谱面集本身的信息。
+
+    Args:
+        beatmapset: 谱面集（不含 beatmaps）
+        beatmaps: 各难度，每个都带有精简的 beatmapset
+    """
+    now = time.time()
+    async with engine.begin() as conn:
+        await conn.execute(
+            _UPSERT_BEATMAPSET, _beatmapset_row(beatmapset, bool(beatmaps), now)
+        )
+        rows = [_beatmap_row(beatmap, now) for beatmap in beatmaps if beatmap.get("id")]
+        if rows:
+            await conn.execute(_UPSERT_BEATMAP, rows)
+
+
+async def get_stored_beatmaps(beatmap_ids: Iterable[int]) -> dict[int, dict]:
+    """按谱面 ID 批量读取未过期的谱面，不存在或已过期的 ID 不会出现在结果中"""
+    beatmap_ids = list(beatmap_ids)
+    if not beatmap_ids:
+        return {}
+    statement = select(
+        StoredBeatmap.id,
+        StoredBeatmap.status,
+        StoredBeatmap.fetched_at,
+        StoredBeatmap.data,
+    ).where(col(StoredBeatmap.id).in_(beatmap_ids))
+    async with engine.connect() as conn:
+        rows = (await conn.execute(statement)).all()
+    return {
+        beatmap_id: json.loads(data)
+        for beatmap_id, status, fetched_at, data in rows
+        if is_fresh(status, fetched_at)
+    }
+
+
+async def get_stored_beatmap_by_checksum(checksum: str) -> Optional[dict]:
+    """按 .osu 文件的 MD5 读取未过期的谱面"""
+    statement = select(
+        StoredBeatmap.status, StoredBeatmap.fetched_at, StoredBeatmap.data
+    ).where(StoredBeatmap.checksum == checksum)
+    async with engine.connect() as conn:
+        row = (await conn.execute(statement)).first()
+    if row is None or not is_fresh(row.status, row.fetched_at):
+        return None
+    return json.loads(row.data)
+
+
+async def has_partial_beatmapset(beatmapset_id: int, beatmap_id: int) -> bool:
+    """谱面集在存储中不完整（或已过期），且已有 beatmap_id 以外的难度"""
+    async with engine.connect() as conn:
+        beatmapset = (
+            await conn.execute(
+                select(
+                    StoredBeatmapset.complete,
+                    StoredBeatmapset.status,
+                    StoredBeatmapset.fetched_at,
+                ).where(StoredBeatmapset.id == beatmapset_id)
+            )
+        ).first()
+        if (
+            beatmapset is not None
+            and beatmapset.complete
+            and is_fresh(beatmapset.status, beatmapset.fetched_at)
+        ):
+            return False
+        sibling = (
+            await conn.execute(
+                select(StoredBeatmap.id)
+                .where(
+                    StoredBeatmap.beatmapset_id == beatmapset_id,
+                    StoredBeatmap.id != beatmap_id,
+                )
+                .limit(1)
+            )
+        ).first()
+    return sibling is not None
+
+
+async def get_stored_beatmapset(beatmapset_id: int) -> Optional[dict]:
+    """
+    读取完整且未过期的谱面集，beatmaps 中为各难度（按难度星数排序）
+
+    只通过单个谱面写入、难度不完整的谱面集视为不存在。
+    """
+    statement = select(StoredBeatmapset).where(StoredBeatmapset.id == beatmapset_id)
+    async with engine.connect() as conn:
+        beatmapset = (await conn.execute(statement)).first()
+        if (
+            beatmapset is None
+            or not beatmapset.complete
+            or not is_fresh(beatmapset.status, beatmapset.fetched_at)
+        ):
+            return None
+        beatmaps = (
+            (
+                await conn.execute(
+                    select(StoredBeatmap.data).where(
+                        StoredBeatmap.beatmapset_id == beatmapset_id
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    result = json.loads(beatmapset.data)
+    result["beatmaps"] = sorted(
+        (json.loads(data) for data in beatmaps),
+        key=lambda beatmap: beatmap.get("difficulty_rating") or 0,
+    )
+    # 与 /beatmapsets 接口一致，难度中不重复包含谱面集
+    for beatmap in result["beatmaps"]:
+        beatmap.pop("beatmapset", None)
+    return result
@@ -1,10 +1,35 @@
+"""
+数据库（SQLite + aiosqlite）
+
+存储配置（每个连接建立时设置）:
+    - journal_mode=WAL: 读不阻塞写、写不阻塞读，提交只追加 WAL 文件
+    - synchronous=NORMAL: WAL 模式下只在检查点时 fsync，断电可能丢失最近的事务，但不会损坏数据库
+    - mmap_size: 读取通过内存映射完成，减少 read 系统调用
+    - busy_timeout: 遇到写锁时等待，而不是立即抛出 database is locked
+连接池常驻少量连接（aiosqlite 每个连接一个线程），会话不再每次重新打开文件、设置 PRAGMA。
+
+写入使用单条语句：保存为 INSERT ... ON CONFLICT DO UPDATE，删除为 DELETE ... WHERE，
+语句在模块加载时构造一次，SQLAlchemy 的编译缓存与 sqlite3 的预编译语句缓存都能命中。
+
+新增表时的索引约定:
+    - 最常用的查询键作为主键（SQLite 表按 rowid / 主键组织，主键查询不需要回表）
+    - 其他等值查询列使用 Field(index=True)
+    - 多列条件或带排序的查询在 __table_args__ 中声明复合索引，等值列在前、范围 / 排序列在后
+    - 只为实际存在的查询建索引，每个索引都会增加写入成本
+    - 关闭时执行 PRAGMA optimize，由 SQLite 按需更新查询规划所需的统计信息
+"""
+
+import asyncio
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
-from sqlmodel import Field, SQLModel, select
+from sqlalchemy import Index, bindparam, delete, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Field, SQLModel, col, select
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession as SQLModelAsyncSession
-from utils.variable import SQL_DB_FILE
+from utils.variable import SQL_DB_FILE, SQL_DB_MMAP_SIZE, SQL_DB_POOL_SIZE
 
 
 class OsuUser(SQLModel, table=True):
@@ -18,9 +43,126 @@ class OsuUser(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.now)
 
 
-# 异步引擎：注意是 sqlite+aiosqlite
-sqlite_url = f"sqlite+aiosqlite:///{SQL_DB_FILE}"
-engine = create_async_engine(sqlite_url)
+class ArchivedScore(SQLModel, table=True):
+    """
+    本地成绩存档，按 (成绩 ID, 列表, 模式) 存储
+
+    list_type:
+        recent  - 最近成绩（含失败），按 ended_at 排序
+        best    - BP 列表，按 position（上游返回的顺序）排序
+        beatmap - 用户在某个谱面上的全部成绩
+    """
+
+    __table_args__ = (
+        Index("ix_archivedscore_user_type_ended", "user_id", "list_type", "ended_at"),
+        Index("ix_archivedscore_beatmap_user", "beatmap_id", "user_id"),
+    )
+
+    score_id: int = Field(primary_key=True)
+    list_type: str = Field(primary_key=True)
+    # 具体的模式，查询未指定模式时为用户的默认模式
+    mode: str = Field(primary_key=True, default="")
+    user_id: int
+    beatmap_id: int
+    ended_at: (
+        str  # 规范化的 UTC 时间（score_archive.ENDED_AT_FORMAT），字典序即时间顺序
+    )
+    passed: bool = True
+    position: int = 0
+    data: str  # 成绩的原始 JSON
+
+
+class ScoreSyncState(SQLModel, table=True):
+    """成绩存档的同步状态，每个 (用户, 列表, 模式) 一行"""
+
+    user_id: int = Field(primary_key=True)
+    list_key: str = Field(primary_key=True)  # recent / best / beatmap:{beatmap_id}
+    mode: str = Field(primary_key=True, default="")
+    synced_at: float  # 最近一次从上游获取的时间（time.time()）
+    # recent：最近一次无法与已有存档衔接、整体重建的时间
+    reset_at: float = 0
+    # 其他列表：同步时本地 recent 存档中最新的成绩 ID，只有之后的成绩可能改变该列表
+    watermark: int = 0
+
+
+class StoredBeatmapset(SQLModel, table=True):
+    """持久化的谱面集（字段按 cache_projections.beatmapset 投影）"""
+
+    id: int = Field(primary_key=True)
+    status: str = ""
+    # 是否通过 /beatmapsets 接口获取过，即 beatmap 表中已有全部难度
+    complete: bool = False
+    fetched_at: float  # time.time()
+    data: str  # 谱面集 JSON（不含 beatmaps）
+
+
+class StoredBeatmap(SQLModel, table=True):
+    """持久化的谱面（字段按 cache_projections.beatmap 投影，含精简的 beatmapset）"""
+
+    id: int = Field(primary_key=True)
+    beatmapset_id: int = Field(index=True)
+    checksum: str | None = Field(default=None, index=True)  # .osu 文件的 MD5
+    status: str = ""
+    fetched_at: float  # time.time()
+    data: str  # 谱面 JSON
+
+
+# 每个新连接执行的 PRAGMA
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": SQL_DB_MMAP_SIZE,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+    "cache_size": -16000,  # 负数单位为 KiB，即 16 MiB 页缓存
+}
+
+
+def create_sqlite_engine(path: str, tuned: bool = True):
+    """
+    创建 SQLite 异步引擎
+
+    Args:
+        path: 数据库文件路径
+        tuned: 是否使用上述存储配置与连接池设置（False 时为 SQLAlchemy 默认配置，供基准测试对比）
+    """
+    # 异步引擎：注意是 sqlite+aiosqlite
+    url = f"sqlite+aiosqlite:///{path}"
+    if not tuned:
+        return create_async_engine(url)
+
+    sqlite_engine = create_async_engine(
+        url,
+        pool_size=SQL_DB_POOL_SIZE,
+        max_overflow=SQL_DB_POOL_SIZE,
+        pool_timeout=10,
+    )
+
+    @event.listens_for(sqlite_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return sqlite_engine
+
+
+engine = create_sqlite_engine(SQL_DB_FILE)
+
+_upsert = sqlite_insert(OsuUser)
+_UPSERT_OSU_USER = _upsert.on_conflict_do_update(
+    index_elements=["discord_id"],
+    # 更新时保留首次绑定的 created_at
+    set_={
+        column.name: _upsert.excluded[column.name]
+        for column in _upsert.table.columns
+        if column.name not in ("discord_id", "created_at")
+    },
+)
+_DELETE_OSU_USER = delete(OsuUser).where(
+    col(OsuUser.discord_id) == bindparam("discord_id")
+)
 
 
 async def create_db_and_tables():
@@ -32,6 +174,41 @@ async def get_session() -> SQLModelAsyncSession:
     return SQLModelAsyncSession(engine)
 
 
+@dataclass(frozen=True, slots=True)
+class OsuBinding:
+    """Discord 用户绑定的 osu! 账号"""
+
+    osu_id: int
+    osu_username: str
+
+
+# Discord ID -> 绑定信息的内存索引：启动时整体加载，save_osu_user / delete_osu_user_by_discord_id 同步更新
+_binding_index: dict[int, OsuBinding] = {}
+_binding_index_loaded = False
+_binding_index_lock = asyncio.Lock()
+
+
+async def load_binding_index() -> int:
+    """从数据库加载绑定索引，返回绑定数量"""
+    global _binding_index_loaded
+    async with _binding_index_lock:
+        async with SQLModelAsyncSession(engine) as session:
+            statement = select(OsuUser.discord_id, OsuUser.osu_id, OsuUser.osu_username)
+            rows = (await session.exec(statement)).all()
+        _binding_index.clear()
+        for discord_id, osu_id, osu_username in rows:
+            _binding_index[discord_id] = OsuBinding(osu_id, osu_username)
+        _binding_index_loaded = True
+    return len(_binding_index)
+
+
+async def get_osu_binding(discord_id: int) -> Optional[OsuBinding]:
+    """通过内存索引查询绑定（不访问数据库）"""
+    if not _binding_index_loaded:
+        await load_binding_index()
+    return _binding_index.get(discord_id)
+
+
 async def get_osu_user_by_discord_id(discord_id: int) -> Optional[OsuUser]:
     async with SQLModelAsyncSession(engine) as session:
         statement = select(OsuUser).where(OsuUser.discord_id == discord_id)
@@ -40,22 +217,24 @@ async def get_osu_user_by_discord_id(discord_id: int) -> Optional[OsuUser]:
 
 
 async def save_osu_user(user: OsuUser):
-    async with SQLModelAsyncSession(engine) as session:
-        user.updated_at = datetime.now()
-        await session.merge(user)
-        await session.commit()
+    user.updated_at = datetime.now()
+    async with engine.begin() as conn:
+        await conn.execute(_UPSERT_OSU_USER, user.model_dump())
+    _binding_index[user.discord_id] = OsuBinding(user.osu_id, user.osu_username)
 
 
 async def delete_osu_user_by_discord_id(discord_id: int) -> bool:
     """Delete osu user by Discord ID"""
-    async with SQLModelAsyncSession(engine) as session:
-        statement = select(OsuUser).where(OsuUser.discord_id == discord_id)
-        results = await session.exec(statement)
-        user = results.first()
-
-        if user is None:
-            return False
-
-        await session.delete(user)
-        await session.commit()
-        return True
+    async with engine.begin() as conn:
+        result = await conn.execute(_DELETE_OSU_USER, {"discord_id": discord_id})
+    _binding_index.pop(discord_id, None)
+    return result.rowcount > 0
+
+
+async def close_database() -> None:
+    """关闭前让 SQLite 更新查询统计信息，并释放连接池"""
+    try:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("PRAGMA optimize")
+    finally:
+        await engine.dispose()
@@ -2,8 +2,22 @@ from discord.ext.commands import CommandError
 
 
 class BeatmapNotFoundError(CommandError):
-    beatmap_id: int
+    beatmap_id: int | str
 
-    def __init__(self, beatmap_id: int):
+    def __init__(self, beatmap_id: int | str):
         self.beatmap_id = beatmap_id
         super().__init__(f"Beatmap {beatmap_id} not found")
+
+
+class BeatmapQueryError(CommandError):
+    """请求谱面信息失败（上游错误，而不是谱面不存在）"""
+
+    beatmap_id: int | str
+    error_msg: str
+    status_code: int
+
+    def __init__(self, beatmap_id: int | str, error_msg: str, status_code: int):
+        self.beatmap_id = beatmap_id
+        self.error_msg = error_msg
+        self.status_code = status_code
+        super().__init__(f"Beatmap {beatmap_id} query error: {error_msg}")
@@ -0,0 +1,345 @@
+"""
+本地成绩存档的读写
+
+表结构见 backend.database.ArchivedScore / ScoreSyncState，
+同步策略（什么时候请求上游、什么时候直接读存档）在 backend.scores 中。
+"""
+
+import json
+import time
+from datetime import UTC, datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import (
+    String,
+    and_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    exists,
+    func,
+    literal,
+    or_,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import col, select
+
+from backend.database import ArchivedScore, ScoreSyncState, engine
+
+_upsert_score = sqlite_insert(ArchivedScore)
+_UPSERT_SCORE = _upsert_score.on_conflict_do_update(
+    index_elements=["score_id", "list_type", "mode"],
+    set_={
+        column.name: _upsert_score.excluded[column.name]
+        for column in _upsert_score.table.columns
+        if column.name not in ("score_id", "list_type", "mode")
+    },
+)
+
+_upsert_state = sqlite_insert(ScoreSyncState)
+_UPSERT_SYNC_STATE = _upsert_state.on_conflict_do_update(
+    index_elements=["user_id", "list_key", "mode"],
+    set_={
+        "synced_at": _upsert_state.excluded.synced_at,
+        "reset_at": _upsert_state.excluded.reset_at,
+        "watermark": _upsert_state.excluded.watermark,
+    },
+)
+
+
+# ended_at 的存储格式：UTC、精确到秒、定长，字典序即时间顺序
+ENDED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def format_ended_at(moment: datetime) -> str:
+    return moment.astimezone(UTC).strftime(ENDED_AT_FORMAT)
+
+
+def normalize_ended_at(value: Any) -> str:
+    """
+    把上游返回的时间（可能带小数秒、Z 或 +08:00 等时区偏移）规范为 ENDED_AT_FORMAT
+
+    无法解析时返回空字符串（排在所有成绩之前，会被当作过期成绩清理）。
+    """
+    if not value:
+        return ""
+    try:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return ""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return format_ended_at(moment)
+
+
+def score_id_of(score: dict) -> Optional[int]:
+    score_id = score.get("id") or score.get("score_id")
+    return int(score_id) if score_id else None
+
+
+def _to_row(
+    score: dict, list_type: str, user_id: int, mode: str, position: int
+) -> Optional[dict]:
+    score_id = score_id_of(score)
+    if score_id is None:
+        return None
+    beatmap = score.get("beatmap") or {}
+    return {
+        "score_id": score_id,
+        "list_type": list_type,
+        "user_id": user_id,
+        "mode": mode,
+        "beatmap_id": int(score.get("beatmap_id") or beatmap.get("id") or 0),
+        "ended_at": normalize_ended_at(
+            score.get("ended_at") or score.get("created_at")
+        ),
+        "passed": bool(score.get("passed", True)),
+        "position": position,
+        "data": json.dumps(score, ensure_ascii=False, separators=(",", ":")),
+    }
+
+
+async def store_scores(
+    scores: list[dict],
+    list_type: str,
+    user_id: int,
+    mode: str,
+    replace_beatmap_id: Optional[int] = None,
+    replace: bool = False,
+) -> None:
+    """
+    写入成绩（同一事务）
+
+    Args:
+        replace: 先删除该用户在此列表 / 模式下的全部成绩（best 等整体替换的列表）
+        replace_beatmap_id: 只删除该谱面上的成绩后再写入（beatmap 列表）
+    """
+    rows = [
+        row
+        for position, score in enumerate(scores)
+        if (row := _to_row(score, list_type, user_id, mode, position)) is not None
+    ]
+    async with engine.begin() as conn:
+        if replace or replace_beatmap_id is not None:
+            statement = delete(ArchivedScore).where(
+                col(ArchivedScore.user_id) == user_id,
+                col(ArchivedScore.list_type) == list_type,
+                col(ArchivedScore.mode) == mode,
+            )
+            if replace_beatmap_id is not None:
+                statement = statement.where(
+                    col(ArchivedScore.beatmap_id) == replace_beatmap_id
+                )
+            await conn.execute(statement)
+        if rows:
+            await conn.execute(_UPSERT_SCORE, rows)
+
+
+async def load_scores(
+    list_type: str,
+    user_id: int,
+    mode: str,
+    beatmap_id: Optional[int] = None,
+    ended_after: Optional[str] = None,
+    passed_only: bool = False,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> list[dict]:
+    """
+    读取成绩：recent 按 ended_at 从新到旧，其他列表按写入时的顺序
+    （走 (user_id, list_type, ended_at) 或 (beatmap_id, user_id) 索引）
+
+    Args:
+        ended_after: ENDED_AT_FORMAT 格式的时间，见 format_ended_at
+    """
+    statement = select(ArchivedScore.data).where(
+        ArchivedScore.user_id == user_id,
+        ArchivedScore.list_type == list_type,
+        ArchivedScore.mode == mode,
+    )
+    if beatmap_id is not None:
+        statement = statement.where(ArchivedScore.beatmap_id == beatmap_id)
+    if ended_after is not None:
+        statement = statement.where(ArchivedScore.ended_at > ended_after)
+    if passed_only:
+        statement = statement.where(col(ArchivedScore.passed).is_(True))
+    if list_type == "recent":
+        # ended_at 精确到秒，同一秒内按成绩 ID（提交顺序）排序
+        statement = statement.order_by(
+            col(ArchivedScore.ended_at).desc(), col(ArchivedScore.score_id).desc()
+        )
+    else:
+        statement = statement.order_by(col(ArchivedScore.position))
+    statement = statement.offset(offset)
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(statement)).scalars().all()
+    return [json.loads(data) for data in rows]
+
+
+async def prune_scores(
+    list_type: str, user_id: int, mode: str, ended_before: str
+) -> None:
+    """删除 ended_at 早于 ended_before（ENDED_AT_FORMAT）的成绩（recent 只保留上游仍会返回的时间范围）"""
+    async with engine.begin() as conn:
+        await conn.execute(
+            delete(ArchivedScore).where(
+                col(ArchivedScore.user_id) == user_id,
+                col(ArchivedScore.list_type) == list_type,
+                col(ArchivedScore.mode) == mode,
+                col(ArchivedScore.ended_at) < ended_before,
+            )
+        )
+
+
+async def prune_archive(
+    recent_before: datetime, lists_synced_before: float
+) -> tuple[int, int]:
+    """
+    清理不再使用的存档（包括之后再也没有查询过的用户）
+
+        - recent: 删除 ended_at 早于 recent_before 的成绩，以及在此之前同步、成绩已全部过期的同步状态
+        - best / beatmap: 删除 lists_synced_before 之前同步的列表及其同步状态
+          （这些列表已经不可信，下次查询时会重新获取）
+
+    Returns:
+        (删除的成绩数, 删除的同步状态数)
+    """
+    # 成绩所属列表的同步状态键：beatmap 列表为 beatmap:{beatmap_id}，其他与 list_type 相同
+    list_key = case(
+        (
+            col(ArchivedScore.list_type) == "beatmap",
+            literal("beatmap:") + cast(ArchivedScore.beatmap_id, String),
+        ),
+        else_=ArchivedScore.list_type,
+    )
+    async with engine.begin() as conn:
+        removed_states = (
+            await conn.execute(
+                delete(ScoreSyncState).where(
+                    or_(
+                        and_(
+                            col(ScoreSyncState.list_key) == "recent",
+                            col(ScoreSyncState.synced_at) < recent_before.timestamp(),
+                        ),
+                        and_(
+                            col(ScoreSyncState.list_key) != "recent",
+                            col(ScoreSyncState.synced_at) < lists_synced_before,
+                        ),
+                    )
+                )
+            )
+        ).rowcount
+        removed_scores = (
+            await conn.execute(
+                delete(ArchivedScore).where(
+                    col(ArchivedScore.list_type) == "recent",
+                    col(ArchivedScore.ended_at) < format_ended_at(recent_before),
+                )
+            )
+        ).rowcount
+        removed_scores += (
+            await conn.execute(
+                delete(ArchivedScore).where(
+                    col(ArchivedScore.list_type) != "recent",
+                    ~exists().where(
+                        col(ScoreSyncState.user_id) == ArchivedScore.user_id,
+                        col(ScoreSyncState.mode) == ArchivedScore.mode,
+                        col(ScoreSyncState.list_key) == list_key,
+                    ),
+                )
+            )
+        ).rowcount
+    return removed_scores, removed_states
+
+
+_KNOWN_IDS = select(ArchivedScore.score_id).where(
+    ArchivedScore.user_id == bindparam("user_id"),
+    ArchivedScore.list_type == bindparam("list_type"),
+    ArchivedScore.mode == bindparam("mode"),
+    col(ArchivedScore.score_id).in_(bindparam("score_ids", expanding=True)),
+)
+
+
+async def known_score_ids(
+    list_type: str, user_id: int, mode: str, score_ids: Iterable[int]
+) -> set[int]:
+    """已经存档的成绩 ID"""
+    score_ids = list(score_ids)
+    if not score_ids:
+        return set()
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            _KNOWN_IDS,
+            {
+                "user_id": user_id,
+                "list_type": list_type,
+                "mode": mode,
+                "score_ids": score_ids,
+            },
+        )
+        return set(result.scalars().all())
+
+
+async def newest_score_id(list_type: str, user_id: int, mode: str) -> int:
+    """存档中最新（最大）的成绩 ID，没有时为 0"""
+    statement = select(func.max(ArchivedScore.score_id)).where(
+        ArchivedScore.user_id == user_id,
+        ArchivedScore.list_type == list_type,
+        ArchivedScore.mode == mode,
+    )
+    async with engine.connect() as conn:
+        return (await conn.execute(statement)).scalar() or 0
+
+
+async def scores_after(
+    list_type: str, user_id: int, mode: str, score_id: int
+) -> list[tuple[int, bool]]:
+    """存档中 ID 大于 score_id 的成绩，返回 (beatmap_id, passed)"""
+    statement = select(ArchivedScore.beatmap_id, ArchivedScore.passed).where(
+        ArchivedScore.user_id == user_id,
+        ArchivedScore.list_type == list_type,
+        ArchivedScore.mode == mode,
+        ArchivedScore.score_id > score_id,
+    )
+    async with engine.connect() as conn:
+        return [
+            (beatmap_id, passed) for beatmap_id, passed in await conn.execute(statement)
+        ]
+
+
+async def get_sync_state(
+    user_id: int, list_key: str, mode: str
+) -> Optional[ScoreSyncState]:
+    statement = select(ScoreSyncState).where(
+        ScoreSyncState.user_id == user_id,
+        ScoreSyncState.list_key == list_key,
+        ScoreSyncState.mode == mode,
+    )
+    async with engine.connect() as conn:
+        row = (await conn.execute(statement)).first()
+    return ScoreSyncState.model_validate(row._mapping) if row is not None else None
+
+
+async def save_sync_state(
+    user_id: int,
+    list_key: str,
+    mode: str,
+    reset_at: float = 0,
+    watermark: int = 0,
+) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(
+            _UPSERT_SYNC_STATE,
+            {
+                "user_id": user_id,
+                "list_key": list_key,
+                "mode": mode,
+                "synced_at": time.time(),
+                "reset_at": reset_at,
+                "watermark": watermark,
+            },
+        )
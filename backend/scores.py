@@ -1,18 +1,72 @@
-from typing import Optional
+"""
+成绩查询
+
+recent / best 列表与用户在谱面上的全部成绩会存档到本地数据库（backend.score_archive），
+查询时只从上游获取新的成绩:
+    - recent: 从最新的一页开始小步请求，遇到已存档的成绩即停止，新成绩追加到存档；
+      无法衔接时（首次查询或新成绩过多）整体重建
+    - best / 谱面成绩: 上游无法只返回"某个时间之后"的变化，因此以 recent 存档作为变化信号：
+      上次同步之后 recent 中没有可能影响该列表的新成绩、且存档未过期时直接读取本地，
+      否则整体重新获取
+firsts / pinned 以及超出存档范围的分页直接请求上游。
+
+存档按具体的模式存储：未指定模式时使用用户的默认模式（get_user_playmode），
+谱面成绩使用谱面模式，同一用户在同一模式下只有一份 recent 存档。
+同步时请求上游不使用 HTTP 响应缓存，否则刚打出的成绩会被缓存的旧列表挡住。
+过期的 recent 成绩与长期未查询的 best / 谱面成绩由定时任务 prune_score_archive 清理。
+"""
+
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Callable, Optional
 from backend.api_client import get_osu_api_client
-from backend.user import get_user_info
+from backend.beatmap import get_beatmap_info
+from backend.score_archive import (
+    format_ended_at,
+    get_sync_state,
+    known_score_ids,
+    load_scores,
+    newest_score_id,
+    prune_archive,
+    prune_scores,
+    save_sync_state,
+    score_id_of,
+    scores_after,
+    store_scores,
+)
+from backend.user import get_user_playmode, invalidate_user_cache, load_user
 from backend.expections import ScoreQueryError
 from utils.logger import get_logger
+from utils.request_scope import request_memoized
+from utils.scheduler_registry import scheduled_task
+from utils.singleflight import SingleFlight
 from utils.strings import get_api_url
 
+# 上游 recent 列表只包含 24 小时内的成绩
+RECENT_WINDOW = timedelta(hours=24)
+# 增量同步第一页的大小：没有新成绩时只需要这一次很小的请求
+RECENT_PROBE_SIZE = 5
+# 上游单页的最大数量，也是 best 列表存档的长度
+SCORES_PAGE_SIZE = 100
+# 存档的 best / 谱面成绩最长信任时间（pp 重算、成绩删除等不会体现在 recent 中）
+ARCHIVE_MAX_AGE = 86400
 
-async def get_user_beatmap_score(user_id: int, beatmap_id: int):
-    client = get_osu_api_client()
+_sync_flight = SingleFlight("score_sync")
+
+
+async def _resolve_username(user_id: int) -> str:
+    """解析用户名，仅在构造错误信息时调用；失败时退回用户 ID"""
     try:
-        user_info = await get_user_info(user_id)
-        username = user_info.get("username", str(user_id))
+        user_info = await load_user(user_id)
+        return user_info.get("username", str(user_id))
     except Exception:
-        username = str(user_id)
+        return str(user_id)
+
+
+@request_memoized
+async def get_user_beatmap_score(user_id: int, beatmap_id: int):
+    client = get_osu_api_client()
 
     url = get_api_url(
         "beatmap_scores",
@@ -28,7 +82,7 @@ async def get_user_beatmap_score(user_id: int, beatmap_id: int):
             f"API error: {response.status_code} - {response.text}"
         )
         raise ScoreQueryError(
-            username,
+            await _resolve_username(user_id),
             beatmap_id,
             f"API returned {response.status_code} when requesting endpoint {url}",
             response.status_code,
@@ -37,27 +91,93 @@ async def get_user_beatmap_score(user_id: int, beatmap_id: int):
     return response.json()
 
 
+@request_memoized
 async def get_user_beatmap_all_scores(
-    user_id: int, beatmap_id: int, ruleset: Optional[str] = None, limit: int = 100
+    user_id: int,
+    beatmap_id: int,
+    ruleset: Optional[str] = None,
+    limit: int = 100,
+    concurrency: int = 4,
 ):
     """
-    获取用户在某个谱面上的全部成绩（支持分页获取所有成绩）
+    获取用户在某个谱面上的全部成绩（优先读取本地存档）
+
+    上次同步之后 recent 存档中没有该谱面的新通过成绩时直接读取存档，
+    否则通过 _fetch_user_beatmap_all_scores 重新获取并替换存档。
 
     Args:
         user_id: 用户 ID
         beatmap_id: 谱面 ID
         ruleset: 游戏模式 (可选，默认使用谱面模式)
         limit: 每次请求的最大数量
+        concurrency: 最大并发请求页数
 
     Returns:
         成绩列表
     """
+    # 存档与 recent 同步都需要具体的模式：未指定时使用谱面模式
+    mode = ruleset
+    if not mode:
+        try:
+            mode = (await get_beatmap_info(beatmap_id)).get("mode")
+        except Exception:
+            mode = None
+    if not mode:
+        return await _fetch_user_beatmap_all_scores(
+            user_id, beatmap_id, ruleset, limit, concurrency
+        )
+
+    list_key = f"beatmap:{beatmap_id}"
+
+    async def sync() -> None:
+        await _sync_recent(user_id, mode)
+        if await _archive_is_current(
+            user_id,
+            list_key,
+            mode,
+            lambda score_beatmap_id, passed: passed and score_beatmap_id == beatmap_id,
+        ):
+            return
+        watermark = await newest_score_id("recent", user_id, mode)
+        scores = await _fetch_user_beatmap_all_scores(
+            user_id, beatmap_id, ruleset, limit, concurrency, cache=False
+        )
+        await store_scores(
+            scores, "beatmap", user_id, mode, replace_beatmap_id=beatmap_id
+        )
+        await save_sync_state(user_id, list_key, mode, watermark=watermark)
+
+    await _sync_flight.do(f"{list_key}:{user_id}:{mode}", sync)
+    return await load_scores("beatmap", user_id, mode, beatmap_id=beatmap_id)
+
+
+async def _fetch_user_beatmap_all_scores(
+    user_id: int,
+    beatmap_id: int,
+    ruleset: Optional[str] = None,
+    limit: int = 100,
+    concurrency: int = 4,
+    cache: bool = True,
+):
+    """
+    从上游获取用户在某个谱面上的全部成绩（支持分页获取所有成绩）
+
+    分页请求是推测式并发的：第一轮只请求一页，之后每轮并发的页数翻倍，
+    最多同时请求 concurrency 页。任意一页返回数量小于 limit 时，
+    取消所有更靠后的请求并结束。
+
+    Args:
+        user_id: 用户 ID
+        beatmap_id: 谱面 ID
+        ruleset: 游戏模式 (可选，默认使用谱面模式)
+        limit: 每次请求的最大数量
+        concurrency: 最大并发请求页数，为 1 时退化为逐页顺序请求
+        cache: 是否使用 HTTP 响应缓存（同步存档时为 False）
+
+    Returns:
+        成绩列表（按分页顺序，按 score_id 去重）
+    """
     client = get_osu_api_client()
-    try:
-        user_info = await get_user_info(user_id)
-        username = user_info.get("username", str(user_id))
-    except Exception:
-        username = str(user_id)
 
     url = get_api_url(
         "beatmap_all_scores",
@@ -65,15 +185,12 @@ async def get_user_beatmap_all_scores(
         user_id=user_id,
     )
 
-    all_scores = []
-    offset = 0
-
-    while True:
+    async def fetch_page(offset: int) -> list:
         params: dict[str, int | str] = {"limit": limit, "offset": offset}
         if ruleset:
             params["ruleset"] = ruleset
 
-        response = await client.get(url, params=params)
+        response = await client.get(url, params=params, cache=cache)
         get_logger("backend").info(
             f"Requesting endpoint {url} for all scores with user_id {user_id} and beatmap_id {beatmap_id} (offset={offset}) returned {response.status_code}"
         )
@@ -83,7 +200,7 @@ async def get_user_beatmap_all_scores(
                 f"API error: {response.status_code} - {response.text}"
             )
             raise ScoreQueryError(
-                username,
+                await _resolve_username(user_id),
                 beatmap_id,
                 f"API returned {response.status_code} when requesting endpoint {url}",
                 response.status_code,
@@ -93,22 +210,65 @@ async def get_user_beatmap_all_scores(
 
         # 处理响应格式
         if isinstance(data, dict) and "scores" in data:
-            scores = data["scores"]
+            return data["scores"]
         elif isinstance(data, list):
-            scores = data
-        else:
-            scores = []
-
-        if not scores:
-            break
-
-        all_scores.extend(scores)
-
-        # 如果返回的数量小于 limit，说明已经获取完所有成绩
-        if len(scores) < limit:
+            return data
+        return []
+
+    pages: dict[int, list] = {}
+    next_offset = 0
+    window = 1
+    # 第一个不满 limit 的页的 offset，说明已经获取完所有成绩
+    last_offset: Optional[int] = None
+
+    while last_offset is None:
+        offsets = [next_offset + i * limit for i in range(window)]
+        next_offset = offsets[-1] + limit
+        tasks = {
+            asyncio.ensure_future(fetch_page(offset)): offset for offset in offsets
+        }
+
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    offset = tasks[task]
+                    scores = task.result()
+                    pages[offset] = scores
+                    if len(scores) < limit and (
+                        last_offset is None or offset < last_offset
+                    ):
+                        last_offset = offset
+
+                # 已经找到末页，更靠后的推测请求不再需要
+                if last_offset is not None:
+                    for task in pending:
+                        if tasks[task] > last_offset:
+                            task.cancel()
+                    pending = {task for task in pending if tasks[task] < last_offset}
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        window = min(window * 2, max(1, concurrency))
+
+    # 按 offset 顺序拼接，并按 score_id 去重
+    all_scores = []
+    seen_ids = set()
+    for offset in sorted(pages):
+        if offset > last_offset:
             break
-
-        offset += limit
+        for score in pages[offset]:
+            score_id = score.get("id") or score.get("score_id")
+            if score_id:
+                if score_id in seen_ids:
+                    continue
+                seen_ids.add(score_id)
+            all_scores.append(score)
 
     get_logger("backend").info(
         f"Total scores fetched for user {user_id} on beatmap {beatmap_id}: {len(all_scores)}"
@@ -117,13 +277,9 @@ async def get_user_beatmap_all_scores(
     return all_scores
 
 
+@request_memoized
 async def get_user_beatmap_best_score(user_id: int, beatmap_id: int):
     client = get_osu_api_client()
-    try:
-        user_info = await get_user_info(user_id)
-        username = user_info.get("username", str(user_id))
-    except Exception:
-        username = str(user_id)
 
     url = get_api_url(
         "beatmap_best_scores",
@@ -136,7 +292,7 @@ async def get_user_beatmap_best_score(user_id: int, beatmap_id: int):
             f"API error: {response.status_code} - {response.text}"
         )
         raise ScoreQueryError(
-            username,
+            await _resolve_username(user_id),
             beatmap_id,
             f"API returned {response.status_code} when requesting endpoint {url}",
             response.status_code,
@@ -145,6 +301,7 @@ async def get_user_beatmap_best_score(user_id: int, beatmap_id: int):
     return response.json()
 
 
+@request_memoized
 async def get_user_scores(
     user_id: int,
     type: str,
@@ -156,6 +313,9 @@ async def get_user_scores(
     """
     获取用户的成绩列表 (best/recent/firsts/pinned)
 
+    recent / best 先增量同步本地存档再从存档读取（未指定模式时按用户的默认模式存档），
+    其他类型直接请求上游。
+
     Args:
         user_id: 用户 ID
         type: 成绩类型 (best, recent, firsts, pinned)
@@ -164,15 +324,162 @@ async def get_user_scores(
         limit: 返回数量
         offset: 偏移量
 
+    Returns:
+        成绩列表
+    """
+    if type == "recent":
+        mode_key = await _archive_mode(user_id, mode)
+        await _sync_recent(user_id, mode_key)
+        return await load_scores(
+            "recent",
+            user_id,
+            mode_key,
+            ended_after=_recent_window_start(),
+            passed_only=not include_fails,
+            limit=limit,
+            offset=offset,
+        )
+    if type == "best" and offset + limit <= SCORES_PAGE_SIZE:
+        mode_key = await _archive_mode(user_id, mode)
+        await _sync_best(user_id, mode_key)
+        return await load_scores("best", user_id, mode_key, limit=limit, offset=offset)
+    return await _fetch_user_scores(user_id, type, include_fails, mode, limit, offset)
+
+
+async def _archive_mode(user_id: int, mode: Optional[str]) -> str:
+    """存档使用的模式：未指定时为用户的默认模式，与显式指定该模式共用同一份存档"""
+    return mode or await get_user_playmode(user_id)
+
+
+def _recent_window_start() -> str:
+    """上游 recent 列表时间范围的起点，与存档中的 ended_at 格式一致"""
+    return format_ended_at(datetime.now(UTC) - RECENT_WINDOW)
+
+
+@request_memoized
+async def _sync_recent(user_id: int, mode: str) -> None:
+    """
+    增量同步 recent 存档（含失败成绩）
+
+    从最新的成绩开始分页请求，第一页只请求 RECENT_PROBE_SIZE 条，
+    某一页中出现已存档的成绩即说明与存档衔接，之前的都是新成绩。
+    没有存档，或取完 SCORES_PAGE_SIZE 条以上仍未衔接（中间可能有缺口）时整体重建，
+    并记录 reset_at，依赖 recent 判断变化的其他列表会因此重新获取。
+
+    Args:
+        mode: 具体的模式（见 _archive_mode）
+    """
+
+    async def sync() -> None:
+        state = await get_sync_state(user_id, "recent", mode)
+        fetched: list[dict] = []
+        connected = False
+        offset = 0
+        size = RECENT_PROBE_SIZE if state is not None else SCORES_PAGE_SIZE
+        while True:
+            page = await _fetch_user_scores(
+                user_id, "recent", True, mode, size, offset, cache=False
+            )
+            if state is not None:
+                known = await known_score_ids(
+                    "recent", user_id, mode, filter(None, map(score_id_of, page))
+                )
+                if known:
+                    fetched.extend(s for s in page if score_id_of(s) not in known)
+                    connected = True
+                    break
+            fetched.extend(page)
+            if len(page) < size:
+                break
+            offset += size
+            size = SCORES_PAGE_SIZE
+
+        # 取到了列表末尾且数量未达上限：上游列表已完整获取，同样可以视为衔接
+        reset = state is None or (not connected and len(fetched) >= SCORES_PAGE_SIZE)
+        await store_scores(fetched, "recent", user_id, mode, replace=reset)
+        await prune_scores("recent", user_id, mode, _recent_window_start())
+        await save_sync_state(
+            user_id,
+            "recent",
+            mode,
+            reset_at=time.time() if reset or state is None else state.reset_at,
+        )
+        if fetched and state is not None:
+            # 有新成绩：用户的 pp、游玩次数等已经变化
+            await invalidate_user_cache(user_id)
+        if fetched:
+            get_logger("backend").info(
+                f"Synced {len(fetched)} recent scores for user {user_id} (mode={mode}, reset={reset})"
+            )
+
+    await _sync_flight.do(f"recent:{user_id}:{mode}", sync)
+
+
+async def _archive_is_current(
+    user_id: int,
+    list_key: str,
+    mode_key: str,
+    affects: Callable[[int, bool], bool],
+) -> bool:
+    """
+    存档的列表自上次同步以来是否可能没有变化
+
+    需要 recent 已在本次同步且在该列表同步之后没有重建过，
+    并且 recent 中水位线之后的成绩都不满足 affects(beatmap_id, passed)。
+    """
+    state = await get_sync_state(user_id, list_key, mode_key)
+    if state is None or time.time() - state.synced_at > ARCHIVE_MAX_AGE:
+        return False
+    recent = await get_sync_state(user_id, "recent", mode_key)
+    if recent is None or recent.reset_at > state.synced_at:
+        return False
+    newer = await scores_after("recent", user_id, mode_key, state.watermark)
+    return not any(affects(beatmap_id, passed) for beatmap_id, passed in newer)
+
+
+async def _sync_best(user_id: int, mode: str) -> None:
+    """同步 best 存档：recent 中出现新的通过成绩时重新获取前 SCORES_PAGE_SIZE 条"""
+
+    async def sync() -> None:
+        await _sync_recent(user_id, mode)
+        if await _archive_is_current(user_id, "best", mode, lambda _, passed: passed):
+            return
+        # 先取水位线再请求：两者之间出现的成绩最多导致下次多请求一次
+        watermark = await newest_score_id("recent", user_id, mode)
+        scores = await _fetch_user_scores(
+            user_id, "best", False, mode, SCORES_PAGE_SIZE, 0, cache=False
+        )
+        await store_scores(scores, "best", user_id, mode, replace=True)
+        await save_sync_state(user_id, "best", mode, watermark=watermark)
+
+    await _sync_flight.do(f"best:{user_id}:{mode}", sync)
+
+
+async def _fetch_user_scores(
+    user_id: int,
+    type: str,
+    include_fails: bool = False,
+    mode: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    cache: bool = True,
+):
+    """
+    从上游获取用户的成绩列表 (best/recent/firsts/pinned)
+
+    Args:
+        user_id: 用户 ID
+        type: 成绩类型 (best, recent, firsts, pinned)
+        include_fails: 是否包含失败成绩
+        mode: 游戏模式 (可选)
+        limit: 返回数量
+        offset: 偏移量
+        cache: 是否使用 HTTP 响应缓存（同步存档时为 False）
+
     Returns:
         成绩列表
     """
     client = get_osu_api_client()
-    try:
-        user_info = await get_user_info(user_id)
-        username = user_info.get("username", str(user_id))
-    except Exception:
-        username = str(user_id)
 
     url = get_api_url(
         "user_scores",
@@ -188,7 +495,7 @@ async def get_user_scores(
     if mode:
         params["mode"] = mode
 
-    response = await client.get(url, params=params)
+    response = await client.get(url, params=params, cache=cache)
     get_logger("backend").info(
         f"Requesting endpoint {url} with user_id {user_id} and type {type} returned {response.status_code}"
     )
@@ -197,10 +504,22 @@ async def get_user_scores(
             f"API error: {response.status_code} - {response.text}"
         )
         raise ScoreQueryError(
-            username,
+            await _resolve_username(user_id),
             0,  # No specific beatmap_id
             f"API returned {response.status_code} when requesting endpoint {url}",
             response.status_code,
         )
 
     return response.json()
+
+
+@scheduled_task("prune_score_archive", interval=3600)
+async def scheduled_prune_score_archive() -> None:
+    """清理过期的 recent 成绩与超过 ARCHIVE_MAX_AGE 未同步的 best / 谱面成绩"""
+    scores, states = await prune_archive(
+        datetime.now(UTC) - RECENT_WINDOW, time.time() - ARCHIVE_MAX_AGE
+    )
+    if scores or states:
+        get_logger("backend").info(
+            f"已清理成绩存档: {scores} 条成绩，{states} 个同步状态"
+        )
@@ -1,29 +1,182 @@
+import asyncio
+from typing import Optional
+
 from backend.database import (
     OsuUser,
-    get_osu_user_by_discord_id,
+    get_osu_binding,
     save_osu_user,
     delete_osu_user_by_discord_id,
 )
 from backend.expections.user import BindExistError, UserQueryError
 from utils.logger import get_logger
-from backend.api_client import get_osu_api_client
+from backend.api_client import (
+    get_cache_policy,
+    get_cache_projection,
+    get_osu_api_client,
+)
+from utils.caches import (
+    delete_cache,
+    get_cache,
+    get_cache_entry,
+    get_or_fetch,
+    get_or_fetch_many,
+    invalidate_cache_tags,
+    set_cache,
+)
+from utils.dataloader import DataLoader, settle
+from utils.negative_cache import NegativeCache
+from utils.projection import project
+from utils.request_scope import prime_request_memo, request_memoized
 from utils.strings import get_api_url
 
+# 批量用户接口单次请求的最大 ID 数量
+USERS_BATCH_SIZE = 50
+
+# 不存在的用户名 / ID 记录 10 分钟（期间可能有人注册该用户名，不宜过长）
+USER_NEGATIVE_TTL = 600
+
+# 用户名（小写）或用户 ID -> 不存在
+_missing_users = NegativeCache("user", ttl=USER_NEGATIVE_TTL)
+
+# 用户名（小写）-> 用户 ID 的别名表保留 7 天。
+# 只记录当前用户名：改名后旧用户名可能被其他人注册，不能继续指向原来的用户；
+# 命中时还会与缓存的用户信息核对，用户名对不上的别名视为过时并删除
+USER_ALIAS_TTL = 7 * 86400
+
+# 用户默认模式的缓存时间，见 get_user_playmode
+USER_PLAYMODE_TTL = 86400
+
+
+def _alias_key(username: str | int) -> str:
+    return f"user:alias:{str(username).lower()}"
+
+
+async def _remember_alias(user_id: int, username: str | None) -> None:
+    """记录当前用户名 -> 用户 ID"""
+    if username:
+        await set_cache(_alias_key(username), int(user_id), ttl=USER_ALIAS_TTL)
+
+
+def _has_username(data: dict, username: str) -> bool:
+    return str(data.get("username") or "").lower() == username.lower()
+
+
+async def resolve_user_id_and_name(user: str | int) -> tuple[int, str]:
+    """
+    用户名或用户 ID -> (osu! 用户 ID, 当前用户名)
+
+    查询过的用户名与批量接口返回的用户名（均为当前用户名）会记入别名表（不区分大小写），
+    命中时不请求 API。用户名取自缓存的用户信息（包括保留期内的过期条目），
+    而不是原样返回参数（参数的大小写可能不同，也可能是用户 ID）；
+    未知的用户名、或缓存中没有用户信息时通过 get_user_info 查询一次。
+
+    Raises:
+        UserQueryError: 用户不存在或请求失败
+    """
+    user_id = await _known_user_id(user)
+    if user_id is not None:
+        info = await get_cache_entry(_user_info_key(user_id))
+        if info is not None and info.value.get("username"):
+            return user_id, str(info.value["username"])
+    data = await get_user_info(user if user_id is None else user_id)
+    return int(data["id"]), str(data["username"])
+
+
+def _user_info_key(user_id: int) -> str:
+    return f"user:info:{user_id}"
 
+
+def _is_user_id(user: str | int) -> bool:
+    return isinstance(user, int) or str(user).isdigit()
+
+
+async def _known_user_id(user: str | int) -> Optional[int]:
+    """
+    不请求 API 能确定的用户 ID：数字视为 ID，用户名查别名表
+
+    缓存的用户信息显示该用户已经改名时，别名已过时，删除后视为未知。
+    """
+    if _is_user_id(user):
+        return int(user)
+    user_id = await get_cache(_alias_key(user))
+    if user_id is None:
+        return None
+    info = await get_cache_entry(_user_info_key(user_id))
+    if info is not None and not _has_username(info.value, str(user)):
+        await delete_cache(_alias_key(user))
+        return None
+    return user_id
+
+
+@request_memoized
 async def get_user_info(user: str | int):
     """
+    获取用户完整信息（带缓存）
+
+    缓存策略见 config/api.yaml 中的 cache_policies.user_info：
+    过软 TTL 后先返回旧值并在后台刷新，过硬 TTL 后同步刷新，
+    API 不可用时仍返回旧值（404 除外）。
+    无论按用户名还是 ID 查询，都按用户 ID 缓存并带 user:{user_id} 标签，见 invalidate_user_cache。
+
     Args:
         user: 用户名或用户ID
 
     Returns:
         格式化的用户信息字符串
     """
+    user_key = str(user).lower()
+    if await _missing_users.is_missing(user_key):
+        raise UserQueryError(str(user), "User not found", 404)
+
+    policy = get_cache_policy("user_info")
+    data = None
+    try:
+        user_id = await _known_user_id(user)
+        if user_id is not None:
+            data = await get_or_fetch(
+                _user_info_key(user_id),
+                lambda: _fetch_user_info(user_id),
+                **policy.options(user_id),
+                serve_stale_if=lambda e: not (
+                    isinstance(e, UserQueryError) and e.status_code == 404
+                ),
+            )
+            if not _is_user_id(user) and not _has_username(data, str(user)):
+                # 别名指向的用户已经改名（旧用户名可能已被他人使用）：删除别名，按用户名重新查询
+                await delete_cache(_alias_key(user))
+                data = None
+        if data is None:
+            # 未知的用户名：按用户名请求一次，结果同样按用户 ID 缓存
+            data = await _fetch_user_info(user)
+            options = policy.options(int(data["id"]))
+            await set_cache(
+                _user_info_key(int(data["id"])),
+                data,
+                ttl=options["ttl"],
+                soft_ttl=options["soft_ttl"],
+                stale_if_error=options["stale_if_error"],
+                tags=options["tags"],
+            )
+    except UserQueryError as e:
+        if e.status_code == 404:
+            await _missing_users.mark_missing(user_key)
+        raise
+
+    # 完整的用户信息包含 load_user 所需的全部字段，本次请求内无需再查
+    if isinstance(data, dict) and data.get("id") is not None:
+        prime_request_memo(load_user, int(data["id"]), value=data)
+    return data
+
+
+async def _fetch_user_info(user: str | int) -> dict:
+    """请求 API 获取用户完整信息"""
     # 使用新的API调用器
     api_client = get_osu_api_client()
 
     url = get_api_url("user_info", user_id=user)
 
-    response = await api_client.get(url)
+    # 按用户缓存在 get_user_info 中完成，这里不再缓存整个响应
+    response = await api_client.get(url, cache=False)
 
     if response.status_code == 404:
         raise UserQueryError(
@@ -41,7 +194,129 @@ async def get_user_info(user: str | int):
             f"API returned {response.status_code} when requesting endpoint {url}",
             response.status_code,
         )
-    return response.json()
+
+    data = response.json()
+    if data.get("id") is not None:
+        await _remember_alias(data["id"], data.get("username"))
+
+    # 只缓存 cache_projections.user 中声明的字段
+    return project(data, get_cache_projection("user"))
+
+
+async def get_users_info(user_ids: list[int]) -> dict[int, dict]:
+    """
+    批量获取用户基础信息（/users/?ids[]=，按用户缓存，策略见 cache_policies.batch_user_info）
+
+    批量接口返回的是精简的用户对象（id、username、avatar_url、country 等），
+    不包含 statistics；需要完整资料时请使用 get_user_info。
+
+    Args:
+        user_ids: 用户 ID 列表
+
+    Returns:
+        用户 ID -> 用户信息字典；不存在的用户不会出现在结果中
+
+    Raises:
+        UserQueryError: 批量请求失败且没有可用的旧缓存
+    """
+    user_ids = [
+        user_id
+        for user_id in dict.fromkeys(user_ids)
+        if not await _missing_users.is_missing(str(user_id))
+    ]
+    policy = get_cache_policy("batch_user_info")
+    return await get_or_fetch_many(
+        user_ids,
+        lambda user_id: f"user:compact:{user_id}",
+        _fetch_users_info,
+        **policy.options(),
+        tags_of=(lambda user_id: (f"user:{user_id}",)) if policy.per_user else None,
+    )
+
+
+async def _fetch_users_info(user_ids: list[int]) -> dict[int, dict]:
+    """通过批量接口获取用户基础信息"""
+    api_client = get_osu_api_client()
+    url = get_api_url("batch_user_info")
+
+    projection = get_cache_projection("user_compact")
+    results: dict[int, dict] = {}
+    for i in range(0, len(user_ids), USERS_BATCH_SIZE):
+        chunk = user_ids[i : i + USERS_BATCH_SIZE]
+        response = await api_client.get(url, params={"ids[]": chunk}, cache=False)
+        get_logger("backend").info(
+            f"Requesting endpoint {url} for {len(chunk)} users returned {response.status_code}"
+        )
+
+        if response.status_code != 200:
+            get_logger("backend").error(
+                f"API error: {response.status_code} - {response.text}"
+            )
+            raise UserQueryError(
+                ",".join(map(str, chunk)),
+                f"API returned {response.status_code} when requesting endpoint {url}",
+                response.status_code,
+            )
+
+        # 受限用户等也不会出现在批量结果中，不写入不存在记录（由单个用户接口确认）
+        for user in response.json().get("users", []):
+            if user.get("id") is not None:
+                results[user["id"]] = project(user, projection)
+                await _remember_alias(user["id"], user.get("username"))
+
+    return results
+
+
+async def _batch_load_users(user_ids: list[int]) -> dict[int, dict | Exception]:
+    """
+    DataLoader 的批量函数
+
+    批量结果中缺少的用户再通过 get_user_info 查询，只有其返回 404 时才是 404 UserQueryError。
+    """
+    found: dict[int, dict | Exception] = dict(await get_users_info(user_ids))
+    absent = [user_id for user_id in user_ids if user_id not in found]
+    if absent:
+        results = await asyncio.gather(
+            *(settle(get_user_info(user_id)) for user_id in absent)
+        )
+        found.update(zip(absent, results))
+    return {user_id: found[user_id] for user_id in user_ids}
+
+
+_user_loader = DataLoader(
+    _batch_load_users, max_batch_size=USERS_BATCH_SIZE, name="user"
+)
+
+
+@request_memoized
+async def load_user(user_id: int) -> dict:
+    """
+    获取单个用户的基础信息，同一轮事件循环内的并发调用会合并为一次批量请求
+
+    返回精简的用户对象（见 get_users_info），适合只需要用户名、头像等字段的场景。
+
+    Raises:
+        UserQueryError: 用户不存在或请求失败
+    """
+    return await _user_loader.load(int(user_id))
+
+
+async def get_user_playmode(user_id: int) -> str:
+    """
+    用户的默认模式（资料中的 playmode），未指定模式的成绩查询按此模式存档
+
+    单独缓存 USER_PLAYMODE_TTL，不带 user:{user_id} 标签：打出新成绩不会改变默认模式。
+    """
+
+    async def fetch() -> str:
+        return (await get_user_info(user_id)).get("playmode") or "osu"
+
+    return await get_or_fetch(f"user:playmode:{user_id}", fetch, ttl=USER_PLAYMODE_TTL)
+
+
+async def invalidate_user_cache(user_id: int) -> None:
+    """使该用户的缓存（资料、成绩等带 user:{user_id} 标签的条目）失效"""
+    await invalidate_cache_tags(f"user:{user_id}")
 
 
 async def bind_user(user_id: int, username: str):
@@ -54,7 +329,7 @@ async def bind_user(user_id: int, username: str):
     # 使用新的API调用器获取用户信息
     user_data = await get_user_info(username)
 
-    current_user = await get_osu_user_by_discord_id(user_id)
+    current_user = await get_osu_binding(user_id)
     if current_user is not None:
         raise BindExistError(current_user.osu_username)
     else:
@@ -64,6 +339,7 @@ async def bind_user(user_id: int, username: str):
             osu_username=username,
         )
         await save_osu_user(new_user)
+        await invalidate_user_cache(new_user.osu_id)
         get_logger("backend").info(f"Successfully retrieved user data for {username}")
         return None
 
@@ -76,7 +352,10 @@ async def unbind_user(discord_id: int) -> bool:
     Returns:
         True if user was unbound, False if no binding existed
     """
+    binding = await get_osu_binding(discord_id)
     deleted = await delete_osu_user_by_discord_id(discord_id)
+    if binding is not None:
+        await invalidate_user_cache(binding.osu_id)
     if deleted:
         get_logger("backend").info(f"Successfully unbound Discord user {discord_id}")
     else:
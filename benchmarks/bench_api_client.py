@@ -0,0 +1,98 @@
+"""
+APIClient 传输层基准测试
+
+对比两种请求方式的单请求延迟（p50 / p99）：
+    - before: 每个请求新建一个 AsyncClient（旧实现，每次都要 DNS + TCP + TLS）
+    - after:  全局共享的连接池 AsyncClient（keep-alive + HTTP/2）
+
+用法（在项目根目录执行）:
+    uv run python -m benchmarks.bench_api_client
+    uv run python -m benchmarks.bench_api_client --endpoint /api/v2/beatmaps/75 -n 200 -c 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from httpx import AsyncClient
+
+from backend.api_client import close_http_client, get_http_client, get_osu_api_client
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _run(
+    name: str,
+    send: Callable[[], Awaitable[int]],
+    total: int,
+    concurrency: int,
+) -> None:
+    """以给定并发执行 total 次请求并打印延迟分布"""
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = await send()
+                if status >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - wall_start
+
+    print(
+        f"{name:<8} n={len(latencies):<5} errors={errors:<4} "
+        f"p50={_percentile(latencies, 0.50):8.1f}ms "
+        f"p99={_percentile(latencies, 0.99):8.1f}ms "
+        f"mean={statistics.fmean(latencies):8.1f}ms "
+        f"throughput={len(latencies) / wall:7.1f} req/s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="APIClient 传输层基准测试")
+    parser.add_argument("--endpoint", default="/api/v2/beatmaps/75")
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    api_client = get_osu_api_client()
+    url = api_client._build_url(args.endpoint)
+    headers = dict(api_client.headers)
+    if api_client.oauth_handler:
+        token = await api_client.oauth_handler.get_access_token()
+        headers["Authorization"] = f"Bearer {token}"
+
+    async def per_request_client() -> int:
+        async with AsyncClient(timeout=api_client.timeout) as client:
+            response = await client.get(url, headers=headers)
+            return response.status_code
+
+    async def shared_client() -> int:
+        response = await get_http_client().get(url, headers=headers)
+        return response.status_code
+
+    print(f"GET {url}  requests={args.requests} concurrency={args.concurrency}")
+    await _run("before", per_request_client, args.requests, args.concurrency)
+    await _run("after", shared_client, args.requests, args.concurrency)
+
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+缓存值压缩的基准测试
+
+以成绩列表（/users/{id}/scores/best，limit=100）为例，对比不同压缩阈值下：
+    - stored: 每个条目在 L1 / L2 中占用的字节数
+    - encode: set_cache 时的序列化 + 压缩耗时
+    - decode: 每次命中的解码耗时（未压缩的条目在 L1 中是对象，命中不需要解码）
+
+缓存的是 HTTP 响应快照（原始 JSON 字节），与 APIClient.get 的响应缓存一致。
+默认使用根据 openapi.json 合成的数据（与 benchmarks.mock_osu_api 相同）。
+
+用法（在项目根目录执行）:
+    uv run python -m benchmarks.bench_cache_compression
+    uv run python -m benchmarks.bench_cache_compression -n 50 --thresholds 1024 8192 65536
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.mock_osu_api import OPENAPI_FILE, OpenAPIFaker, SyntheticBackend
+from utils import caches
+from utils.caches import CacheEntry
+
+
+def _score_lists(count: int) -> list[dict]:
+    """合成 count 个用户的 best 成绩列表响应快照"""
+    synthetic = SyntheticBackend(
+        OpenAPIFaker(json.loads(OPENAPI_FILE.read_text("utf-8")))
+    )
+    snapshots = []
+    for user_id in range(1, count + 1):
+        _, data = synthetic.respond(
+            "/api/v2/users/{user_id}/scores/{type}",
+            {"user_id": str(user_id), "type": "best"},
+            {"limit": ["100"]},
+        )
+        snapshots.append(
+            {
+                "status_code": 200,
+                "content_type": "application/json",
+                "content": json.dumps(data).encode(),
+            }
+        )
+    return snapshots
+
+
+def _measure(
+    entries: list[CacheEntry], threshold: int, rounds: int
+) -> tuple[float, float, float]:
+    """返回 (平均存储字节, 平均编码微秒, 平均每次命中解码微秒)"""
+    caches.COMPRESS_MIN_BYTES = threshold
+    start = time.perf_counter()
+    blobs = [caches._serialize(entry) for entry in entries]
+    encode = (time.perf_counter() - start) / len(entries)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for blob in blobs:
+            # 与 TwoTierCache.get 一致：只有压缩的条目在命中时需要解码
+            if caches._is_compressed(blob):
+                caches._deserialize(blob)
+    decode = (time.perf_counter() - start) / (rounds * len(blobs))
+
+    stored = sum(len(blob) for blob in blobs) / len(blobs)
+    return stored, encode * 1e6, decode * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="缓存值压缩基准测试")
+    parser.add_argument("-n", type=int, default=20, help="成绩列表数量")
+    parser.add_argument("--rounds", type=int, default=20, help="每个条目的命中次数")
+    parser.add_argument(
+        "--thresholds",
+        type=int,
+        nargs="*",
+        default=[1 << 30, 65536, 8192, 1024],
+        help="压缩阈值（字节），很大的值相当于不压缩",
+    )
+    args = parser.parse_args()
+
+    now = time.time()
+    entries = [
+        CacheEntry(value=snapshot, stale_at=now, expires_at=now, created_at=now)
+        for snapshot in _score_lists(args.n)
+    ]
+    raw = sum(len(entry.value["content"]) for entry in entries) / len(entries)
+    codec = caches._CODEC_NAMES[caches._COMPRESSION_CODEC]
+    print(
+        f"成绩列表 x{len(entries)}，JSON 平均 {raw / 1024:.1f} KiB，压缩算法 {codec}\n"
+    )
+    print(f"{'threshold':>12} {'stored':>12} {'encode':>12} {'decode/hit':>12}")
+    for threshold in args.thresholds:
+        stored, encode, decode = _measure(entries, threshold, args.rounds)
+        label = "off" if threshold >= 1 << 30 else str(threshold)
+        print(
+            f"{label:>12} {stored / 1024:>9.1f}KiB {encode:>10.0f}us {decode:>10.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+缓存字段投影的内存基准测试
+
+对比缓存完整 API 响应与按 config/api.yaml 中 cache_projections 投影后的每条目大小：
+    - packed: msgpack 序列化后的字节数（L1 预算与 L2 存储按此计算）
+    - resident: 进程内对象图的大小（跨条目共享的对象只计一次，体现键 / 值去重效果）
+
+默认使用根据 openapi.json 合成的数据（与 benchmarks.mock_osu_api 相同），
+也可以用 --live 从配置的 API 服务器拉取真实数据。
+
+用法（在项目根目录执行）:
+    uv run python -m benchmarks.bench_cache_projection
+    uv run python -m benchmarks.bench_cache_projection -n 2000
+    uv run python -m benchmarks.bench_cache_projection --live --beatmap-ids 75 129891 --user-ids 2 124493
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from typing import Any, cast
+
+import msgpack
+
+from backend.api_client import (
+    close_http_client,
+    get_cache_projection,
+    get_osu_api_client,
+)
+from benchmarks.mock_osu_api import OPENAPI_FILE, OpenAPIFaker, SyntheticBackend
+from utils.projection import project
+from utils.strings import get_api_url
+
+
+def _resident_size(objects: list[Any]) -> int:
+    """递归统计对象图大小，同一对象只计一次"""
+    seen: set[int] = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
+
+
+def _synthetic(entity: str, count: int) -> list[dict]:
+    """根据 openapi.json 合成 count 个实体"""
+    synthetic = SyntheticBackend(
+        OpenAPIFaker(json.loads(OPENAPI_FILE.read_text("utf-8")))
+    )
+    template = {
+        "beatmap": "/api/v2/beatmaps/{beatmap_id}",
+        "user": "/api/v2/users/{user_id}",
+    }[entity]
+    param = template.rsplit("{", 1)[-1].rstrip("}")
+    items = []
+    for i in range(count):
+        item_id = str(random.randint(1, 5_000_000) if entity == "beatmap" else i + 1)
+        _, data = synthetic.respond(template, {param: item_id}, {})
+        items.append(data)
+    return items
+
+
+async def _live(entity: str, ids: list[int]) -> list[dict]:
+    """从 API 服务器获取真实数据"""
+    client = get_osu_api_client()
+    endpoint, param = {
+        "beatmap": ("beatmap_info", "beatmap_id"),
+        "user": ("user_info", "user_id"),
+    }[entity]
+    items = []
+    for item_id in ids:
+        response = await client.get(
+            get_api_url(endpoint, **{param: item_id}), cache=False
+        )
+        if response.status_code == 200:
+            items.append(response.json())
+    return items
+
+
+def _report(entity: str, items: list[dict]) -> None:
+    projection = get_cache_projection(entity)
+    projected = [project(item, projection) for item in items]
+    # 模拟从缓存重新加载的完整响应：每个条目都是独立的对象
+    full = [json.loads(json.dumps(item)) for item in items]
+
+    n = len(items)
+    rows = []
+    for name, data in (("full", full), ("projected", projected)):
+        packed = sum(len(cast(bytes, msgpack.packb(item))) for item in data) / n
+        resident = _resident_size(data) / n
+        rows.append((name, packed, resident))
+
+    print(f"\n[{entity}] n={n}")
+    for name, packed, resident in rows:
+        print(
+            f"  {name:<10} packed={packed:10.0f} B/entry  resident={resident:10.0f} B/entry"
+        )
+    (_, full_packed, full_resident), (_, proj_packed, proj_resident) = rows
+    print(
+        f"  reduction  packed={full_packed / proj_packed:9.1f}x        "
+        f"resident={full_resident / proj_resident:9.1f}x"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="缓存字段投影内存基准测试")
+    parser.add_argument("-n", type=int, default=500, help="合成数据的条目数")
+    parser.add_argument("--live", action="store_true", help="从 API 服务器获取真实数据")
+    parser.add_argument(
+        "--beatmap-ids", type=int, nargs="*", default=[75, 129891, 1001682]
+    )
+    parser.add_argument("--user-ids", type=int, nargs="*", default=[2, 124493, 7562902])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    for entity, ids in (("beatmap", args.beatmap_ids), ("user", args.user_ids)):
+        items = await _live(entity, ids) if args.live else _synthetic(entity, args.n)
+        if not items:
+            print(f"\n[{entity}] 没有获取到数据")
+            continue
+        _report(entity, items)
+
+    if args.live:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+绑定表读写的并发基准测试
+
+对比 SQLAlchemy 默认配置（rollback journal、synchronous=FULL、无 PRAGMA）
+与 backend.database 的存储配置（WAL、synchronous=NORMAL、mmap、连接池）下：
+    - select: get_osu_user_by_discord_id（每次一个会话 + SELECT）
+    - index:  get_osu_binding（内存索引）
+    - upsert: save_osu_user
+    - delete: delete_osu_user_by_discord_id
+每种操作由 --concurrency 个协程并发执行，数据库文件放在临时目录中。
+
+用法（在项目根目录执行）:
+    uv run python -m benchmarks.bench_database
+    uv run python -m benchmarks.bench_database -n 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import backend.database as database
+from backend.database import OsuUser, create_sqlite_engine
+
+
+async def _run(
+    name: str, ids: list[int], concurrency: int, op: Callable[[int], Awaitable]
+) -> None:
+    queue = list(ids)
+    latencies: list[float] = []
+
+    async def worker() -> None:
+        while queue:
+            discord_id = queue.pop()
+            start = time.perf_counter()
+            await op(discord_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(
+        f"  {name:<8} {len(ids) / elapsed:>10.0f} ops/s   p50 {p50:7.2f}ms   p99 {p99:7.2f}ms"
+    )
+
+
+async def _bench(profile: str, tuned: bool, count: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.engine = create_sqlite_engine(str(Path(tmp) / "bench.db"), tuned=tuned)
+        await database.create_db_and_tables()
+
+        ids = list(range(1, count + 1))
+        print(f"\n[{profile}] n={count} concurrency={concurrency}")
+
+        await _run(
+            "upsert",
+            ids,
+            concurrency,
+            lambda i: database.save_osu_user(
+                OsuUser(discord_id=i, osu_id=i * 7, osu_username=f"user{i}")
+            ),
+        )
+        await database.load_binding_index()
+
+        reads = random.choices(ids, k=count)
+        await _run("select", reads, concurrency, database.get_osu_user_by_discord_id)
+        await _run("index", reads, concurrency, database.get_osu_binding)
+        await _run("delete", ids, concurrency, database.delete_osu_user_by_discord_id)
+
+        await database.engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="绑定表读写并发基准测试")
+    parser.add_argument("-n", type=int, default=1000, help="每种操作的次数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发协程数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    await _bench("default", False, args.n, args.concurrency)
+    await _bench("tuned", True, args.n, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
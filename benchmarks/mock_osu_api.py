@@ -0,0 +1,549 @@
+"""
+osu! API 本地替身（录制 / 回放 / 合成）
+
+根据项目自带的 openapi.json 提供 /users、/beatmaps、/scores、/oauth/token 等接口，
+用于在不访问线上 g0v0 服务器的情况下进行基准测试和压力测试。
+
+响应来源（按优先级）:
+    1. 回放：cassette 目录中录制过的真实响应
+    2. 录制：--record 模式下转发到 --upstream，并把响应写入 cassette
+    3. 合成：根据 openapi.json 中的响应 schema 生成确定性的假数据
+
+可配置:
+    - 延迟分布：fixed:50 / uniform:20:200 / lognormal:80:0.6（单位毫秒）
+    - 错误注入：按比例返回指定状态码
+    - 限流：返回 X-RateLimit-Limit / X-RateLimit-Remaining，额度耗尽返回 429
+    - 路径参数以 "missing" 开头时返回 404，用于测试负缓存
+
+用法（在项目根目录执行）:
+    uv run python -m benchmarks.mock_osu_api --port 9000 --latency lognormal:80:0.6
+    uv run python -m benchmarks.mock_osu_api --record --upstream https://lazer-api.g0v0.top
+
+然后把 config/config.yaml 中的 api.url 设为 http://127.0.0.1:9000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from utils.logger import get_logger
+from utils.variable import working_dir
+
+logger = get_logger("benchmarks.mock_osu_api")
+
+OPENAPI_FILE = working_dir / "openapi.json"
+DEFAULT_CASSETTE_DIR = working_dir / "benchmarks" / "cassettes"
+
+# 只替身这些前缀下的接口
+SERVED_PREFIXES = ("/api/v2/users", "/api/v2/beatmaps", "/api/v2/beatmapsets")
+
+# openapi.json 中响应 schema 为空的接口，指定用于合成的组件
+SCHEMA_OVERRIDES = {
+    "/api/v2/users/{user_id}/scores/{type}": {
+        "type": "array",
+        "items": {
+            "$ref": "#/components/schemas/ScoreModelDict_user_country_cover_team_"
+        },
+    },
+}
+
+# 合成的单个用户在单个列表中的成绩总数上限
+SYNTHETIC_MAX_SCORES = 150
+
+# 合成数据中时间字段的基准时间（进程内固定，保证同一请求的响应完全一致）
+SYNTHETIC_NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+# ============ 延迟分布 ============
+
+
+@dataclass
+class LatencyModel:
+    """响应延迟分布（毫秒）"""
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """解析 fixed:MS / uniform:LO:HI / lognormal:MEDIAN:SIGMA"""
+        kind, *values = spec.split(":")
+        numbers = [float(v) for v in values]
+        if kind == "fixed" and len(numbers) == 1:
+            return cls(kind, numbers[0])
+        if kind in ("uniform", "lognormal") and len(numbers) == 2:
+            return cls(kind, numbers[0], numbers[1])
+        raise ValueError(f"无法解析的延迟分布: {spec}")
+
+    def sample(self) -> float:
+        """采样一次延迟（秒）"""
+        match self.kind:
+            case "uniform":
+                ms = random.uniform(self.a, self.b)
+            case "lognormal":
+                ms = random.lognormvariate(0, self.b) * self.a
+            case _:
+                ms = self.a
+        return max(ms, 0.0) / 1000
+
+
+# ============ 根据 openapi schema 合成数据 ============
+
+
+class OpenAPIFaker:
+    """根据 JSON schema 生成确定性的示例数据"""
+
+    MAX_DEPTH = 6
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.schemas = spec.get("components", {}).get("schemas", {})
+
+    def resolve(self, schema: dict) -> dict:
+        """展开 $ref"""
+        while "$ref" in schema:
+            schema = self.schemas[schema["$ref"].rsplit("/", 1)[-1]]
+        return schema
+
+    def response_schema(self, path: str, method: str) -> Optional[dict]:
+        """获取接口 200 响应的 schema"""
+        if path in SCHEMA_OVERRIDES:
+            return SCHEMA_OVERRIDES[path]
+        operation = self.spec["paths"].get(path, {}).get(method.lower(), {})
+        content = operation.get("responses", {}).get("200", {}).get("content", {})
+        return content.get("application/json", {}).get("schema")
+
+    def generate(self, schema: dict, rng: random.Random, depth: int = 0) -> Any:
+        schema = self.resolve(schema)
+
+        for key in ("anyOf", "oneOf"):
+            if key in schema:
+                options = [
+                    s for s in schema[key] if self.resolve(s).get("type") != "null"
+                ]
+                return self.generate(options[0], rng, depth) if options else None
+        if "allOf" in schema:
+            merged: dict = {}
+            for part in schema["allOf"]:
+                value = self.generate(part, rng, depth)
+                if isinstance(value, dict):
+                    merged.update(value)
+            return merged
+        if "enum" in schema:
+            return rng.choice(schema["enum"])
+
+        match schema.get("type"):
+            case "object":
+                if depth >= self.MAX_DEPTH:
+                    return {}
+                return {
+                    name: self.generate(prop, rng, depth + 1)
+                    for name, prop in schema.get("properties", {}).items()
+                }
+            case "array":
+                if depth >= self.MAX_DEPTH:
+                    return []
+                return [
+                    self.generate(schema.get("items", {}), rng, depth + 1)
+                    for _ in range(rng.randint(1, 3))
+                ]
+            case "integer":
+                return rng.randint(1, 1_000_000)
+            case "number":
+                return round(rng.uniform(0, 10), 2)
+            case "boolean":
+                return rng.random() < 0.5
+            case "string":
+                if schema.get("format") == "date-time":
+                    moment = SYNTHETIC_NOW - timedelta(
+                        seconds=rng.randint(0, 30 * 86400)
+                    )
+                    return moment.isoformat().replace("+00:00", "Z")
+                return f"{schema.get('title', 'string').lower().replace(' ', '_')}_{rng.randint(1, 9999)}"
+            case _:
+                return None
+
+
+class SyntheticBackend:
+    """按接口生成合成响应，并把路径参数回填到数据中"""
+
+    def __init__(self, faker: OpenAPIFaker):
+        self.faker = faker
+
+    def respond(
+        self, template: str, path_params: dict, query: dict[str, list[str]]
+    ) -> tuple[int, Any]:
+        for value in path_params.values():
+            if value.startswith("missing"):
+                return 404, {"detail": "Not Found"}
+
+        schema = self.faker.response_schema(template, "GET")
+        if schema is None:
+            return 404, {"detail": "Not Found"}
+
+        # 以路径 + 查询参数为种子，同一请求总是得到相同的数据
+        seed = zlib.crc32(f"{template}|{sorted(path_params.items())}".encode())
+        rng = random.Random(seed)
+        data = self.faker.generate(schema, rng)
+
+        match template:
+            case "/api/v2/users/{user_id}" | "/api/v2/users/{user_id}/{ruleset}":
+                self._fill_user(data, path_params["user_id"])
+            case "/api/v2/users/":
+                data = {"users": self._batch(schema, "users", query, self._fill_user)}
+            case "/api/v2/beatmaps/{beatmap_id}":
+                self._fill_beatmap(data, path_params["beatmap_id"])
+            case "/api/v2/beatmaps/":
+                data = {
+                    "beatmaps": self._batch(
+                        schema, "beatmaps", query, self._fill_beatmap
+                    )
+                }
+            case "/api/v2/beatmapsets/{beatmapset_id}":
+                self._fill_beatmapset(data, int(path_params["beatmapset_id"]))
+            case "/api/v2/users/{user_id}/scores/{type}":
+                data = self._score_list(schema, path_params, query, seed)
+            case "/api/v2/beatmaps/{beatmap_id}/scores/users/{user_id}/all":
+                data = self._score_list(
+                    {
+                        "type": "array",
+                        "items": SCHEMA_OVERRIDES[
+                            "/api/v2/users/{user_id}/scores/{type}"
+                        ]["items"],
+                    },
+                    path_params,
+                    query,
+                    seed,
+                )
+
+        return 200, data
+
+    def _batch(self, schema: dict, key: str, query: dict, fill) -> list:
+        """批量接口：为每个 ids[] 生成一项"""
+        item_schema = self.faker.resolve(schema)["properties"][key]["items"]
+        items = []
+        for raw_id in query.get("ids[]", []):
+            item = self.faker.generate(item_schema, random.Random(int(raw_id)))
+            fill(item, raw_id)
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _fill_user(user: Any, user_ref: str) -> None:
+        if not isinstance(user, dict):
+            return
+        if user_ref.isdigit():
+            user["id"] = int(user_ref)
+            user["username"] = f"user{user_ref}"
+        else:
+            user["id"] = zlib.crc32(user_ref.lower().encode()) % 10_000_000
+            user["username"] = user_ref
+
+    def _fill_beatmap(self, beatmap: Any, beatmap_ref: str) -> None:
+        if not isinstance(beatmap, dict):
+            return
+        beatmap_id = int(beatmap_ref)
+        beatmapset_id = beatmap_id // 10
+        beatmap["id"] = beatmap_id
+        beatmap["beatmapset_id"] = beatmapset_id
+        beatmap["checksum"] = hashlib.md5(str(beatmap_id).encode()).hexdigest()
+        if isinstance(beatmap.get("beatmapset"), dict):
+            beatmap["beatmapset"]["id"] = beatmapset_id
+
+    def _fill_beatmapset(self, beatmapset: Any, beatmapset_id: int) -> None:
+        """谱面集包含同一 set 下的全部难度（ID 为 set_id * 10 + 0..n）"""
+        if not isinstance(beatmapset, dict):
+            return
+        beatmapset["id"] = beatmapset_id
+        beatmap_schema = self.faker.response_schema(
+            "/api/v2/beatmaps/{beatmap_id}", "GET"
+        )
+        rng = random.Random(beatmapset_id)
+        beatmaps = []
+        for i in range(rng.randint(1, 6)):
+            beatmap = self.faker.generate(
+                beatmap_schema or {}, random.Random(beatmapset_id * 10 + i)
+            )
+            self._fill_beatmap(beatmap, str(beatmapset_id * 10 + i))
+            if isinstance(beatmap, dict):
+                beatmap.pop("beatmapset", None)
+            beatmaps.append(beatmap)
+        beatmapset["beatmaps"] = beatmaps
+
+    def _score_list(
+        self, schema: dict, path_params: dict, query: dict, seed: int
+    ) -> list:
+        """成绩列表：遵循 limit / offset，总数按用户确定"""
+        limit = int(query.get("limit", ["100"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        total = random.Random(seed).randint(0, SYNTHETIC_MAX_SCORES)
+        count = max(0, min(limit, total - offset))
+
+        item_schema = self.faker.resolve(schema)["items"]
+        scores = []
+        for index in range(offset, offset + count):
+            rng = random.Random(seed + index)
+            score = self.faker.generate(item_schema, rng)
+            if isinstance(score, dict):
+                score["id"] = seed % 1_000_000 * 1000 + index
+                score["beatmap_id"] = int(
+                    path_params.get("beatmap_id", rng.randint(1, 5_000_000))
+                )
+                ended_at = SYNTHETIC_NOW - timedelta(minutes=index * 30)
+                score["ended_at"] = ended_at.isoformat().replace("+00:00", "Z")
+                score["accuracy"] = round(rng.uniform(0.8, 1.0), 4)
+            scores.append(score)
+        return scores
+
+
+# ============ 录制 / 回放 ============
+
+
+class CassetteStore:
+    """以 方法 + 路径 + 查询参数 为键，一次交互一个 JSON 文件"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    @staticmethod
+    def _key(method: str, path: str, query: list[tuple[str, str]]) -> str:
+        raw = f"{method} {path}?{sorted(query)}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    def load(
+        self, method: str, path: str, query: list[tuple[str, str]]
+    ) -> Optional[dict]:
+        file = self.directory / f"{self._key(method, path, query)}.json"
+        if not file.exists():
+            return None
+        return json.loads(file.read_text(encoding="utf-8"))
+
+    def save(
+        self,
+        method: str,
+        path: str,
+        query: list[tuple[str, str]],
+        status: int,
+        body: bytes,
+        content_type: str,
+    ) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file = self.directory / f"{self._key(method, path, query)}.json"
+        record = {
+            "method": method,
+            "path": path,
+            "query": query,
+            "status": status,
+            "content_type": content_type,
+            "body": body.decode("utf-8", errors="replace"),
+        }
+        file.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+
+
+# ============ 限流 ============
+
+
+class FixedWindowLimiter:
+    """每分钟固定窗口限流，模拟上游的 X-RateLimit-* 响应头"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.window_start = time.monotonic()
+        self.used = 0
+
+    def hit(self) -> tuple[bool, int, float]:
+        """返回 (是否放行, 剩余额度, 窗口剩余秒数)"""
+        now = time.monotonic()
+        if now - self.window_start >= 60:
+            self.window_start = now
+            self.used = 0
+        reset_in = 60 - (now - self.window_start)
+        if self.used >= self.per_minute:
+            return False, 0, reset_in
+        self.used += 1
+        return True, self.per_minute - self.used, reset_in
+
+
+# ============ 应用 ============
+
+
+@dataclass
+class MockSettings:
+    latency: LatencyModel
+    error_rate: float = 0.0
+    error_status: int = 503
+    rate_limit: int = 1200
+    record: bool = False
+    upstream: str = ""
+    cassette_dir: Path = DEFAULT_CASSETTE_DIR
+
+
+def _compile_routes(spec: dict) -> list[tuple[str, re.Pattern]]:
+    """把 openapi.json 中的路径模板编译为正则，具体路径优先于带参数的路径"""
+    routes = []
+    for template in spec["paths"]:
+        if not template.startswith(SERVED_PREFIXES):
+            continue
+        regex = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(template))
+        routes.append((template, re.compile(regex)))
+    routes.sort(key=lambda route: route[0].count("{"))
+    return routes
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    spec = json.loads(OPENAPI_FILE.read_text(encoding="utf-8"))
+    routes = _compile_routes(spec)
+    synthetic = SyntheticBackend(OpenAPIFaker(spec))
+    cassettes = CassetteStore(settings.cassette_dir)
+    limiter = FixedWindowLimiter(settings.rate_limit)
+
+    upstream_client = None
+    if settings.record:
+        from httpx import AsyncClient
+
+        upstream_client = AsyncClient(base_url=settings.upstream, timeout=30.0)
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        yield
+        if upstream_client is not None:
+            await upstream_client.aclose()
+
+    app = FastAPI(
+        title="osu! API mock", openapi_url=None, docs_url=None, lifespan=lifespan
+    )
+
+    @app.post("/oauth/token")
+    async def oauth_token():
+        await asyncio.sleep(settings.latency.sample())
+        return {
+            "access_token": f"mock-{uuid.uuid4().hex}",
+            "token_type": "Bearer",
+            "expires_in": 86400,
+        }
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve(full_path: str, request: Request):
+        path = "/" + full_path
+        allowed, remaining, reset_in = limiter.hit()
+        headers = {
+            "X-RateLimit-Limit": str(settings.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+        }
+        if not allowed:
+            headers["Retry-After"] = f"{reset_in:.0f}"
+            return JSONResponse({"detail": "Too Many Requests"}, 429, headers=headers)
+
+        await asyncio.sleep(settings.latency.sample())
+
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers)
+        if random.random() < settings.error_rate:
+            return JSONResponse(
+                {"detail": "Injected error"}, settings.error_status, headers=headers
+            )
+
+        query = list(request.query_params.multi_items())
+
+        cassette = cassettes.load("GET", path, query)
+        if cassette is not None:
+            headers["X-Mock-Source"] = "cassette"
+            return Response(
+                cassette["body"],
+                status_code=cassette["status"],
+                media_type=cassette["content_type"],
+                headers=headers,
+            )
+
+        if upstream_client is not None:
+            forwarded = {
+                k: v
+                for k, v in request.headers.items()
+                if k.lower() in ("authorization", "accept")
+            }
+            upstream = await upstream_client.get(
+                path, params=tuple(query), headers=forwarded
+            )
+            content_type = upstream.headers.get("content-type", "application/json")
+            cassettes.save(
+                "GET", path, query, upstream.status_code, upstream.content, content_type
+            )
+            headers["X-Mock-Source"] = "upstream"
+            return Response(
+                upstream.content,
+                status_code=upstream.status_code,
+                media_type=content_type,
+                headers=headers,
+            )
+
+        for template, pattern in routes:
+            match = pattern.fullmatch(path)
+            if match:
+                grouped: dict[str, list[str]] = {}
+                for key, value in query:
+                    grouped.setdefault(key, []).append(value)
+                status, data = synthetic.respond(template, match.groupdict(), grouped)
+                headers["X-Mock-Source"] = "synthetic"
+                return JSONResponse(data, status, headers=headers)
+
+        return JSONResponse({"detail": "Not Found"}, 404, headers=headers)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="osu! API 本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        help="fixed:MS / uniform:LO:HI / lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=int, default=1200, help="每分钟请求额度")
+    parser.add_argument("--record", action="store_true", help="转发到上游并录制响应")
+    parser.add_argument("--upstream", default="https://lazer-api.g0v0.top")
+    parser.add_argument("--cassettes", type=Path, default=DEFAULT_CASSETTE_DIR)
+    parser.add_argument(
+        "--seed", type=int, default=None, help="延迟与错误注入的随机种子"
+    )
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    settings = MockSettings(
+        latency=LatencyModel.parse(args.latency),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+        record=args.record,
+        upstream=args.upstream,
+        cassette_dir=args.cassettes,
+    )
+    logger.info(f"osu! API 替身启动: http://{args.host}:{args.port} ({settings})")
+
+    import uvicorn
+
+    uvicorn.run(create_app(settings), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,7 @@ import io
 
 from discord import File
 
-from frontend.discord.util import resolve_username
-from backend.user import get_user_info
+from frontend.discord.util import resolve_user
 from renderer.scores import (
     render_user_beatmap_scores,
     get_scores_page_count,
@@ -173,9 +172,7 @@ class Scores(Cog):
     @app_commands.describe(beatmap_id="beatmap id")
     async def scores(self, ctx: commands.Context, beatmap_id: int):
         await ctx.defer()
-        username = await resolve_username(ctx, None)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, None)
 
         total_pages = await get_scores_page_count(user_id, beatmap_id)
         content = await render_user_beatmap_scores(user_id, beatmap_id, 1)
@@ -192,9 +189,7 @@ class Scores(Cog):
     @app_commands.describe(user="osu! username or mention")
     async def ps(self, ctx: commands.Context, user: str | None = None):
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, user)
 
         # type=recent, include_fails=False (Passed only)
         # Note: API "recent" implies last 24h
@@ -219,9 +214,7 @@ class Scores(Cog):
     @app_commands.describe(user="osu! username or mention")
     async def rs(self, ctx: commands.Context, user: str | None = None):
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, user)
 
         # type=recent, include_fails=True
         content = await render_user_score_list(
@@ -246,9 +239,7 @@ class Scores(Cog):
     @app_commands.describe(user="osu! username or mention")
     async def t(self, ctx: commands.Context, user: str | None = None):
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, user)
 
         # 获取今日（24小时内）刷新的BP
         content = await render_user_today_bp(user_id, page=1)
@@ -264,9 +255,7 @@ class Scores(Cog):
     @app_commands.describe(user="osu! username or mention")
     async def p(self, ctx: commands.Context, user: str | None = None):
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, user)
 
         # type=recent, include_fails=False, limit=1
         content = await render_user_recent_score(user_id, "recent", include_fails=False)
@@ -278,9 +267,7 @@ class Scores(Cog):
     @app_commands.describe(user="osu! username or mention")
     async def r(self, ctx: commands.Context, user: str | None = None):
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, user)
 
         # type=recent, include_fails=True, limit=1
         content = await render_user_recent_score(user_id, "recent", include_fails=True)
@@ -295,9 +282,7 @@ class Scores(Cog):
     async def uss(self, ctx: commands.Context, beatmap_id: int):
         """查询谱面成绩（图片卡片版）"""
         await ctx.defer()
-        username = await resolve_username(ctx, None)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, _ = await resolve_user(ctx, None)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_beatmap_score_card(user_id, beatmap_id)
@@ -310,9 +295,7 @@ class Scores(Cog):
     async def ups(self, ctx: commands.Context, user: str | None = None):
         """查询最近通过成绩（图片版）"""
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, username = await resolve_user(ctx, user)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_score_list_image(
@@ -327,9 +310,7 @@ class Scores(Cog):
     async def urs(self, ctx: commands.Context, user: str | None = None):
         """查询最近成绩（图片版，包含失败）"""
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, username = await resolve_user(ctx, user)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_score_list_image(
@@ -345,9 +326,7 @@ class Scores(Cog):
     async def ut(self, ctx: commands.Context, user: str | None = None):
         """查询今日BP（图片版）"""
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, username = await resolve_user(ctx, user)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_today_bp_image(user_id, username)
@@ -360,9 +339,7 @@ class Scores(Cog):
     async def up(self, ctx: commands.Context, user: str | None = None):
         """查询最新通过成绩（图片版）"""
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, username = await resolve_user(ctx, user)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_recent_score_card(user_id, include_fails=False)
@@ -375,9 +352,7 @@ class Scores(Cog):
     async def ur(self, ctx: commands.Context, user: str | None = None):
         """查询最新成绩（图片版，包含失败）"""
         await ctx.defer()
-        username = await resolve_username(ctx, user)
-        user_info = await get_user_info(username)
-        user_id = user_info["id"]
+        user_id, username = await resolve_user(ctx, user)
 
         # 调用 renderer，由 renderer 负责获取数据和渲染
         image = await render_user_recent_score_card(user_id, include_fails=True)
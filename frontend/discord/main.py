@@ -4,9 +4,16 @@ from discord.ext import commands
 import os
 
 
+from backend.api_client import (
+    close_http_client,
+    init_http_client,
+    warm_up_oauth_token,
+)
+from utils.caches import close_cache, save_cache_snapshot, warm_up_cache
 from utils.flt_mgr import init_flt_mgr
 from utils.html2image import close_browser, init_browser
 from utils.logger import get_logger
+from utils.request_scope import enter_request_scope, exit_request_scope
 
 from utils.variable import BOT_TOKEN
 
@@ -20,7 +27,34 @@ intents = discord.Intents.default()
 intents.message_content = True
 
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class RedfoxBot(commands.Bot):
+    async def close(self):
+        await super().close()
+
+        # on_disconnect 在断线重连时也会触发，连接池只在 bot 真正关闭时释放
+        await close_http_client()
+
+        # 保存内存缓存快照，并把尚未落盘的缓存写入磁盘
+        await save_cache_snapshot()
+        await close_cache()
+
+        from backend.database import close_database
+
+        await close_database()
+
+
+bot = RedfoxBot(command_prefix="!", intents=intents)
+
+
+@bot.before_invoke
+async def enter_command_scope(ctx: commands.Context):
+    # 整条命令共享一个请求作用域，重复的后端查询只请求一次
+    setattr(ctx, "request_scope_token", enter_request_scope())
+
+
+@bot.after_invoke
+async def exit_command_scope(ctx: commands.Context):
+    exit_request_scope(getattr(ctx, "request_scope_token", None))
 
 
 @bot.event
@@ -65,10 +99,20 @@ async def load_cogs():
 
 @bot.event
 async def setup_hook():
-    from backend.database import create_db_and_tables
+    from backend.database import create_db_and_tables, load_binding_index
 
     await create_db_and_tables()
 
+    # 绑定关系常驻内存，命令解析用户时不再查询数据库
+    await load_binding_index()
+
+    # 在后台加载缓存快照，不阻塞启动
+    warm_up_cache()
+
+    await init_http_client()
+
+    await warm_up_oauth_token()
+
     await load_cogs()
 
 
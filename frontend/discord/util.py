@@ -3,26 +3,50 @@ from discord.ext.commands import Context
 from backend.expections.user import UserNotBindError
 import re
 
-from backend.database import get_osu_user_by_discord_id
+from backend.database import OsuBinding, get_osu_binding
+from backend.user import resolve_user_id_and_name
 
 
-async def resolve_username(ctx: Context, user_arg: str | User | Member | None) -> str:
-    target_discord_id: int = 0
+def _parse_user_arg(ctx: Context, user_arg: str | User | Member | None) -> int | str:
+    """命令参数 -> 目标 Discord 用户 ID（int），参数是 osu! 用户名时原样返回（str）"""
     if user_arg is None:
-        target_discord_id = ctx.author.id
-    elif isinstance(user_arg, (User, Member)):
-        target_discord_id = user_arg.id
-    elif isinstance(user_arg, str):
-        match = re.match(r"<@!?(\d+)>", user_arg)
-        if match:
-            target_discord_id = int(match.group(1))
-        else:
-            return user_arg
-
-    osu_user = await get_osu_user_by_discord_id(target_discord_id)
+        return ctx.author.id
+    if isinstance(user_arg, (User, Member)):
+        return user_arg.id
+    match = re.match(r"<@!?(\d+)>", user_arg)
+    if match:
+        return int(match.group(1))
+    return user_arg
+
+
+async def _get_binding(target_discord_id: int) -> OsuBinding:
+    osu_user = await get_osu_binding(target_discord_id)
     if osu_user is None:
         user_mention_str = f"<@{target_discord_id}>"
         raise UserNotBindError(
             user_mention_str,
         )
-    return osu_user.osu_username
+    return osu_user
+
+
+async def resolve_username(ctx: Context, user_arg: str | User | Member | None) -> str:
+    target = _parse_user_arg(ctx, user_arg)
+    if isinstance(target, str):
+        return target
+    return (await _get_binding(target)).osu_username
+
+
+async def resolve_user(
+    ctx: Context, user_arg: str | User | Member | None
+) -> tuple[int, str]:
+    """
+    解析为 (osu! 用户 ID, 当前用户名)
+
+    已绑定的用户直接使用保存的 osu_id 与用户名；其他用户名先查别名表与缓存的用户信息，
+    都不需要请求用户信息接口。
+    """
+    target = _parse_user_arg(ctx, user_arg)
+    if isinstance(target, str):
+        return await resolve_user_id_and_name(target)
+    osu_user = await _get_binding(target)
+    return osu_user.osu_id, osu_user.osu_username
@@ -5,7 +5,7 @@ score_card_basic minifilter
 某些 API 端点返回的成绩数据可能缺少这些嵌套对象，通过请求 beatmap API 获取完整信息。
 """
 
-from backend.beatmap import get_beatmap_info
+from backend.beatmap import load_beatmap_info
 from utils.logger import get_logger
 
 logger = get_logger("minifilters.score_card_basic")
@@ -42,7 +42,7 @@ async def process(data: dict) -> dict:
     if beatmap_id:
         try:
             # 请求 beatmap API 获取完整信息
-            beatmap_info = await get_beatmap_info(beatmap_id)
+            beatmap_info = await load_beatmap_info(beatmap_id)
 
             # 设置 beatmap
             if "beatmap" not in result or not isinstance(result.get("beatmap"), dict):
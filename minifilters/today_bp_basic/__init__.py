@@ -7,7 +7,7 @@ today_bp_basic minifilter
 
 import asyncio
 
-from backend.beatmap import get_beatmap_info
+from backend.beatmap import load_beatmap_info
 
 
 async def _ensure_score_nested_objects(score: dict) -> dict:
@@ -33,8 +33,8 @@ async def _ensure_score_nested_objects(score: dict) -> dict:
 
     if beatmap_id:
         try:
-            # 请求 beatmap API 获取完整信息
-            beatmap_info = await get_beatmap_info(beatmap_id)
+            # 请求 beatmap API 获取完整信息（同一列表内的请求会合并为一次批量请求）
+            beatmap_info = await load_beatmap_info(beatmap_id)
 
             # 设置 beatmap
             if "beatmap" not in result or not isinstance(result.get("beatmap"), dict):
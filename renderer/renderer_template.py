@@ -13,6 +13,7 @@ from backend.expections import (
 )
 from utils.strings import format_template
 from utils.logger import get_logger
+from utils.request_scope import request_scope
 
 logger = get_logger("renderer")
 
@@ -79,6 +80,8 @@ def renderer(func: Callable) -> Callable:
     """
     装饰器：自动捕获异常并调用统一处理器
 
+    同时开启请求作用域，renderer 内对同一后端函数的重复调用只会请求一次。
+
     用法:
         @renderer
         async def render_something(...) -> Any:
@@ -88,7 +91,8 @@ def renderer(func: Callable) -> Callable:
     @functools.wraps(func)
     async def wrapper(*args, **kwargs) -> Any:
         try:
-            return await func(*args, **kwargs)
+            with request_scope():
+                return await func(*args, **kwargs)
         except Exception as e:
             # 记录详细错误信息到日志
             logger.error(f"Error in renderer '{func.__name__}': {e}")
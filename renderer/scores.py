@@ -8,7 +8,7 @@ from typing import List, Dict, Any, Tuple, Optional
 
 from backend.scores import get_user_beatmap_all_scores, get_user_scores, ScoreQueryError
 from backend.beatmap import get_beatmap_info
-from backend.user import get_user_info
+from backend.user import load_user
 from renderer.renderer_template import renderer
 from renderer.skin_loader import render_template as render_skin_template
 from utils.html2image import html_to_image
@@ -154,7 +154,7 @@ async def render_user_beatmap_scores(
     """
     # 获取数据
     scores = await get_user_beatmap_all_scores(user_id, beatmap_id, ruleset)
-    user_info = await get_user_info(user_id)
+    user_info = await load_user(user_id)
     beatmap_info = await get_beatmap_info(beatmap_id)
 
     username = user_info.get("username", "Unknown")
@@ -267,7 +267,7 @@ async def render_user_score_list(
     scores = await get_user_scores(
         user_id, type, include_fails=include_fails, limit=limit
     )
-    user_info = await get_user_info(user_id)
+    user_info = await load_user(user_id)
     username = user_info.get("username", "Unknown")
 
     if not scores:
@@ -327,7 +327,7 @@ async def render_user_recent_score(
     """
     # 获取 limit=1 的成绩
     scores = await get_user_scores(user_id, type, include_fails=include_fails, limit=1)
-    user_info = await get_user_info(user_id)
+    user_info = await load_user(user_id)
     username = user_info.get("username", "Unknown")
 
     if not scores:
@@ -418,7 +418,7 @@ async def render_user_today_bp(user_id: int, page: int = 1, limit: int = 100) ->
     """
     # 获取用户的best成绩
     scores = await get_user_scores(user_id, "best", include_fails=False, limit=limit)
-    user_info = await get_user_info(user_id)
+    user_info = await load_user(user_id)
     username = user_info.get("username", "Unknown")
 
     if not scores:
@@ -512,8 +512,7 @@ async def render_user_beatmap_score_card(
     scores = await get_user_beatmap_all_scores(user_id, beatmap_id)
     if not scores:
         # 没有成绩，抛出异常让 decorator 处理
-        from backend.user import get_user_info
-        user_info = await get_user_info(user_id)
+        user_info = await load_user(user_id)
         raise ScoreQueryError(
             user_info.get("username", str(user_id)),
             beatmap_id,
@@ -564,8 +563,7 @@ async def render_user_recent_score_card(
     scores = await get_user_scores(user_id, "recent", include_fails=include_fails, limit=1)
     if not scores:
         # 没有成绩，抛出异常让 decorator 处理
-        from backend.user import get_user_info
-        user_info = await get_user_info(user_id)
+        user_info = await load_user(user_id)
         raise ScoreQueryError(
             user_info.get("username", str(user_id)),
             0,
@@ -0,0 +1,293 @@
+"""
+utils.caches 的编码、L2 后端与两级缓存测试
+
+后端相关的用例分别在 SQLite 后端（临时目录）和 Redis 后端（fakeredis 进程内替身）上运行。
+"""
+
+import asyncio
+import pickle
+import time
+
+import fakeredis
+import pytest
+
+from utils import caches
+from utils.caches import CacheEntry, RedisBackend, SQLiteBackend, TwoTierCache
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        return SQLiteBackend(tmp_path / "cache.db")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "redis.asyncio.from_url", lambda url: fakeredis.FakeAsyncRedis(server=server)
+    )
+    return RedisBackend("redis://localhost", "test:")
+
+
+@pytest.fixture
+def isolated_cache(backend, monkeypatch):
+    """让模块级接口（set_cache / get_cache 等）使用测试后端"""
+    monkeypatch.setattr(caches, "FLUSH_DELAY", 0.01)
+    monkeypatch.setattr(caches, "_cache", TwoTierCache(1 << 20, backend))
+    monkeypatch.setattr(caches, "_tag_invalidations", {})
+    monkeypatch.setattr(caches, "_tag_retention", {})
+    return backend
+
+
+def _run(backend, scenario):
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await backend.close()
+
+    asyncio.run(run())
+
+
+def _entry(value, ttl=60.0) -> CacheEntry:
+    now = time.time()
+    return CacheEntry(
+        value=value, stale_at=now + ttl, expires_at=now + ttl, created_at=now
+    )
+
+
+def test_codec_round_trip():
+    entry = CacheEntry(
+        value={"content": b"{}", "ids": [1, 2], 7: None},
+        stale_at=1.0,
+        expires_at=2.0,
+        created_at=0.5,
+        tags=("user:7",),
+    )
+    blob = caches._serialize(entry)
+    assert not caches._is_compressed(blob)
+    assert caches._deserialize(blob) == entry
+
+
+def test_codec_compresses_large_values(monkeypatch):
+    monkeypatch.setattr(caches, "COMPRESS_MIN_BYTES", 1024)
+    entry = _entry({"scores": [{"pp": 100.0, "mods": ["HD", "DT"]}] * 500})
+    blob = caches._serialize(entry)
+    assert caches._is_compressed(blob)
+    assert len(blob) < 1024
+    assert caches._deserialize(blob).value == entry.value
+
+
+@pytest.mark.parametrize(
+    "blob",
+    [
+        b"",
+        b"\x7f" + b"payload",
+        pickle.dumps({"value": 1}),
+    ],
+    ids=["empty", "unknown-codec", "pickle"],
+)
+def test_codec_rejects_unknown_data(blob):
+    with pytest.raises(ValueError):
+        caches._deserialize(blob)
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(caches, "COMPRESS_MIN_BYTES", 1024)
+    monkeypatch.setattr(caches, "_codec_stats", caches.CodecStats())
+
+    async def scenario():
+        cache = TwoTierCache(1 << 20, caches.CacheBackend())
+        monkeypatch.setattr(caches, "_cache", cache)
+        retain_until = time.time() + 60
+        await cache.set("small", _entry({"pp": 1}), retain_until)
+        await cache.set("large", _entry({"scores": [{"pp": 1.0}] * 500}), retain_until)
+        await cache.set("expired", _entry(1), time.time() - 1)
+        path = tmp_path / "cache.snapshot"
+        assert await caches.save_cache_snapshot(path) == 2
+
+        monkeypatch.setattr(caches, "_cache", TwoTierCache(1 << 20, cache.l2))
+        decodes = caches._codec_stats.decodes
+        assert await caches.load_cache_snapshot(path) == 2
+        # 未压缩的条目加载时解码，压缩的条目命中时才解码
+        assert caches._codec_stats.decodes == decodes + 1
+        small = await caches._cache.get("small")
+        large = await caches._cache.get("large")
+        assert small is not None and small.value == {"pp": 1}
+        assert large is not None and len(large.value["scores"]) == 500
+
+    asyncio.run(scenario())
+
+
+def test_backend_get_set_delete(backend):
+    async def scenario():
+        assert await backend.get("a") is None
+        retain_until = time.time() + 60
+        await backend.write_many(
+            {"a": (b"value-a", retain_until), "b": (b"value-b", retain_until)}
+        )
+        blob, stored_retain = await backend.get("a")
+        assert blob == b"value-a"
+        assert stored_retain == pytest.approx(retain_until)
+
+        await backend.write_many({"a": (b"value-a2", retain_until), "b": None})
+        assert (await backend.get("a"))[0] == b"value-a2"
+        assert await backend.get("b") is None
+
+        await backend.clear()
+        assert await backend.get("a") is None
+
+    _run(backend, scenario)
+
+
+def test_backend_ttl_expiry_and_purge(backend):
+    async def scenario():
+        now = time.time()
+        await backend.write_many(
+            {"short": (b"x", now + 0.05), "long": (b"y", now + 60)}
+        )
+        assert await backend.get("short") is not None
+        await asyncio.sleep(0.1)
+        assert await backend.get("short") is None
+
+        purged = await backend.purge_expired()
+        # Redis 由服务端按 PX 过期，purge_expired 无需删除任何条目
+        assert purged == (1 if backend.name == "sqlite" else 0)
+        assert await backend.get("long") is not None
+
+        # 保留期限已过的写入等同于删除
+        await backend.write_many({"long": (b"z", now - 1)})
+        assert await backend.get("long") is None
+
+    _run(backend, scenario)
+
+
+def test_write_behind_flush(backend, monkeypatch):
+    monkeypatch.setattr(caches, "FLUSH_DELAY", 0.01)
+
+    async def scenario():
+        cache = TwoTierCache(1 << 20, backend)
+        await cache.set("k", _entry({"pp": 1}), time.time() + 60)
+        # 先写入 L1 与待写队列，L2 中还没有
+        entry = await cache.get("k")
+        assert entry is not None and entry.value == {"pp": 1}
+        assert await backend.get("k") is None
+
+        await asyncio.sleep(0.05)
+        assert await backend.get("k") is not None
+        # 新的进程（空 L1）从 L2 读取
+        entry = await TwoTierCache(1 << 20, backend).get("k")
+        assert entry is not None and entry.value == {"pp": 1}
+
+        await cache.delete("k")
+        assert await cache.get("k") is None
+        await cache.flush()
+        assert await backend.get("k") is None
+
+    _run(backend, scenario)
+
+
+def test_undecodable_backend_value_is_a_miss(backend):
+    async def scenario():
+        await backend.write_many({"k": (pickle.dumps({"value": 1}), time.time() + 60)})
+        cache = TwoTierCache(1 << 20, backend)
+        assert await cache.get("k") is None
+        await cache.flush()
+        assert await backend.get("k") is None
+
+    _run(backend, scenario)
+
+
+def test_flush_keeps_pending_writes_when_backend_fails(backend, monkeypatch):
+    async def scenario():
+        cache = TwoTierCache(1 << 20, backend)
+        await cache.set("k", _entry(1), time.time() + 60)
+
+        async def fail(writes):
+            raise ConnectionError("unavailable")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(backend, "write_many", fail)
+            await cache.flush()
+        assert await backend.get("k") is None
+
+        await cache.flush()
+        assert await backend.get("k") is not None
+
+    _run(backend, scenario)
+
+
+def test_tag_invalidation(isolated_cache):
+    async def scenario():
+        await caches.set_cache("user:info:1", {"pp": 1}, ttl=60, tags=("user:1",))
+        await caches.set_cache("user:info:2", {"pp": 2}, ttl=60, tags=("user:2",))
+        await caches.invalidate_cache_tags("user:1")
+
+        assert await caches.get_cache("user:info:1") is None
+        assert await caches.get_cache("user:info:2") == {"pp": 2}
+
+        # 失效之后写入的条目不受影响
+        await caches.set_cache("user:info:1", {"pp": 3}, ttl=60, tags=("user:1",))
+        assert await caches.get_cache("user:info:1") == {"pp": 3}
+
+    _run(isolated_cache, scenario)
+
+
+def test_tag_invalidation_is_shared_through_backend(isolated_cache, monkeypatch):
+    async def scenario():
+        await caches.set_cache("user:info:1", {"pp": 1}, ttl=60, tags=("user:1",))
+        await caches._cache.flush()
+
+        # 另一个进程：L1 与本地失效记录为空，共享同一个 L2
+        other = TwoTierCache(1 << 20, isolated_cache)
+        monkeypatch.setattr(caches, "_cache", other)
+        monkeypatch.setattr(caches, "_tag_invalidations", {})
+        await caches.invalidate_cache_tags("user:1")
+        await other.flush()
+
+        first = TwoTierCache(1 << 20, isolated_cache)
+        monkeypatch.setattr(caches, "_cache", first)
+        monkeypatch.setattr(caches, "_tag_invalidations", {})
+        assert await caches.get_cache("user:info:1") is None
+
+    _run(isolated_cache, scenario)
+
+
+def test_concurrent_tag_invalidations_are_not_lost(isolated_cache, monkeypatch):
+    async def scenario():
+        await caches.set_cache("user:info:1", {"pp": 1}, ttl=60, tags=("user:1",))
+        await caches.set_cache("user:info:2", {"pp": 2}, ttl=60, tags=("user:2",))
+        await caches._cache.flush()
+
+        # 两个共享 L2 的进程几乎同时使不同的标签失效
+        first, second = (TwoTierCache(1 << 20, isolated_cache) for _ in range(2))
+        for cache, tag in ((first, "user:1"), (second, "user:2")):
+            monkeypatch.setattr(caches, "_cache", cache)
+            monkeypatch.setattr(caches, "_tag_invalidations", {})
+            await caches.invalidate_cache_tags(tag)
+        await first.flush()
+        await second.flush()
+
+        monkeypatch.setattr(caches, "_cache", TwoTierCache(1 << 20, isolated_cache))
+        monkeypatch.setattr(caches, "_tag_invalidations", {})
+        assert await caches.get_cache("user:info:1") is None
+        assert await caches.get_cache("user:info:2") is None
+
+    _run(isolated_cache, scenario)
+
+
+def test_tag_invalidations_expire_with_retention(isolated_cache):
+    async def scenario():
+        await caches.set_cache(
+            "user:info:1", {"pp": 1}, ttl=60, stale_if_error=30, tags=("user:1",)
+        )
+        await caches.invalidate_cache_tags("user:1", "unknown:1")
+        await caches._cache.flush()
+
+        # user 类标签最多保留 90 秒；未知类别按默认期限保留
+        now = time.time()
+        _, user_retain = await isolated_cache.get("cache:tag_invalidated:user:1")
+        _, unknown_retain = await isolated_cache.get("cache:tag_invalidated:unknown:1")
+        assert user_retain == pytest.approx(now + 90, abs=5)
+        assert unknown_retain == pytest.approx(
+            now + caches._TAG_INVALIDATIONS_TTL, abs=5
+        )
+
+    _run(isolated_cache, scenario)
@@ -0,0 +1,59 @@
+"""
+Bloom 过滤器
+
+判断元素 "一定不在集合中" 或 "可能在集合中"，不支持删除。
+位数组大小与哈希函数个数按预期容量和目标误判率计算。
+
+用法:
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    bloom.add("peppy")
+    "peppy" in bloom  # True
+"""
+
+import hashlib
+import math
+
+
+class BloomFilter:
+    """基于 bytearray 的 Bloom 过滤器（双重哈希生成 k 个位置）"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity: 预期元素数量
+            error_rate: 达到预期容量时的目标误判率
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item)
+        )
+
+    def estimated_error_rate(self) -> float:
+        """按当前元素数量估算的误判率: (1 - e^(-kn/m))^k"""
+        return (
+            1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        ) ** self.num_hashes
+
+    def memory_bytes(self) -> int:
+        """位数组占用的字节数"""
+        return len(self._bits)
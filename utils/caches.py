@@ -1,17 +1,885 @@
-from typing import Any, Optional
-from aiocache import Cache
+"""
+两级缓存
 
-_cache = Cache(Cache.MEMORY)
+L1: 进程内 LRU，按序列化后的字节数计入预算，超出预算时淘汰最久未使用的条目
+L2: 可插拔的共享存储，由配置 cache.backend 选择；L1 未命中时回落到 L2 并回填 L1
+    - memory: 不使用 L2，只有进程内缓存
+    - sqlite: SQLite 持久化存储，重启后依然有效（默认）
+    - redis: Redis 协议服务器，多个 bot 进程共享缓存（包括 OAuth 令牌）
 
+写入 L2 采用写回（write-behind）：set / delete 先进入待写队列，
+短暂延迟后批量写入 L2，避免每次 set_cache 都等待磁盘 / 网络 IO。
+L2 不可用时读取视为未命中，写入保留在队列中等待重试（有上限）。
 
-async def set_cache(key: str, value: Any, ttl: int = 300) -> None:
-    """设置缓存"""
-    await _cache.set(key, value, ttl=ttl)
+对外接口保持不变: set_cache / get_cache / delete_cache / exists_cache / clear_cache
+
+另外提供 get_or_fetch / get_or_fetch_many 读穿缓存，支持软 / 硬两级 TTL:
+    - 未过软 TTL：直接返回
+    - 过软 TTL、未过硬 TTL（stale-while-revalidate）：立即返回旧值，后台刷新
+    - 过硬 TTL：同步请求上游；上游失败时，只要旧值仍在保留期内
+      （stale-if-error），依然返回旧值
+
+条目可以带标签（tags），invalidate_cache_tags 会让标签下此前写入的条目全部失效。
+各端点的 TTL 与标签由 config/api.yaml 中的 cache_policies 声明，见 CachePolicy。
+
+值用 msgpack 序列化（不使用 pickle，L2 / 快照中的数据被篡改也不会执行代码），
+序列化后超过 cache.compress_min_bytes 的值（成绩列表等）用 zstd（Python 3.14+）或 zlib 压缩，
+L1 中也只保留压缩后的字节，每次命中时解码。缓存值只能是 msgpack 支持的类型（元组读回时为列表）。
+
+读取按键的前两段（如 beatmap:info、oauth:token）分命名空间统计命中、过期命中、未命中、
+L1 淘汰与占用字节，以及读取 / 上游请求的延迟分布，见 get_cache_stats。
+
+开启 refresh_hot 的读取会计入 Count-Min Sketch，读取频繁的热点条目
+由 refresh_hot_cache 定时任务在软 TTL 到期前以后台优先级提前刷新。
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional, cast
+
+import msgpack
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+from utils.count_min import CountMinSketch
+from utils.logger import get_logger
+from utils.scheduler_registry import scheduled_task
+from utils.singleflight import SingleFlight
+from utils.variable import (
+    CACHE_BACKEND,
+    CACHE_COMPRESS_LEVEL,
+    CACHE_COMPRESS_MIN_BYTES,
+    CACHE_FILE,
+    CACHE_MEMORY_LIMIT,
+    CACHE_REDIS_PREFIX,
+    CACHE_REDIS_URL,
+    CACHE_SNAPSHOT_FILE,
+    working_dir,
+)
+
+logger = get_logger("utils.caches")
+
+# 待写队列的落盘延迟（秒）
+FLUSH_DELAY = 1.0
+# L2 不可用时待写队列的最大长度
+MAX_PENDING_WRITES = 50000
+# 序列化后达到该大小的值压缩存储
+COMPRESS_MIN_BYTES = CACHE_COMPRESS_MIN_BYTES
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """缓存条目"""
+
+    value: Any
+    stale_at: float  # 软 TTL：超过后返回旧值并后台刷新
+    expires_at: float  # 硬 TTL：超过后需要同步刷新，上游失败时仍可兜底
+    created_at: float = 0.0
+    tags: tuple[str, ...] = ()
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.stale_at
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.expires_at
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    缓存策略
+
+    Attributes:
+        ttl: 硬 TTL（秒），0 表示不缓存
+        soft_ttl: 软 TTL（秒），None 表示与 ttl 相同
+        stale_if_error: 过硬 TTL 后继续保留多久（秒），供上游失败时兜底
+        per_user: 是否按用户分组，为条目附加 user:{user_id} 标签，
+                  以便 invalidate_cache_tags 按用户失效
+        tags: 附加的失效标签
+        refresh_hot: 热点条目是否在软 TTL 到期前主动刷新
+    """
+
+    ttl: int = 0
+    soft_ttl: Optional[int] = None
+    stale_if_error: int = 0
+    per_user: bool = False
+    tags: tuple[str, ...] = ()
+    refresh_hot: bool = False
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "CachePolicy":
+        return cls(
+            ttl=int(config.get("ttl", 0)),
+            soft_ttl=config.get("soft_ttl"),
+            stale_if_error=int(config.get("stale_if_error", 0)),
+            per_user=bool(config.get("per_user", False)),
+            tags=tuple(config.get("tags", ())),
+            refresh_hot=bool(config.get("refresh_hot", False)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def options(self, user_id: Any = None) -> dict:
+        """转换为 get_or_fetch / get_or_fetch_many 的关键字参数"""
+        tags = self.tags
+        if self.per_user and user_id is not None:
+            tags += (f"user:{str(user_id).lower()}",)
+        return {
+            "ttl": self.ttl,
+            "soft_ttl": self.soft_ttl,
+            "stale_if_error": self.stale_if_error,
+            "tags": tags,
+            "refresh_hot": self.refresh_hot,
+        }
+
+
+# 序列化格式：首字节为编码标记，之后是 msgpack 编码的 [值, 软 TTL, 硬 TTL, 写入时间, 标签]。
+# 不使用 pickle：共享的 L2 与快照文件中的数据不应能在反序列化时执行代码。
+# 超过 COMPRESS_MIN_BYTES 的值压缩后存储；未知的编码标记（包括旧版本的 pickle 数据）一律拒绝
+_CODEC_RAW = 0x00
+_CODEC_ZLIB = 0x01
+_CODEC_ZSTD = 0x02
+_CODEC_NAMES = {_CODEC_ZLIB: "zlib", _CODEC_ZSTD: "zstd"}
+_COMPRESSION_CODEC = _CODEC_ZSTD if zstd is not None else _CODEC_ZLIB
+
+
+@dataclass(slots=True)
+class CodecStats:
+    """序列化 / 压缩统计"""
+
+    encodes: int = 0
+    encode_seconds: float = 0.0
+    decodes: int = 0
+    decode_seconds: float = 0.0
+    hit_decodes: int = 0  # L1 中压缩条目被命中时的解码次数（每次命中的额外开销）
+    hit_decode_seconds: float = 0.0
+    compressed: int = 0  # 压缩存储的次数
+    compressed_raw_bytes: int = 0  # 这些值压缩前的字节数
+    compressed_bytes: int = 0  # 压缩后的字节数
+
+
+_codec_stats = CodecStats()
+
+
+def _serialize(entry: CacheEntry) -> bytes:
+    start = time.perf_counter()
+    # packb 只有在 autoreset=False 时才会返回 None
+    data = cast(
+        bytes,
+        msgpack.packb(
+            [
+                entry.value,
+                entry.stale_at,
+                entry.expires_at,
+                entry.created_at,
+                entry.tags,
+            ]
+        ),
+    )
+    blob = bytes((_CODEC_RAW,)) + data
+    if len(data) >= COMPRESS_MIN_BYTES:
+        if zstd is not None and _COMPRESSION_CODEC == _CODEC_ZSTD:
+            packed = zstd.compress(data, level=CACHE_COMPRESS_LEVEL)
+        else:
+            packed = zlib.compress(data, CACHE_COMPRESS_LEVEL)
+        # 压缩收益不大（已经是压缩数据等）时保持原样，省去每次读取的解压
+        if len(packed) < len(data) * 0.9:
+            _codec_stats.compressed += 1
+            _codec_stats.compressed_raw_bytes += len(blob)
+            _codec_stats.compressed_bytes += len(packed) + 1
+            blob = bytes((_COMPRESSION_CODEC,)) + packed
+    _codec_stats.encodes += 1
+    _codec_stats.encode_seconds += time.perf_counter() - start
+    return blob
+
+
+def _is_compressed(blob: bytes) -> bool:
+    return blob[0] in _CODEC_NAMES
+
+
+def _deserialize(blob: bytes) -> CacheEntry:
+    start = time.perf_counter()
+    codec, payload = blob[:1], memoryview(blob)[1:]
+    match codec:
+        case b"\x00":
+            data = payload
+        case b"\x01":
+            data = zlib.decompress(payload)
+        case b"\x02":
+            if zstd is None:
+                raise ValueError(
+                    "缓存值使用 zstd 压缩，当前 Python 不支持 compression.zstd"
+                )
+            data = zstd.decompress(payload)
+        case _:
+            raise ValueError(f"未知的缓存编码: {codec.hex() or '空'}")
+    value, stale_at, expires_at, created_at, tags = msgpack.unpackb(
+        data, strict_map_key=False
+    )
+    entry = CacheEntry(value, stale_at, expires_at, created_at, tuple(tags))
+    _codec_stats.decodes += 1
+    _codec_stats.decode_seconds += time.perf_counter() - start
+    return entry
+
+
+class _Packed:
+    """L1 中以压缩形式保存的条目，每次命中时解码（以 CPU 换内存）"""
+
+    __slots__ = ("blob",)
+
+    def __init__(self, blob: bytes):
+        self.blob = blob
+
+
+def _l1_value(entry: CacheEntry, blob: bytes) -> Any:
+    """较大的条目在 L1 中只保留压缩后的字节"""
+    return _Packed(blob) if _is_compressed(blob) else entry
+
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收纳更慢的请求
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图"""
+
+    __slots__ = ("counts", "total", "sum_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, q: float) -> float:
+        """估算分位数，返回所在桶的上界（毫秒）；超出最大桶时返回 inf"""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return (
+                    LATENCY_BUCKETS_MS[i]
+                    if i < len(LATENCY_BUCKETS_MS)
+                    else float("inf")
+                )
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip([*LATENCY_BUCKETS_MS, float("inf")], self.counts)),
+        }
+
+
+@dataclass(slots=True)
+class NamespaceStats:
+    """单个键命名空间的读穿统计"""
+
+    hits: int = 0  # 未过软 TTL 的命中
+    stale_hits: int = 0  # 过软 TTL、未过硬 TTL 的命中（后台刷新）
+    misses: int = 0
+    stale_on_error: int = 0  # 上游失败时用保留期内旧值兜底的次数
+    fetches: int = 0
+    fetch_errors: int = 0
+    proactive_refreshes: int = 0  # 热点条目提前刷新的次数
+    lookup_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    fetch_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+_namespace_stats: dict[str, NamespaceStats] = {}
+
+
+def _stats_for(key: str) -> NamespaceStats:
+    namespace = _namespace(key)
+    stats = _namespace_stats.get(namespace)
+    if stats is None:
+        stats = _namespace_stats[namespace] = NamespaceStats()
+    return stats
+
+
+def _namespace(key: str) -> str:
+    """统计用的键命名空间：前两段，如 beatmap:info:75 -> beatmap:info"""
+    return ":".join(key.split(":", 2)[:2])
+
+
+class MemoryTier:
+    """L1：按字节预算淘汰的 LRU"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        # key -> (value, expires_at, size)
+        self._entries: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self.evictions = 0
+        # 按命名空间统计的占用字节、条目数与淘汰次数
+        self.namespace_bytes: Counter[str] = Counter()
+        self.namespace_entries: Counter[str] = Counter()
+        self.namespace_evictions: Counter[str] = Counter()
+        # 以压缩形式（_Packed）保存、每次命中都要解码的条目
+        self.packed_entries = 0
+        self.packed_bytes = 0
+
+    def _account(self, key: str, value: Any, size: int, sign: int) -> None:
+        namespace = _namespace(key)
+        self.used_bytes += sign * size
+        if type(value) is _Packed:
+            self.packed_entries += sign
+            self.packed_bytes += sign * size
+        self.namespace_bytes[namespace] += sign * size
+        self.namespace_entries[namespace] += sign
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at, _ = entry
+        if expires_at <= time.time():
+            self.delete(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(
+        self, key: str, value: Any, expires_at: float, size: int, oldest: bool = False
+    ) -> None:
+        """写入条目；oldest=True 时作为最久未使用的条目插入（最先被淘汰）"""
+        self.delete(key)
+        # 单个条目超过预算时只写 L2
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, expires_at, size)
+        if oldest:
+            self._entries.move_to_end(key, last=False)
+        self._account(key, value, size, 1)
+        while self.used_bytes > self.max_bytes:
+            evicted_key, (evicted, _, evicted_size) = self._entries.popitem(last=False)
+            self._account(evicted_key, evicted, evicted_size, -1)
+            self.evictions += 1
+            self.namespace_evictions[_namespace(evicted_key)] += 1
+
+    def delete(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._account(key, entry[0], entry[2], -1)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.used_bytes = 0
+        self.packed_entries = 0
+        self.packed_bytes = 0
+        self.namespace_bytes.clear()
+        self.namespace_entries.clear()
+
+    def items(self) -> list[tuple[str, Any, float]]:
+        """按最久未使用到最近使用的顺序返回 (key, value, expires_at)"""
+        return [
+            (key, value, expires_at)
+            for key, (value, expires_at, _) in self._entries.items()
+        ]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend:
+    """
+    L2 后端接口，存储 key -> (序列化值, 保留期限)
+
+    本类即 memory 后端：不使用 L2，只有进程内的 L1。
+    """
+
+    name = "memory"
+
+    async def get(self, key: str) -> Optional[tuple[bytes, float]]:
+        """返回未过期的 (序列化值, 保留期限)"""
+        return None
+
+    async def write_many(
+        self, writes: dict[str, Optional[tuple[bytes, float]]]
+    ) -> None:
+        """批量写入；值为 None 表示删除"""
+
+    async def purge_expired(self) -> int:
+        """删除已过期的条目，返回删除数量"""
+        return 0
+
+    async def clear(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite 后端：单机持久化，重启后依然有效（同步实现放到线程中执行）"""
+
+    name = "sqlite"
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_expires_at ON cache (expires_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[tuple[bytes, float]]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                )
+                .fetchone()
+            )
+        return row
+
+    def _write_many(self, writes: dict[str, Optional[tuple[bytes, float]]]) -> None:
+        upserts = [(k, v[0], v[1]) for k, v in writes.items() if v is not None]
+        deletes = [(k,) for k, v in writes.items() if v is None]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET "
+                        "value = excluded.value, expires_at = excluded.expires_at",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM cache WHERE key = ?", deletes)
+
+    def _purge_expired(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+                )
+        return cursor.rowcount
+
+    def _clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM cache")
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def get(self, key: str) -> Optional[tuple[bytes, float]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def write_many(
+        self, writes: dict[str, Optional[tuple[bytes, float]]]
+    ) -> None:
+        await asyncio.to_thread(self._write_many, writes)
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._purge_expired)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis 协议后端：多个 bot 进程共享同一份缓存（也适用于 KeyDB、Valkey 等兼容实现）
+
+    值的前 8 字节为保留期限（小端 f64），过期由服务端的 PX 过期时间负责。
+    需要安装可选依赖 redis（uv sync --extra redis）。
+    """
+
+    name = "redis"
+    _RETAIN = struct.Struct("<d")
+
+    def __init__(self, url: str, prefix: str):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError(
+                "cache.backend 为 redis 时需要安装 redis: uv sync --extra redis"
+            ) from e
+
+        self.url = url
+        self.prefix = prefix
+        # 连接在第一次请求时建立
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[tuple[bytes, float]]:
+        raw = await self._redis.get(self.prefix + key)
+        if not isinstance(raw, bytes) or len(raw) < self._RETAIN.size:
+            return None
+        (retain_until,) = self._RETAIN.unpack_from(raw)
+        return raw[self._RETAIN.size :], retain_until
+
+    async def write_many(
+        self, writes: dict[str, Optional[tuple[bytes, float]]]
+    ) -> None:
+        now = time.time()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in writes.items():
+                ttl_ms = int((value[1] - now) * 1000) if value is not None else 0
+                if value is None or ttl_ms <= 0:
+                    pipe.delete(self.prefix + key)
+                else:
+                    pipe.set(
+                        self.prefix + key,
+                        self._RETAIN.pack(value[1]) + value[0],
+                        px=ttl_ms,
+                    )
+            await pipe.execute()
+
+    async def clear(self) -> None:
+        """只删除本前缀下的键，不影响同一实例中的其他数据"""
+        batch = []
+        async for key in self._redis.scan_iter(match=f"{self.prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._redis.delete(*batch)
+                batch.clear()
+        if batch:
+            await self._redis.delete(*batch)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_cache_backend(kind: str) -> CacheBackend:
+    """按配置创建 L2 后端: memory / sqlite / redis"""
+    match kind:
+        case "memory":
+            return CacheBackend()
+        case "sqlite":
+            return SQLiteBackend(working_dir / CACHE_FILE)
+        case "redis":
+            return RedisBackend(CACHE_REDIS_URL, CACHE_REDIS_PREFIX)
+        case _:
+            raise ValueError(f"未知的缓存后端: {kind}")
+
+
+class TwoTierCache:
+    """
+    L1 内存 LRU + 可插拔的 L2 后端
+
+    使用共享的 L2（redis）时，各进程的 L1 仍是本地的：
+    其他进程写入的新值要等本地 L1 中的条目过期或被淘汰后才可见。
+    """
+
+    def __init__(self, memory_limit: int, backend: CacheBackend):
+        self.l1 = MemoryTier(memory_limit)
+        self.l2 = backend
+        # key -> (序列化值, 过期时间) 或 None（删除）
+        self._pending: dict[str, Optional[tuple[bytes, float]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _get_stored(self, key: str) -> Optional[tuple[bytes, float]]:
+        """从待写队列或 L2 读取未过保留期的 (序列化值, 保留期限)；L2 不可用时视为未命中"""
+        if key in self._pending:
+            entry = self._pending[key]
+        else:
+            try:
+                entry = await self.l2.get(key)
+            except Exception as e:
+                logger.warning(f"读取 {self.l2.name} 缓存失败: {key} ({e})")
+                return None
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry
+
+    async def get(self, key: str, skip_l1: bool = False) -> Optional[CacheEntry]:
+        """读取条目；skip_l1=True 时直接读 L2（用于需要看到其他进程写入的场景）"""
+        if not skip_l1:
+            hit, value = self.l1.get(key)
+            if hit and type(value) is _Packed:
+                start = time.perf_counter()
+                try:
+                    entry = _deserialize(value.blob)
+                except Exception as e:
+                    logger.warning(f"缓存解码失败，丢弃: {key} ({e})")
+                    await self.delete(key)
+                    return None
+                _codec_stats.hit_decodes += 1
+                _codec_stats.hit_decode_seconds += time.perf_counter() - start
+                return entry
+            if hit:
+                return value
+
+        entry = await self._get_stored(key)
+        if entry is None:
+            return None
+
+        blob, expires_at = entry
+        try:
+            value = _deserialize(blob)
+        except Exception as e:
+            logger.warning(f"缓存反序列化失败，丢弃: {key} ({e})")
+            await self.delete(key)
+            return None
+        self.l1.set(key, _l1_value(value, blob), expires_at, len(blob))
+        return value
+
+    async def set(self, key: str, entry: CacheEntry, retain_until: float) -> None:
+        """写入条目，两级存储都保留到 retain_until"""
+        blob = _serialize(entry)
+        self.l1.set(key, _l1_value(entry, blob), retain_until, len(blob))
+        self._pending[key] = (blob, retain_until)
+        self._schedule_flush()
+
+    async def delete(self, key: str) -> int:
+        existed = self.l1.delete(key) or await self._get_stored(key) is not None
+        self._pending[key] = None
+        self._schedule_flush()
+        return int(existed)
+
+    async def clear(self) -> None:
+        self.l1.clear()
+        self._pending.clear()
+        await self.l2.clear()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(FLUSH_DELAY)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """把待写队列落盘"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await self.l2.write_many(pending)
+        except Exception as e:
+            logger.error(f"缓存写入 {self.l2.name} 失败: {e}")
+            # 保留未写入的条目，等待下次落盘（期间新写入的值优先）
+            self._pending = {**pending, **self._pending}
+            if len(self._pending) > MAX_PENDING_WRITES:
+                # L2 长时间不可用：丢弃最早的写入，只在 L1 中保留
+                for key in list(self._pending)[
+                    : len(self._pending) - MAX_PENDING_WRITES
+                ]:
+                    del self._pending[key]
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        await self.l2.close()
+
+
+_cache = TwoTierCache(CACHE_MEMORY_LIMIT, create_cache_backend(CACHE_BACKEND))
+
+
+# 标签的失效记录：每个标签一个键，值为失效时间；早于该时间写入且带该标签的条目视为不存在。
+# 每次失效只写入对应标签的键，共享后端的多个进程不会互相覆盖；记录按标签类别的保留时间自动过期
+_TAG_INVALIDATION_PREFIX = "cache:tag_invalidated:"
+_TAG_INVALIDATIONS_TTL = 90 * 86400
+# 本地记录的有效期，过期后从 L2 重新读取，以便看到其他进程（共享后端）的失效记录
+_TAG_INVALIDATIONS_RELOAD = 10.0
+# 本地记录超过该数量时清理已无用的记录
+_TAG_INVALIDATIONS_LOCAL_LIMIT = 10000
+# 标签 -> (失效时间（没有记录时为 0）, 读取时间 time.monotonic())
+_tag_invalidations: dict[str, tuple[float, float]] = {}
+# 标签类别（第一段，如 user:123 -> user）-> 带该类标签的条目最长保留时间（硬 TTL + stale_if_error）。
+# 失效记录超过该时间后，失效前写入的条目都已过期，记录可以删除；
+# 未知类别（本进程尚未写入过）按 _TAG_INVALIDATIONS_TTL 保留
+_tag_retention: dict[str, float] = {}
+
+
+def _tag_family(tag: str) -> str:
+    return tag.split(":", 1)[0]
+
+
+def _tag_invalidation_ttl(tag: str) -> float:
+    return _tag_retention.get(_tag_family(tag), _TAG_INVALIDATIONS_TTL)
+
+
+def _remember_tag_invalidation(tag: str, at: float) -> None:
+    """记录标签的失效时间，本地记录过多时删除已不会再影响任何条目、且需要重新读取的记录"""
+    now = time.monotonic()
+    _tag_invalidations[tag] = (at, now)
+    if len(_tag_invalidations) <= _TAG_INVALIDATIONS_LOCAL_LIMIT:
+        return
+    wall = time.time()
+    for other, (other_at, loaded_at) in list(_tag_invalidations.items()):
+        if (
+            now - loaded_at >= _TAG_INVALIDATIONS_RELOAD
+            and wall - other_at > _tag_invalidation_ttl(other)
+        ):
+            del _tag_invalidations[other]
+
+
+async def _tag_invalidated_at(tag: str) -> float:
+    """标签的失效时间（没有记录时为 0），每个标签每 _TAG_INVALIDATIONS_RELOAD 秒最多读取一次 L2"""
+    record = _tag_invalidations.get(tag)
+    if record is not None and time.monotonic() - record[1] < _TAG_INVALIDATIONS_RELOAD:
+        return record[0]
+    entry = await _cache.get(_TAG_INVALIDATION_PREFIX + tag, skip_l1=True)
+    stored = float(entry.value) if entry is not None else 0.0
+    # 本进程的失效记录可能尚未落盘（memory 后端则不会落盘），取较晚的时间
+    at = max(stored, record[0] if record is not None else 0.0)
+    if at and time.time() - at > _tag_invalidation_ttl(tag):
+        at = 0.0
+    _remember_tag_invalidation(tag, at)
+    return at
+
+
+async def _get_entry(key: str) -> Optional[CacheEntry]:
+    """读取条目并检查标签失效"""
+    entry = await _cache.get(key)
+    if entry is None or not entry.tags:
+        return entry
+    for tag in entry.tags:
+        if await _tag_invalidated_at(tag) >= entry.created_at:
+            await _cache.delete(key)
+            return None
+    return entry
+
+
+async def _lookup(key: str) -> tuple[Optional[CacheEntry], float]:
+    """读取条目并记录命中统计，返回 (条目, 当前时间)"""
+    start = time.perf_counter()
+    entry = await _get_entry(key)
+    now = time.time()
+    stats = _stats_for(key)
+    stats.lookup_latency.observe(time.perf_counter() - start)
+    if entry is None or not entry.is_usable(now):
+        stats.misses += 1
+    elif entry.is_fresh(now):
+        stats.hits += 1
+    else:
+        stats.stale_hits += 1
+    return entry, now
+
+
+async def _timed_fetch(key: str, fetch: Awaitable[Any]) -> Any:
+    """等待上游请求并记录耗时与失败次数"""
+    stats = _stats_for(key)
+    start = time.perf_counter()
+    stats.fetches += 1
+    try:
+        return await fetch
+    except Exception:
+        stats.fetch_errors += 1
+        raise
+    finally:
+        stats.fetch_latency.observe(time.perf_counter() - start)
+
+
+async def invalidate_cache_tags(*tags: str) -> None:
+    """使带有任一指定标签的已有条目失效"""
+    now = time.time()
+    for tag in tags:
+        _remember_tag_invalidation(tag, now)
+        await set_cache(
+            _TAG_INVALIDATION_PREFIX + tag,
+            now,
+            ttl=math.ceil(_tag_invalidation_ttl(tag)),
+        )
+
+
+async def set_cache(
+    key: str,
+    value: Any,
+    ttl: int = 300,
+    soft_ttl: Optional[int] = None,
+    stale_if_error: int = 0,
+    tags: tuple[str, ...] = (),
+) -> None:
+    """
+    设置缓存
+
+    Args:
+        ttl: 硬 TTL（秒），超过后 get_cache 不再返回该值
+        soft_ttl: 软 TTL（秒），默认与 ttl 相同
+        stale_if_error: 过硬 TTL 后继续保留多久（秒），供上游失败时兜底
+        tags: 失效标签，见 invalidate_cache_tags
+    """
+    now = time.time()
+    entry = CacheEntry(
+        value=value,
+        stale_at=now + (ttl if soft_ttl is None else min(soft_ttl, ttl)),
+        expires_at=now + ttl,
+        created_at=now,
+        tags=tuple(tags),
+    )
+    for tag in entry.tags:
+        family = _tag_family(tag)
+        _tag_retention[family] = max(
+            _tag_retention.get(family, 0.0), ttl + stale_if_error
+        )
+    await _cache.set(key, entry, retain_until=entry.expires_at + stale_if_error)
 
 
 async def get_cache(key: str) -> Optional[Any]:
     """获取缓存"""
-    return await _cache.get(key)
+    entry, now = await _lookup(key)
+    if entry is None or not entry.is_usable(now):
+        return None
+    return entry.value
+
+
+async def get_cache_entry(key: str) -> Optional[CacheEntry]:
+    """获取缓存条目（包括已过硬 TTL、仍在保留期内的条目）"""
+    return await _get_entry(key)
 
 
 async def delete_cache(key: str) -> int:
@@ -21,9 +889,534 @@ async def delete_cache(key: str) -> int:
 
 async def exists_cache(key: str) -> bool:
     """检查缓存是否存在"""
-    return await _cache.exists(key)
+    entry, now = await _lookup(key)
+    return entry is not None and entry.is_usable(now)
 
 
 async def clear_cache() -> None:
     """清空所有缓存"""
     await _cache.clear()
+    _tag_invalidations.clear()
+
+
+async def close_cache() -> None:
+    """把未落盘的缓存写入磁盘并关闭 L2 连接"""
+    await _cache.close()
+
+
+# ============ 内存缓存快照（warm start） ============
+#
+# 文件格式（小端）:
+#   头部: magic "RFXC" | version u8 | 条目数 u32
+#   条目: key 长度 u16 | key (utf-8) | 保留期限 f64 (unix 时间) | 值长度 u32 | 值
+# 条目按最久未使用到最近使用的顺序写入，加载时按同样顺序插入以保持 LRU 次序。
+
+_SNAPSHOT_MAGIC = b"RFXC"
+# 版本 2：值改为 msgpack 编码，版本 1（pickle）的快照不再加载
+_SNAPSHOT_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct("<4sBI")
+_SNAPSHOT_ENTRY = struct.Struct("<HdI")
+_snapshot_path = working_dir / CACHE_SNAPSHOT_FILE
+_warm_up_task: Optional[asyncio.Task] = None
+
+
+def _write_snapshot(path: Path, records: list[tuple[bytes, float, bytes]]) -> None:
+    """写入快照文件（先写临时文件再替换，避免写到一半的文件被加载）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, len(records)))
+        for key, retain_until, blob in records:
+            f.write(_SNAPSHOT_ENTRY.pack(len(key), retain_until, len(blob)))
+            f.write(key)
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+def _read_snapshot(path: Path) -> list[tuple[str, bytes, float]]:
+    """读取快照中未过保留期的 (key, 序列化值, 保留期限)，不解码（在线程中执行）"""
+    data = path.read_bytes()
+    magic, version, count = _SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+        raise ValueError(f"不支持的快照格式: {magic!r} v{version}")
+
+    now = time.time()
+    records = []
+    offset = _SNAPSHOT_HEADER.size
+    for _ in range(count):
+        key_len, retain_until, blob_len = _SNAPSHOT_ENTRY.unpack_from(data, offset)
+        offset += _SNAPSHOT_ENTRY.size
+        key = data[offset : offset + key_len].decode("utf-8")
+        offset += key_len
+        blob = data[offset : offset + blob_len]
+        offset += blob_len
+        if retain_until > now:
+            records.append((key, blob, retain_until))
+    return records
+
+
+async def save_cache_snapshot(path: Optional[Path] = None) -> int:
+    """
+    把内存缓存（L1）写入快照文件
+
+    序列化在事件循环中分批进行（缓存中的对象可能被并发修改），写文件放在线程中。
+
+    Returns:
+        写入的条目数
+    """
+    path = path or _snapshot_path
+    now = time.time()
+    records = []
+    for i, (key, entry, retain_until) in enumerate(_cache.l1.items()):
+        if retain_until > now:
+            blob = entry.blob if type(entry) is _Packed else _serialize(entry)
+            records.append((key.encode("utf-8"), retain_until, blob))
+        if i % 500 == 499:
+            await asyncio.sleep(0)
+
+    await asyncio.to_thread(_write_snapshot, path, records)
+    logger.info(f"已保存缓存快照: {len(records)} 条 -> {path}")
+    return len(records)
+
+
+async def load_cache_snapshot(path: Optional[Path] = None) -> int:
+    """
+    从快照文件加载内存缓存，已过期或无法解码的条目会被跳过
+
+    读文件放在线程中，解码在事件循环中分批进行（编解码统计只在事件循环中更新）。
+    启动后已经写入的条目比快照更新，不会被覆盖。
+
+    Returns:
+        加载的条目数
+    """
+    path = path or _snapshot_path
+    if not path.exists():
+        return 0
+    try:
+        records = await asyncio.to_thread(_read_snapshot, path)
+    except Exception as e:
+        logger.warning(f"缓存快照加载失败，忽略: {e}")
+        return 0
+
+    # 快照中的条目比启动后写入的条目旧：从最近使用的开始，依次插入到 LRU 末端
+    loaded = 0
+    for i, (key, blob, retain_until) in enumerate(reversed(records)):
+        if i % 500 == 499:
+            await asyncio.sleep(0)
+        if key in _cache.l1:
+            continue
+        # 压缩的条目原样放入 L1，命中时再解码
+        if _is_compressed(blob):
+            entry = _Packed(blob)
+        else:
+            try:
+                entry = _deserialize(blob)
+            except Exception as e:
+                logger.warning(f"缓存快照条目解码失败，跳过: {key} ({e})")
+                continue
+        _cache.l1.set(key, entry, retain_until, len(blob), oldest=True)
+        loaded += 1
+    logger.info(f"已加载缓存快照: {loaded} 条 <- {path}")
+    return loaded
+
+
+def warm_up_cache() -> None:
+    """在后台加载缓存快照，不阻塞启动"""
+    global _warm_up_task
+    if _warm_up_task is None or _warm_up_task.done():
+        _warm_up_task = asyncio.ensure_future(load_cache_snapshot())
+
+
+# ============ 读穿缓存（stale-while-revalidate / stale-if-error） ============
+
+_refresh_flight = SingleFlight("cache_refresh")
+
+# 后台刷新时进入的上下文（例如降低 API 请求优先级），由使用方注册
+_refresh_context: Callable[[], AbstractContextManager] = nullcontext
+
+# 持有后台刷新任务的引用，避免被垃圾回收
+_background_refreshes: set[asyncio.Task] = set()
+
+
+def set_refresh_context(factory: Callable[[], AbstractContextManager]) -> None:
+    """注册后台刷新时进入的上下文"""
+    global _refresh_context
+    _refresh_context = factory
+
+
+def _spawn_background(coro: Awaitable[Any], description: str) -> None:
+    """在后台执行刷新，失败只记录日志"""
+
+    async def run() -> None:
+        with _refresh_context():
+            try:
+                await coro
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败: {description} ({e})")
+
+    task = asyncio.ensure_future(run())
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+async def _refresh(key: str, fetch: Callable[[], Awaitable[Any]], **policy: Any) -> Any:
+    """请求上游并写入缓存，同一 key 的并发刷新只执行一次"""
+
+    async def run() -> Any:
+        value = await _timed_fetch(key, fetch())
+        await set_cache(key, value, **policy)
+        return value
+
+    return await _refresh_flight.do(key, run)
+
+
+# 热点键：用 Count-Min Sketch 统计 get_or_fetch(_many) 中开启 refresh_hot 的读取频率，
+# 达到阈值的键记下刷新方式，由 refresh_hot_cache 定时任务在软 TTL 到期前提前刷新
+HOT_KEY_THRESHOLD = 8  # 一个衰减周期内至少读取的次数
+HOT_KEYS_LIMIT = 512  # 最多跟踪的热点键数量
+HOT_REFRESH_INTERVAL = 60
+HOT_REFRESH_LEAD = HOT_REFRESH_INTERVAL + 30  # 距软 TTL 到期不足该时间时刷新
+HOT_DECAY_INTERVAL = 600  # 计数减半的周期
+
+_hot_sketch = CountMinSketch(width=4096, depth=4)
+_hot_decayed_at = time.monotonic()
+
+
+@dataclass(slots=True)
+class _HotRefresher:
+    """热点条目的刷新方式：单独请求（fetch），或与同一 fetch_many 的其他条目合并请求"""
+
+    policy: dict
+    fetch: Optional[Callable[[], Awaitable[Any]]] = None
+    fetch_many: Optional[Callable[[list], Awaitable[dict]]] = None
+    item_id: Any = None
+
+
+_hot_refreshers: dict[str, _HotRefresher] = {}
+
+
+def _track_hot(key: str, policy: dict, **how: Any) -> None:
+    """记录一次读取；键成为热点后记下刷新方式"""
+    count = _hot_sketch.add(key)
+    if count < HOT_KEY_THRESHOLD:
+        return
+    if key not in _hot_refreshers and len(_hot_refreshers) >= HOT_KEYS_LIMIT:
+        coldest = min(_hot_refreshers, key=_hot_sketch.estimate)
+        if _hot_sketch.estimate(coldest) >= count:
+            return
+        del _hot_refreshers[coldest]
+    _hot_refreshers[key] = _HotRefresher(policy, **how)
+
+
+async def _refresh_hot(
+    singles: list[tuple[str, _HotRefresher]],
+    batches: dict[Callable, list[tuple[str, _HotRefresher]]],
+) -> None:
+    """刷新到期的热点条目，单个条目失败不影响其他条目"""
+    for key, refresher in singles:
+        if refresher.fetch is None:
+            continue
+        try:
+            await _refresh(key, refresher.fetch, **refresher.policy)
+            _stats_for(key).proactive_refreshes += 1
+        except Exception as e:
+            logger.debug(f"热点缓存刷新失败: {key} ({e})")
+
+    for fetch_many, items in batches.items():
+        try:
+            found = await _timed_fetch(
+                items[0][0], fetch_many([r.item_id for _, r in items])
+            )
+        except Exception as e:
+            logger.debug(f"热点缓存刷新失败: {len(items)} 个条目 ({e})")
+            continue
+        for key, refresher in items:
+            if refresher.item_id in found:
+                await set_cache(key, found[refresher.item_id], **refresher.policy)
+                _stats_for(key).proactive_refreshes += 1
+
+
+async def get_or_fetch(
+    key: str,
+    fetch: Callable[[], Awaitable[Any]],
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    stale_if_error: int = 0,
+    serve_stale_if: Optional[Callable[[Exception], bool]] = None,
+    tags: tuple[str, ...] = (),
+    refresh_hot: bool = False,
+) -> Any:
+    """
+    读穿缓存
+
+    Args:
+        key: 缓存键
+        fetch: 请求上游的无参函数
+        ttl / soft_ttl / stale_if_error / tags: 见 set_cache；ttl <= 0 时不缓存
+        serve_stale_if: 判断某个上游异常是否允许用旧值兜底，默认所有异常都允许
+                        （例如 404 说明数据已不存在，不应再返回旧值）
+        refresh_hot: 经常被读取时在软 TTL 到期前主动刷新，热点条目始终命中
+    """
+    if ttl <= 0:
+        return await fetch()
+
+    policy = {
+        "ttl": ttl,
+        "soft_ttl": soft_ttl,
+        "stale_if_error": stale_if_error,
+        "tags": tags,
+    }
+    entry, now = await _lookup(key)
+    if refresh_hot:
+        _track_hot(key, policy, fetch=fetch)
+
+    if entry is not None and entry.is_usable(now):
+        if not entry.is_fresh(now):
+            _spawn_background(_refresh(key, fetch, **policy), key)
+        return entry.value
+
+    try:
+        return await _refresh(key, fetch, **policy)
+    except Exception as e:
+        if entry is None or (serve_stale_if is not None and not serve_stale_if(e)):
+            raise
+        logger.warning(f"上游请求失败，返回过期缓存: {key} ({e})")
+        _stats_for(key).stale_on_error += 1
+        return entry.value
+
+
+async def get_or_fetch_many(
+    ids: Iterable[Hashable],
+    key_of: Callable[[Any], str],
+    fetch_many: Callable[[list], Awaitable[dict]],
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    stale_if_error: int = 0,
+    tags: tuple[str, ...] = (),
+    tags_of: Optional[Callable[[Any], tuple[str, ...]]] = None,
+    refresh_hot: bool = False,
+) -> dict:
+    """
+    批量读穿缓存，语义同 get_or_fetch
+
+    Args:
+        ids: 要获取的 ID 列表
+        key_of: ID -> 缓存键
+        fetch_many: 批量请求上游，返回 ID -> 值；不存在的 ID 不出现在结果中
+        tags_of: ID -> 该条目额外的失效标签
+        refresh_hot: 见 get_or_fetch，热点条目通过 fetch_many 合并刷新
+
+    Returns:
+        ID -> 值。上游没有返回、但仍有保留期内旧值的 ID 使用旧值；
+        上游请求失败时，只要所有未命中的 ID 都有旧值就用旧值兜底，否则抛出异常
+    """
+    if ttl <= 0:
+        return await fetch_many(list(dict.fromkeys(ids)))
+
+    policy = {"ttl": ttl, "soft_ttl": soft_ttl, "stale_if_error": stale_if_error}
+    results: dict = {}
+    stale: list = []
+    missing: list = []
+    fallback: dict = {}
+
+    for item_id in dict.fromkeys(ids):
+        key = key_of(item_id)
+        entry, now = await _lookup(key)
+        if refresh_hot:
+            item_tags = tags + (tags_of(item_id) if tags_of else ())
+            _track_hot(
+                key,
+                {**policy, "tags": item_tags},
+                fetch_many=fetch_many,
+                item_id=item_id,
+            )
+        if entry is not None and entry.is_usable(now):
+            results[item_id] = entry.value
+            if not entry.is_fresh(now):
+                stale.append(item_id)
+        else:
+            missing.append(item_id)
+            if entry is not None:
+                fallback[item_id] = entry.value
+
+    async def fetch_and_store(item_ids: list) -> dict:
+        found = await _timed_fetch(key_of(item_ids[0]), fetch_many(item_ids))
+        for item_id, value in found.items():
+            item_tags = tags + (tags_of(item_id) if tags_of else ())
+            await set_cache(key_of(item_id), value, tags=item_tags, **policy)
+        return found
+
+    if stale:
+        _spawn_background(fetch_and_store(stale), f"{len(stale)} 个条目")
+
+    if not missing:
+        return results
+
+    try:
+        found = await fetch_and_store(missing)
+    except Exception as e:
+        if any(item_id not in fallback for item_id in missing):
+            raise
+        logger.warning(f"上游请求失败，{len(missing)} 个条目返回过期缓存 ({e})")
+        _stats_for(key_of(missing[0])).stale_on_error += len(missing)
+        found = {}
+
+    for item_id in missing:
+        if item_id in found:
+            results[item_id] = found[item_id]
+        elif item_id in fallback:
+            results[item_id] = fallback[item_id]
+    return results
+
+
+@scheduled_task("save_cache_snapshot", interval=1800)
+async def scheduled_save_cache_snapshot() -> None:
+    """定时保存缓存快照，进程异常退出时也能从较新的快照恢复"""
+    await save_cache_snapshot()
+
+
+@scheduled_task("refresh_hot_cache", interval=HOT_REFRESH_INTERVAL)
+async def scheduled_refresh_hot_cache() -> None:
+    """在热点条目的软 TTL 到期前提前刷新（后台优先级），并定期衰减频率计数"""
+    global _hot_decayed_at
+    if time.monotonic() - _hot_decayed_at >= HOT_DECAY_INTERVAL:
+        _hot_sketch.decay()
+        _hot_decayed_at = time.monotonic()
+
+    now = time.time()
+    singles: list[tuple[str, _HotRefresher]] = []
+    batches: dict[Callable, list[tuple[str, _HotRefresher]]] = {}
+    for key, refresher in list(_hot_refreshers.items()):
+        # 已经不热的键不再跟踪
+        if _hot_sketch.estimate(key) < HOT_KEY_THRESHOLD:
+            del _hot_refreshers[key]
+            continue
+        entry = await _get_entry(key)
+        if entry is not None and entry.stale_at - now > HOT_REFRESH_LEAD:
+            continue
+        if refresher.fetch_many is not None:
+            batches.setdefault(refresher.fetch_many, []).append((key, refresher))
+        else:
+            singles.append((key, refresher))
+
+    due = len(singles) + sum(len(items) for items in batches.values())
+    if due:
+        logger.debug(f"提前刷新 {due} 个热点缓存条目")
+        _spawn_background(_refresh_hot(singles, batches), f"{due} 个热点条目")
+
+
+@scheduled_task("purge_expired_cache", interval=3600)
+async def scheduled_purge_expired_cache() -> None:
+    """定时清理 L2 中已过期的条目"""
+    removed = await _cache.l2.purge_expired()
+    if removed:
+        logger.info(f"已清理 {removed} 条过期缓存")
+
+
+def get_cache_stats() -> dict:
+    """
+    获取缓存统计
+
+    Returns:
+        {
+            "backend": L2 后端名称,
+            "memory": L1 总体占用,
+            "pending_writes": 待写入 L2 的条目数,
+            "hot_keys": 跟踪中的热点键数量,
+            "codec": 平均编码 / 解码耗时（微秒）、L1 中压缩条目占用的字节与每次命中的解码耗时、压缩比,
+            "namespaces": 命名空间 -> 命中 / 未命中 / 淘汰 / 占用字节 / 延迟分布,
+        }
+        命中率只统计 get_cache / exists_cache / get_or_fetch(_many) 的读取
+    """
+    l1 = _cache.l1
+    codec = _codec_stats
+    namespaces = {}
+    for namespace in sorted(set(_namespace_stats) | set(l1.namespace_entries)):
+        stats = _namespace_stats.get(namespace) or NamespaceStats()
+        lookups = stats.hits + stats.stale_hits + stats.misses
+        namespaces[namespace] = {
+            "lookups": lookups,
+            "hits": stats.hits,
+            "stale_hits": stats.stale_hits,
+            "misses": stats.misses,
+            "hit_rate": (stats.hits + stats.stale_hits) / lookups if lookups else 0.0,
+            "stale_on_error": stats.stale_on_error,
+            "fetches": stats.fetches,
+            "fetch_errors": stats.fetch_errors,
+            "proactive_refreshes": stats.proactive_refreshes,
+            "evictions": l1.namespace_evictions[namespace],
+            "entries": l1.namespace_entries[namespace],
+            "bytes": l1.namespace_bytes[namespace],
+            "lookup_latency": stats.lookup_latency.to_dict(),
+            "fetch_latency": stats.fetch_latency.to_dict(),
+        }
+    return {
+        "backend": _cache.l2.name,
+        "memory": {
+            "entries": len(l1),
+            "used_bytes": l1.used_bytes,
+            "max_bytes": l1.max_bytes,
+            "evictions": l1.evictions,
+        },
+        "pending_writes": len(_cache._pending),
+        "hot_keys": len(_hot_refreshers),
+        "codec": {
+            "serializer": "msgpack",
+            "compression": _CODEC_NAMES[_COMPRESSION_CODEC],
+            "min_bytes": COMPRESS_MIN_BYTES,
+            "encodes": codec.encodes,
+            "encode_us": codec.encode_seconds / codec.encodes * 1e6
+            if codec.encodes
+            else 0.0,
+            "decodes": codec.decodes,
+            "decode_us": codec.decode_seconds / codec.decodes * 1e6
+            if codec.decodes
+            else 0.0,
+            "packed_entries": l1.packed_entries,
+            "packed_bytes": l1.packed_bytes,
+            "hit_decodes": codec.hit_decodes,
+            "hit_decode_us": (
+                codec.hit_decode_seconds / codec.hit_decodes * 1e6
+                if codec.hit_decodes
+                else 0.0
+            ),
+            "compressed": codec.compressed,
+            "compression_ratio": (
+                codec.compressed_raw_bytes / codec.compressed_bytes
+                if codec.compressed_bytes
+                else 1.0
+            ),
+        },
+        "namespaces": namespaces,
+    }
+
+
+@scheduled_task("log_cache_stats", interval=600)
+async def scheduled_log_cache_stats() -> None:
+    """定期输出各命名空间的缓存统计，用于调整 TTL 与容量"""
+    stats = get_cache_stats()
+    memory = stats["memory"]
+    logger.info(
+        f"缓存 [{stats['backend']}] L1 {memory['entries']} 项 / "
+        f"{memory['used_bytes'] / 1048576:.1f}/{memory['max_bytes'] / 1048576:.0f} MB，"
+        f"淘汰 {memory['evictions']} 次，待写入 {stats['pending_writes']}，"
+        f"热点 {stats['hot_keys']} 个"
+    )
+    codec = stats["codec"]
+    logger.info(
+        f"缓存编解码 [{codec['serializer']}]: 编码 {codec['encodes']} 次 / 平均 {codec['encode_us']:.0f}us，"
+        f"解码 {codec['decodes']} 次 / 平均 {codec['decode_us']:.0f}us，"
+        f"{codec['compression']} 压缩 {codec['compressed']} 次 / 压缩比 {codec['compression_ratio']:.1f}，"
+        f"L1 压缩条目 {codec['packed_entries']} 项 / {codec['packed_bytes'] / 1048576:.1f} MB，"
+        f"命中解码 {codec['hit_decodes']} 次 / 平均 {codec['hit_decode_us']:.0f}us"
+    )
+    for namespace, ns in stats["namespaces"].items():
+        if not ns["lookups"] and not ns["evictions"]:
+            continue
+        logger.info(
+            f"[{namespace}] 命中率 {ns['hit_rate']:.1%}（命中 {ns['hits']}，过期命中 {ns['stale_hits']}，"
+            f"未命中 {ns['misses']}），提前刷新 {ns['proactive_refreshes']}，淘汰 {ns['evictions']}，"
+            f"{ns['entries']} 项 / {ns['bytes']} 字节，"
+            f"读取 p99 {ns['lookup_latency']['p99_ms']}ms，"
+            f"上游 p50/p99 {ns['fetch_latency']['p50_ms']}/{ns['fetch_latency']['p99_ms']}ms"
+        )
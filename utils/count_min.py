@@ -0,0 +1,69 @@
+"""
+Count-Min Sketch
+
+用固定内存估算元素出现的次数，估计值只会偏大、不会偏小。
+计数使用保守更新（只增加当前最小的计数器），降低哈希冲突带来的高估。
+decay 把所有计数减半，使估计值反映最近一段时间的频率。
+
+用法:
+    sketch = CountMinSketch(width=2048, depth=4)
+    sketch.add("beatmap:info:75")  # 返回加入后的估计次数
+    sketch.estimate("beatmap:info:75")
+"""
+
+import hashlib
+from array import array
+
+
+class CountMinSketch:
+    """depth 行 x width 列的计数器矩阵（双重哈希生成每行的位置）"""
+
+    # 计数器上限（uint32）
+    _MAX_COUNT = 0xFFFFFFFF
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        """
+        Args:
+            width: 每行的计数器数量，越大冲突越少（误差约为 总次数 * e / width）
+            depth: 行数（哈希函数个数），越大高估的概率越低
+        """
+        self.width = width
+        self.depth = depth
+        self._counters = array("I", bytes(4 * width * depth))
+        self.total = 0
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [
+            row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)
+        ]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """记录 item 出现 count 次，返回记录后的估计次数"""
+        positions = self._positions(item)
+        counters = self._counters
+        estimate = min(min(counters[pos] for pos in positions) + count, self._MAX_COUNT)
+        for pos in positions:
+            if counters[pos] < estimate:
+                counters[pos] = estimate
+        self.total += count
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        """item 出现次数的估计值（不小于真实值）"""
+        counters = self._counters
+        return min(counters[pos] for pos in self._positions(item))
+
+    def decay(self) -> None:
+        """所有计数减半"""
+        counters = self._counters
+        for i, value in enumerate(counters):
+            if value:
+                counters[i] = value >> 1
+        self.total >>= 1
+
+    def memory_bytes(self) -> int:
+        """计数器占用的字节数"""
+        return self._counters.itemsize * len(self._counters)
@@ -0,0 +1,130 @@
+"""
+DataLoader - 同一事件循环轮次内的请求批量合并
+
+同一轮事件循环中对 load() 的调用会被收集起来（相同 key 去重），
+在下一轮统一交给 batch_fn 一次性处理，再把结果分发回各调用者。
+
+用法:
+    async def batch_fn(keys: list[int]) -> dict[int, Any]:
+        ...  # 返回 key -> 值（或 Exception 实例）
+
+    loader = DataLoader(batch_fn, max_batch_size=50, name="beatmap")
+    results = await asyncio.gather(*(loader.load(k) for k in keys))
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger("utils.dataloader")
+
+T = TypeVar("T")
+
+
+async def settle(awaitable: Awaitable[T]) -> T | Exception:
+    """
+    等待 awaitable，普通异常作为返回值（batch_fn 中逐个补查时使用）
+
+    与 asyncio.gather(return_exceptions=True) 不同，取消等 BaseException 仍会向上抛出，
+    不会被当作某个 key 的结果分发给调用者。
+    """
+    try:
+        return await awaitable
+    except Exception as e:
+        return e
+
+
+class DataLoader:
+    """按事件循环轮次批量合并 load 请求"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list], Awaitable[dict]],
+        max_batch_size: int = 50,
+        name: str = "default",
+    ):
+        """
+        Args:
+            batch_fn: 批量加载函数，接收 key 列表，返回 key -> 值 的字典；
+                      值为 Exception 实例时该 key 的调用者会收到此异常，
+                      缺失的 key 会收到 KeyError
+            max_batch_size: 单次 batch_fn 调用的最大 key 数量
+            name: 名称（用于日志与统计）
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._queue: dict[Hashable, asyncio.Future] = {}  # 等待本轮分发
+        self._inflight: dict[Hashable, asyncio.Future] = {}  # 已分发、未完成
+        self._dispatch_scheduled = False
+        # 进行中的批量 Task，持有引用避免执行途中被回收
+        self._batches: set[asyncio.Task] = set()
+        self.loads = 0  # load 调用次数
+        self.batches = 0  # batch_fn 调用次数
+
+    async def load(self, key: Hashable) -> Any:
+        """加载单个 key，同一轮内的调用会被合并为一次批量请求"""
+        self.loads += 1
+
+        future = self._inflight.get(key) or self._queue.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._queue[key] = future
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                loop.call_soon(self._dispatch)
+
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: list[Hashable]) -> list[Any]:
+        """批量加载，任一 key 失败则抛出异常"""
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        """把本轮收集到的 key 按 max_batch_size 分批交给 batch_fn"""
+        self._dispatch_scheduled = False
+        queue, self._queue = self._queue, {}
+        self._inflight.update(queue)
+
+        keys = list(queue)
+        for i in range(0, len(keys), self.max_batch_size):
+            chunk = keys[i : i + self.max_batch_size]
+            task = asyncio.ensure_future(self._run_batch(chunk, queue))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, keys: list, futures: dict) -> None:
+        """执行一次 batch_fn 并分发结果"""
+        self.batches += 1
+        logger.debug(f"[{self.name}] 批量加载 {len(keys)} 个 key")
+        try:
+            results = await self.batch_fn(keys)
+        except Exception as e:
+            results = {key: e for key in keys}
+
+        for key in keys:
+            future = futures[key]
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.done():
+                continue
+
+            value = results.get(key, KeyError(key))
+            if isinstance(value, Exception):
+                future.set_exception(value)
+                # 没有调用者等待时也不会产生 "never retrieved" 警告
+                future.exception()
+            else:
+                future.set_result(value)
+
+    def stats(self) -> dict:
+        """获取批量合并统计信息"""
+        return {
+            "name": self.name,
+            "loads": self.loads,
+            "batches": self.batches,
+            "queued": len(self._queue),
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,137 @@
+"""
+负缓存 - 记住 "不存在" 的查询结果
+
+用户名拼写错误、无效的谱面 ID 等查询每次都会请求 API 并得到 404。
+负缓存把这些 key 以较短的 TTL 记录下来，重复查询直接判定为不存在。
+
+查询路径:
+    1. Bloom 过滤器：不在过滤器中 -> 一定不是已知的不存在项，直接放行
+       （绝大多数正常查询在这里结束，不需要查缓存）
+    2. 可能存在 -> 查询缓存中的负缓存条目确认，排除 Bloom 过滤器的误判
+
+Bloom 过滤器不支持删除，因此按 TTL 轮换两代过滤器：
+超过 TTL 后当前代成为上一代，旧的上一代被丢弃。
+
+用法:
+    missing_users = NegativeCache("user", ttl=600)
+    if await missing_users.is_missing("peppy"):
+        ...
+    await missing_users.mark_missing("peppy")
+"""
+
+import time
+from typing import Optional
+
+from utils.bloom import BloomFilter
+from utils.caches import exists_cache, set_cache
+from utils.logger import get_logger
+from utils.scheduler_registry import scheduled_task
+
+logger = get_logger("utils.negative_cache")
+
+# 已创建的负缓存，用于统计
+_negative_caches: list["NegativeCache"] = []
+
+
+class NegativeCache:
+    """短 TTL 的 "不存在" 记录，前置 Bloom 过滤器"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: int,
+        capacity: int = 10000,
+        error_rate: float = 0.01,
+    ):
+        """
+        Args:
+            name: 名称（用于缓存键与统计）
+            ttl: 负缓存条目的有效期（秒）
+            capacity: 每代 Bloom 过滤器的预期容量
+            error_rate: 每代 Bloom 过滤器的目标误判率
+        """
+        self.name = name
+        self.ttl = ttl
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._rotated_at = time.monotonic()
+        self.checks = 0  # is_missing 调用次数
+        self.bloom_positives = 0  # Bloom 过滤器判定 "可能存在" 的次数
+        self.hits = 0  # 确认为不存在、省去 API 请求的次数
+        _negative_caches.append(self)
+
+    def _cache_key(self, key: str) -> str:
+        return f"negative:{self.name}:{key}"
+
+    def _rotate_if_needed(self) -> None:
+        now = time.monotonic()
+        # 当前代已满也提前轮换，保证误判率不超过目标
+        if now - self._rotated_at >= self.ttl or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+
+    def _might_contain(self, key: str) -> bool:
+        return key in self._current or (
+            self._previous is not None and key in self._previous
+        )
+
+    async def is_missing(self, key: str) -> bool:
+        """key 是否为已知的不存在项"""
+        self.checks += 1
+        self._rotate_if_needed()
+        if not self._might_contain(key):
+            return False
+
+        self.bloom_positives += 1
+        if await exists_cache(self._cache_key(key)):
+            self.hits += 1
+            return True
+        return False
+
+    async def mark_missing(self, key: str) -> None:
+        """记录 key 不存在"""
+        self._rotate_if_needed()
+        self._current.add(key)
+        await set_cache(self._cache_key(key), True, ttl=self.ttl)
+
+    def stats(self) -> dict:
+        """获取统计信息"""
+        false_positives = self.bloom_positives - self.hits
+        negatives = self.checks - self.hits
+        generations = [b for b in (self._current, self._previous) if b is not None]
+        # 两代任一误判即误判
+        estimated = 1.0
+        for bloom in generations:
+            estimated *= 1 - bloom.estimated_error_rate()
+        return {
+            "name": self.name,
+            "checks": self.checks,
+            "hits": self.hits,
+            "bloom_positives": self.bloom_positives,
+            "false_positives": false_positives,
+            "observed_fpr": false_positives / negatives if negatives else 0.0,
+            "estimated_fpr": 1 - estimated,
+            "items": sum(b.count for b in generations),
+            "memory_bytes": sum(b.memory_bytes() for b in generations),
+            "num_hashes": self._current.num_hashes,
+        }
+
+
+def get_negative_cache_stats() -> list[dict]:
+    """获取所有负缓存的统计信息"""
+    return [cache.stats() for cache in _negative_caches]
+
+
+@scheduled_task("log_negative_cache_stats", interval=600)
+async def scheduled_log_negative_cache_stats() -> None:
+    """定期输出负缓存统计"""
+    for stats in get_negative_cache_stats():
+        if stats["checks"]:
+            logger.info(
+                f"[{stats['name']}] 负缓存命中 {stats['hits']}/{stats['checks']}，"
+                f"Bloom 误判率 {stats['observed_fpr']:.2%}（估计 {stats['estimated_fpr']:.2%}），"
+                f"{stats['items']} 项 / {stats['memory_bytes']} 字节"
+            )
@@ -0,0 +1,76 @@
+"""
+字段投影 - 缓存实体时只保留用得到的字段
+
+API 返回的谱面 / 用户对象包含大量渲染用不到的字段（failtimes、owners、
+各种嵌套对象等）。按 schema 投影后再缓存，可以显著减少每个条目的内存。
+
+schema 格式（与 config/api.yaml 中的 cache_projections 一致）:
+    ["id", "version", {"beatmapset": ["id", "title", "covers"]}]
+
+    - 字符串：保留该字段的完整值
+    - 单键映射：对该字段的值（字典，或字典列表中的每一项）递归投影
+
+投影后的字典键会被 intern，较短的字符串值通过有上限的共享表去重，
+大量缓存条目共用同一份键 / 值对象。
+"""
+
+import sys
+from typing import Any, Optional
+
+# 嵌套投影：字段名 -> 子投影（None 表示保留完整值）
+Projection = dict[str, Optional["Projection"]]
+
+# 参与去重的字符串值最大长度与共享表容量
+_SHARED_VALUE_MAX_LEN = 16
+_SHARED_VALUES_LIMIT = 4096
+_shared_values: dict[str, str] = {}
+
+
+def compile_projection(spec: list) -> Projection:
+    """把配置中的 schema 编译为嵌套字典"""
+    projection: Projection = {}
+    for field in spec:
+        if isinstance(field, dict):
+            for name, nested in field.items():
+                projection[sys.intern(str(name))] = compile_projection(nested or [])
+        else:
+            projection[sys.intern(str(field))] = None
+    return projection
+
+
+def _share(value: Any) -> Any:
+    """短字符串值去重（不使用 sys.intern，避免用户名等无界取值常驻内存）"""
+    if isinstance(value, str) and len(value) <= _SHARED_VALUE_MAX_LEN:
+        shared = _shared_values.get(value)
+        if shared is not None:
+            return shared
+        if len(_shared_values) < _SHARED_VALUES_LIMIT:
+            _shared_values[value] = value
+    return value
+
+
+def project(data: Any, projection: Optional[Projection]) -> Any:
+    """
+    按投影裁剪数据
+
+    Args:
+        data: 字典、字典列表或其他值
+        projection: compile_projection 的结果；None 时原样返回
+
+    Returns:
+        投影后的新对象，缺失的字段不会补齐
+    """
+    if projection is None:
+        return data
+    if isinstance(data, list):
+        return [project(item, projection) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    result = {}
+    for name, nested in projection.items():
+        if name not in data:
+            continue
+        value = data[name]
+        result[name] = _share(value) if nested is None else project(value, nested)
+    return result
@@ -0,0 +1,123 @@
+"""
+请求作用域 - 基于 contextvars 的单次命令内记忆化
+
+一条命令从 cog 到 renderer 再到 backend，往往会以相同参数多次调用同一个
+后端函数（例如 get_user_info）。在请求作用域内，被 @request_memoized
+装饰的函数对相同参数只会真正执行一次，其余调用直接复用结果。
+
+作用域之外调用时行为与未装饰完全一致。
+
+用法:
+    @request_memoized
+    async def get_user_info(user): ...
+
+    with request_scope():
+        await get_user_info(1)
+        await get_user_info(1)  # 复用上一次的结果
+"""
+
+import asyncio
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Iterator, Optional
+
+# 当前请求的记忆表：key -> Task；None 表示不在请求作用域内
+_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def enter_request_scope() -> Optional[Token]:
+    """
+    进入请求作用域，已在作用域内时复用外层作用域并返回 None
+
+    用于无法使用 with 语句的场景（如 cog_before_invoke / cog_after_invoke）
+    """
+    if _scope.get() is not None:
+        return None
+    return _scope.set({})
+
+
+def exit_request_scope(token: Optional[Token]) -> None:
+    """退出由 enter_request_scope 进入的作用域"""
+    if token is not None:
+        _scope.reset(token)
+
+
+@contextmanager
+def request_scope() -> Iterator[None]:
+    """请求作用域上下文管理器，可嵌套（内层复用外层）"""
+    token = enter_request_scope()
+    try:
+        yield
+    finally:
+        exit_request_scope(token)
+
+
+def _memo_key(func: Callable, args: tuple, kwargs: dict) -> Optional[tuple]:
+    """
+    生成记忆键：按函数签名规范化参数（位置 / 关键字 / 默认值写法得到相同的键），
+    参数不可哈希时返回 None
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    key = (func.__module__, func.__qualname__, tuple(bound.arguments.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def request_memoized(func: Callable) -> Callable:
+    """
+    装饰器：在请求作用域内按参数记忆异步函数的结果
+
+    并发的相同调用共享同一个 Task；执行失败的结果不会被记忆。
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> Any:
+        memo = _scope.get()
+        key = _memo_key(func, args, kwargs) if memo is not None else None
+        if memo is None or key is None:
+            return await func(*args, **kwargs)
+
+        task = memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            memo[key] = task
+
+            def _forget_failure(t: asyncio.Task) -> None:
+                if t.cancelled() or t.exception() is not None:
+                    if memo.get(key) is t:
+                        del memo[key]
+
+            task.add_done_callback(_forget_failure)
+
+        return await asyncio.shield(task)
+
+    return wrapper
+
+
+def prime_request_memo(func: Callable, *args, value: Any, **kwargs) -> None:
+    """
+    向当前请求作用域预先写入 func(*args, **kwargs) 的结果
+
+    用于一个调用的结果已经包含另一个调用所需数据的场景。
+    不在作用域内或已有记录时不做任何事。
+    """
+    memo = _scope.get()
+    if memo is None:
+        return
+    # 取被装饰前的原函数计算 key，与 request_memoized 保持一致
+    key = _memo_key(getattr(func, "__wrapped__", func), args, kwargs)
+    if key is None or key in memo:
+        return
+
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(value)
+    memo[key] = future
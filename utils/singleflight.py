@@ -0,0 +1,99 @@
+"""
+SingleFlight - 并发请求合并
+
+同一个 key 同时只会有一个真正执行的协程，
+其余并发调用者共享同一个结果（或同一个异常）。
+
+用法:
+    group = SingleFlight("user_info")
+    result = await group.do(key, lambda: fetch(...))
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger("utils.singleflight")
+
+# 新调用开始执行时在其 Task 内调用的回调，由使用方注册（例如为该调用记录请求优先级）
+_lead_hook: Optional[Callable[[], None]] = None
+# 加入进行中的调用时以该调用的 Task 为参数调用的回调（例如按加入者提升请求优先级）
+_join_hook: Optional[Callable[[asyncio.Task], None]] = None
+
+
+def set_flight_hooks(
+    on_lead: Optional[Callable[[], None]],
+    on_join: Optional[Callable[[asyncio.Task], None]],
+) -> None:
+    """注册所有 SingleFlight 共用的执行 / 加入回调"""
+    global _lead_hook, _join_hook
+    _lead_hook, _join_hook = on_lead, on_join
+
+
+async def _lead(func: Callable[[], Awaitable[Any]]) -> Any:
+    if _lead_hook is not None:
+        _lead_hook()
+    return await func()
+
+
+class SingleFlight:
+    """按 key 合并并发中的相同调用"""
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.calls = 0  # 总调用次数
+        self.executions = 0  # 实际执行次数
+        self.coalesced = 0  # 被合并（未实际执行）的调用次数
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 func，若相同 key 已有调用在进行中则直接等待其结果
+
+        实际执行放在独立的 Task 中，某个调用者被取消不会影响其他等待者。
+
+        Args:
+            key: 合并键
+            func: 返回 awaitable 的无参函数
+
+        Returns:
+            func 的结果；func 抛出的异常会传递给所有等待者
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug(f"[{self.name}] 合并请求: {key}")
+            if _join_hook is not None:
+                _join_hook(task)
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(_lead(func))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        """执行结束后移除 key，并消费异常避免 'never retrieved' 警告"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def inflight(self) -> int:
+        """当前进行中的调用数"""
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        """获取合并统计信息"""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesce_ratio": self.coalesced / self.calls if self.calls else 0.0,
+            "inflight": self.inflight(),
+        }
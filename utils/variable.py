@@ -50,6 +50,19 @@ OAUTH_TOKEN_TTL = _OAUTH_CONFIG.get("token_ttl", 86400)
 # 数据库配置
 _DATABASE_CONFIG = _CONFIG.get("database", {})
 SQL_DB_FILE = _DATABASE_CONFIG.get("file", "./database.db")
+SQL_DB_MMAP_SIZE = int(_DATABASE_CONFIG.get("mmap_size_mb", 64) * 1024 * 1024)
+SQL_DB_POOL_SIZE = int(_DATABASE_CONFIG.get("pool_size", 4))
+
+# 缓存配置
+_CACHE_CONFIG = _CONFIG.get("cache", {})
+CACHE_BACKEND = _CACHE_CONFIG.get("backend", "sqlite")
+CACHE_FILE = _CACHE_CONFIG.get("file", "./cache.db")
+CACHE_MEMORY_LIMIT = int(_CACHE_CONFIG.get("memory_limit_mb", 64) * 1024 * 1024)
+CACHE_SNAPSHOT_FILE = _CACHE_CONFIG.get("snapshot_file", "./cache.snapshot")
+CACHE_COMPRESS_MIN_BYTES = int(_CACHE_CONFIG.get("compress_min_bytes", 8192))
+CACHE_COMPRESS_LEVEL = int(_CACHE_CONFIG.get("compress_level", 3))
+CACHE_REDIS_URL = _CACHE_CONFIG.get("redis_url", "redis://localhost:6379/0")
+CACHE_REDIS_PREFIX = _CACHE_CONFIG.get("redis_prefix", "redfox:")
 
 # API 配置
 _API_CONFIG = _CONFIG.get("api", {})